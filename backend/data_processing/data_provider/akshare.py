@@ -8,6 +8,7 @@ from dateutil.parser import parser
 from tqdm import tqdm
 import akshare as ak
 
+from data_processing.update_stocks.download_mydata_util import filter_new_records, bulk_upsert_records
 from db.mysql.db_schemas import Stock, StocksInPool
 from end_points.common.const.consts import DataBase
 from end_points.common.utils.db import update_record
@@ -151,72 +152,33 @@ class Akshare:
             time = "".join(time.split("/"))
         return time
 
-    def addRecord(self, db, class_name, stock_code, se, bind_key, stock_done_record=None):
+    def addRecord(self, db, class_name, stock_code, se, bind_key, stock_done_record=None, start_date=None):
         print("Start loading record data for: " + stock_code)
         if 's' in stock_code:
             # r = ak.stock_zh_a_daily(symbol=stock_code)
             r = ak.stock_zh_a_hist_tx(symbol=stock_code)
-            for index, each_data in r.iterrows():
-                date_time = each_data['date']
-                query = db.session.query(class_name).filter(class_name.date == date_time).first()
-                if query:
-                    continue
-                if stock_done_record and stock_done_record.starting_date is None:
-                    stock_done_record.starting_date = date_time
-                    db.session.commit()
-                shake_rate = None
-                change_rate = None
-                change_amount = None
-                if index > 0:
-                    p_close = r.iloc[index-1]['close']
-                    high = each_data['open']
-                    low = each_data['low']
-                    close = each_data['close']
-                    shake_rate = round((high - low) * 100 / p_close, 2)
-                    change_amount = close - p_close
-                    change_rate = round((close - p_close) * 100 / p_close, 2)
-                # volume = int(each_data['volume']/100)
-                record = class_name(
-                    date=date_time,
-                    open=each_data['open'],
-                    high=each_data['high'],
-                    low=each_data['low'],
-                    close=each_data['close'],
-                    volume=each_data['amount'],
-                    turnover=None,
-                    turnover_rate=None,
-                    shake_rate=shake_rate,
-                    change_rate=change_rate,
-                    change_amount=change_amount,
-                )
-                db.session.add(record)
-                db.session.commit()
+            # the previous close is taken from the full history before the stored days are dropped
+            p_close = r['close'].shift(1)
+            r['shake_rate'] = ((r['high'] - r['low']) * 100 / p_close).round(2)
+            r['change_amount'] = r['close'] - p_close
+            r['change_rate'] = ((r['close'] - p_close) * 100 / p_close).round(2)
+            # volume = int(each_data['volume']/100)
+            r = r.drop(columns=['volume'], errors='ignore').rename(columns={'amount': 'volume'})
+            df = filter_new_records(db, class_name, bind_key, r)
         else:
-            r = ak.stock_zh_a_hist(symbol=stock_code, period='daily')
-            for _, each_data in r.iterrows():
-                date_time = each_data['日期']
-                query = db.session.query(class_name).filter(class_name.date == date_time).first()
-                if query:
-                    continue
-                if stock_done_record and stock_done_record.starting_date is None:
-                    stock_done_record.starting_date = date_time
-                    db.session.commit()
-                record = class_name(
-                    date=date_time,
-                    open=each_data['开盘'],
-                    high=each_data['最高'],
-                    low=each_data['最低'],
-                    close=each_data['收盘'],
-                    volume=each_data['成交量'],
-                    turnover=each_data['成交额'],
-                    shake_rate=each_data['振幅'],
-                    turnover_rate=each_data['换手率'],
-                    change_rate=each_data['涨跌幅'],
-                    change_amount=each_data['涨跌额'],
-                )
-                db.session.add(record)
-        db.session.commit()
+            if start_date is not None:
+                r = ak.stock_zh_a_hist(symbol=stock_code, period='daily', start_date=start_date.strftime('%Y%m%d'))
+            else:
+                r = ak.stock_zh_a_hist(symbol=stock_code, period='daily')
+            r = r.rename(columns={
+                '日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close',
+                '成交量': 'volume', '成交额': 'turnover', '振幅': 'shake_rate', '换手率': 'turnover_rate',
+                '涨跌幅': 'change_rate', '涨跌额': 'change_amount'
+            })
+            df = filter_new_records(db, class_name, bind_key, r)
+        updated = bulk_upsert_records(db, class_name, bind_key, df, stock_done_record) > 0
         print("Add record success for: " + stock_code)
+        return updated
 
     def updateZJ(self, db, class_name, stock_code, se, dates_to_fill):
         print("Start loading ZJ data for: " + stock_code)
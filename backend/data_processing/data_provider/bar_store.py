@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Tushare publishes the daily bars of a trading day after the close, a sync done
+# before this hour may miss that day's bar and is not considered final.
+BAR_PUBLISH_HOUR = 17
+DATE_FORMAT = '%Y%m%d'
+
+BAR_COLUMNS = [
+    'date', 'open', 'high', 'low', 'close', 'volume',
+    'turnover', 'turnover_rate', 'shake_rate',
+    'change_rate', 'change_amount'
+]
+BAR_DTYPE = np.dtype([('date', 'datetime64[ns]')] + [(name, 'float64') for name in BAR_COLUMNS[1:]])
+
+
+def default_bar_store_dir():
+    return os.getenv('BAR_STORE_DIR') or os.path.join(os.path.dirname(__file__), 'data_cache', 'bars')
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast a bar frame to the stored column set and dtypes (datetime64[ns] date, float64 values)"""
+    df = df.reindex(columns=BAR_COLUMNS)
+    df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+    for name in BAR_COLUMNS[1:]:
+        df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+    return df.sort_values('date').reset_index(drop=True)
+
+
+class BarStore:
+    """
+    Local daily OHLCV store, one columnar .npy file per symbol plus a json sidecar.
+
+    The .npy file holds a structured array sorted by date and is opened with
+    mmap_mode='r', the sidecar records the date range that has been synced from
+    the remote provider so repeated reads of a current symbol never hit the network.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or default_bar_store_dir()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _paths(self, symbol):
+        return os.path.join(self.root, f'{symbol}.npy'), os.path.join(self.root, f'{symbol}.json')
+
+    def load(self, symbol):
+        bars_path, meta_path = self._paths(symbol)
+        if not os.path.exists(bars_path) or not os.path.exists(meta_path):
+            return None, None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            bars = np.load(bars_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 本地K线缓存损坏，将重新下载: {symbol} {e}")
+            return None, None
+        if bars.dtype != BAR_DTYPE:
+            return None, None
+        return bars, meta
+
+    def save(self, symbol, df, synced_start, synced_end):
+        os.makedirs(self.root, exist_ok=True)
+        bars_path, meta_path = self._paths(symbol)
+        df = normalize_bars(df)
+        bars = np.empty(len(df), dtype=BAR_DTYPE)
+        for name in BAR_COLUMNS:
+            bars[name] = df[name].to_numpy()
+        meta = {
+            'synced_start': synced_start,
+            'synced_end': synced_end,
+            'synced_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        # write to temp files and swap them in, readers never see a partial file
+        tmp_bars_path = f'{bars_path}.{os.getpid()}.tmp'
+        with open(tmp_bars_path, 'wb') as f:
+            np.save(f, bars)
+        os.replace(tmp_bars_path, bars_path)
+        tmp_meta_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta_path, meta_path)
+        return df
+
+    @staticmethod
+    def is_current(meta, end_date):
+        """
+        Whether the synced range already covers end_date with every bar published so far,
+        i.e. the bar of synced_end was not published between the last sync and now.
+        """
+        synced_end = meta.get('synced_end')
+        if synced_end is None or end_date > synced_end:
+            return False
+        synced_at = datetime.strptime(meta.get('synced_at'), '%Y-%m-%dT%H:%M:%S')
+        publish_time = datetime.strptime(synced_end, DATE_FORMAT).replace(hour=BAR_PUBLISH_HOUR)
+        return not (synced_at < publish_time <= datetime.now())
+
+    @staticmethod
+    def to_dataframe(bars, start_date, end_date):
+        dates = bars['date']
+        lo = np.searchsorted(dates, np.datetime64(datetime.strptime(start_date, DATE_FORMAT), 'ns'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(datetime.strptime(end_date, DATE_FORMAT) + timedelta(days=1), 'ns'), side='left')
+        return pd.DataFrame({name: np.array(bars[name][lo:hi]) for name in BAR_COLUMNS})
+
+    def get(self, symbol, start_date, end_date, fetch):
+        """
+        Read [start_date, end_date] (YYYYMMDD) bars for symbol, fetching only the missing head/tail.
+
+        fetch(symbol, start_date, end_date) must return a bar frame and raise on provider errors,
+        an empty frame is taken as "no bars in that range".
+        """
+        with self._lock(symbol):
+            bars, meta = self.load(symbol)
+            if bars is None:
+                self.fetches += 1
+                df = self.save(symbol, fetch(symbol, start_date, end_date), start_date, end_date)
+                return df[(df['date'] >= pd.Timestamp(start_date)) & (df['date'] <= pd.Timestamp(end_date))].reset_index(drop=True)
+
+            synced_start, synced_end = meta['synced_start'], meta['synced_end']
+            if start_date >= synced_start and self.is_current(meta, end_date):
+                self.hits += 1
+                return self.to_dataframe(bars, start_date, end_date)
+
+            frames = [pd.DataFrame({name: np.array(bars[name]) for name in BAR_COLUMNS})]
+            if start_date < synced_start:
+                self.fetches += 1
+                head_end = (datetime.strptime(synced_start, DATE_FORMAT) - timedelta(days=1)).strftime(DATE_FORMAT)
+                frames.insert(0, fetch(symbol, start_date, head_end))
+                synced_start = start_date
+            if not self.is_current(meta, end_date):
+                tail_start = synced_end
+                if len(bars) > 0:
+                    last_date = pd.Timestamp(bars['date'][-1]).to_pydatetime()
+                    tail_start = (last_date + timedelta(days=1)).strftime(DATE_FORMAT)
+                if tail_start <= end_date:
+                    self.fetches += 1
+                    frames.append(fetch(symbol, tail_start, end_date))
+                synced_end = max(synced_end, end_date)
+            del bars
+            frames = [normalize_bars(frame) for frame in frames if frame is not None and not frame.empty]
+            df = pd.concat(frames, ignore_index=True) if frames else normalize_bars(pd.DataFrame(columns=BAR_COLUMNS))
+            df = df.drop_duplicates(subset=['date'], keep='last')
+            self.save(symbol, df, synced_start, synced_end)
+            bars, _ = self.load(symbol)
+            return self.to_dataframe(bars, start_date, end_date)
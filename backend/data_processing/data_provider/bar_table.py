@@ -0,0 +1,139 @@
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, inspect, literal, table, column
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from db.mysql.db_schemas_dynamic import DynamicBase, StockBar
+from end_points.common.const.consts import DataBase
+from end_points.common.utils.db import get_bind_session
+
+# bar columns of the consolidated table, same names as the per-stock tables
+BAR_TABLE_COLUMNS = [
+    'open', 'high', 'low', 'close', 'volume', 'turnover', 'turnover_rate', 'shake_rate',
+    'change_rate', 'change_amount', 'jlrl', 'zljlrl', 'hyjlrl'
+]
+# columns the per-stock index tables do not have
+INDEX_MISSING_COLUMNS = ['jlrl', 'zljlrl', 'hyjlrl']
+# per-stock table names: 600000 / sh000001
+STOCK_TABLE_PATTERN = re.compile(r'^(s[hz])?\d{6}$')
+UPSERT_CHUNK_SIZE = 1000
+
+
+def bar_table_enabled():
+    """Whether readers use the consolidated stock_bar table, set USE_BAR_TABLE=1 once it is migrated"""
+    return os.getenv('USE_BAR_TABLE', '0').lower() in ('1', 'true', 'yes')
+
+
+def create_bar_table(db, bind_key=DataBase.stocks):
+    """Create stock_bar in the bind database if it does not exist yet"""
+    DynamicBase.metadata.create_all(bind=db.get_engine(bind_key), tables=[StockBar.__table__], checkfirst=True)
+
+
+def _to_frame(rows, names):
+    """Rows to a frame with the dtypes read_sql_table gives, NULL bar values as NaN"""
+    df = pd.DataFrame(rows, columns=names)
+    for name in names:
+        if name in ('date', 'created_at', 'updated_at'):
+            df[name] = pd.to_datetime(df[name])
+        elif name in BAR_TABLE_COLUMNS:
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+    return df
+
+
+def symbol_bar_columns(stock_code):
+    """Bar columns of a symbol's per-stock table, index tables (sh000001) have no money flow columns"""
+    if 's' in stock_code:
+        return [name for name in BAR_TABLE_COLUMNS if name not in INDEX_MISSING_COLUMNS]
+    return BAR_TABLE_COLUMNS
+
+
+def read_symbol_bars(db, stock_code, bind_key=DataBase.stocks, start=None, end=None, columns=None):
+    """
+    Bars of one symbol sorted by date, [start, end] inclusive when given.
+
+    Returns the per-stock table layout (date plus the bar columns, no id / stock_code),
+    an empty frame when the symbol has not been migrated. Indexes come without the
+    INDEX_MISSING_COLUMNS, as their per-stock tables.
+    """
+    bar_columns = symbol_bar_columns(stock_code)
+    columns = [name for name in (columns or bar_columns + ['created_at', 'updated_at'])
+               if name != 'date' and (name in bar_columns or name not in BAR_TABLE_COLUMNS)]
+    query = select(StockBar.date, *[getattr(StockBar, name) for name in columns]).where(StockBar.stock_code == stock_code)
+    if start is not None:
+        query = query.where(StockBar.date >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        query = query.where(StockBar.date <= pd.Timestamp(end).to_pydatetime())
+    with get_bind_session(db, bind_key) as session:
+        rows = session.execute(query.order_by(StockBar.date)).all()
+    return _to_frame(rows, ['date'] + columns)
+
+
+def read_date_slice(db, dates, stock_codes=None, bind_key=DataBase.stocks, columns=('close',)):
+    """
+    Cross-sectional read: bars of stock_codes (all symbols when None) on the given dates,
+    served by idx_date_code. Long format, one row per (stock_code, date).
+    """
+    dates = list(pd.to_datetime(pd.Series(list(dates))).dt.to_pydatetime())
+    if len(dates) == 0:
+        return pd.DataFrame(columns=['stock_code', 'date'] + list(columns))
+    query = select(StockBar.stock_code, StockBar.date, *[getattr(StockBar, name) for name in columns]) \
+        .where(StockBar.date.in_(dates))
+    if stock_codes is not None:
+        query = query.where(StockBar.stock_code.in_(list(stock_codes)))
+    with get_bind_session(db, bind_key) as session:
+        rows = session.execute(query.order_by(StockBar.date, StockBar.stock_code)).all()
+    return _to_frame(rows, ['stock_code', 'date'] + list(columns))
+
+
+def _upsert_statement(dialect_name, stmt_table, values=None, from_select=None, names=None):
+    if dialect_name == 'mysql':
+        stmt = mysql_insert(stmt_table)
+        stmt = stmt.values(values) if values is not None else stmt.from_select(names, from_select)
+        updates = dict((name, stmt.inserted[name]) for name in BAR_TABLE_COLUMNS if name in (names or values[0]))
+        updates['updated_at'] = datetime.now()
+        return stmt.on_duplicate_key_update(**updates)
+    # other dialects (local tests) only ever get new keys
+    stmt = insert(stmt_table)
+    return stmt.values(values) if values is not None else stmt.from_select(names, from_select)
+
+
+def upsert_bars(db, stock_code, records, bind_key=DataBase.stocks, chunk_size=UPSERT_CHUNK_SIZE):
+    """Write bar rows (DataFrame with date and any bar columns) of one symbol to stock_bar"""
+    if records is None or len(records) == 0:
+        return 0
+    names = ['date'] + [name for name in BAR_TABLE_COLUMNS if name in records.columns]
+    records = records[names].replace([np.inf, -np.inf], np.nan)
+    records = records.astype(object).where(records.notna(), None)
+    rows = [dict(row, stock_code=stock_code) for row in records.to_dict('records')]
+    with get_bind_session(db, bind_key) as session:
+        dialect_name = session.get_bind().dialect.name
+        for start in range(0, len(rows), chunk_size):
+            session.execute(_upsert_statement(dialect_name, StockBar.__table__, values=rows[start:start + chunk_size]))
+            session.commit()
+    return len(rows)
+
+
+def list_stock_tables(db, bind_key=DataBase.stocks):
+    """Names of the per-stock / per-index tables in the bind database"""
+    return sorted(name for name in inspect(db.get_engine(bind_key)).get_table_names() if STOCK_TABLE_PATTERN.match(name))
+
+
+def migrate_stock_table(db, stock_code, bind_key=DataBase.stocks):
+    """
+    Copy one per-stock table into stock_bar with a single INSERT ... SELECT, rows already
+    there are overwritten, so the migration can be re-run. Returns the affected row count.
+    """
+    names = symbol_bar_columns(stock_code)
+    source = table(stock_code, column('date'), *[column(name) for name in names])
+    from_select = select(literal(stock_code), source.c.date, *[source.c[name] for name in names])
+    with get_bind_session(db, bind_key) as session:
+        dialect_name = session.get_bind().dialect.name
+        stmt = _upsert_statement(dialect_name, StockBar.__table__, from_select=from_select,
+                                 names=['stock_code', 'date'] + names)
+        result = session.execute(stmt)
+        session.commit()
+    return result.rowcount
@@ -1,21 +1,42 @@
+import asyncio
 import json
 import logging
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from time import sleep
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from dateutil.parser import parser
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from data_processing.data_provider.rate_limit import TokenBucket, backoff_delay
+from data_processing.update_stocks.download_mydata_util import filter_new_records, bulk_upsert_records
 from db.mysql.db_schemas import Stock, StockIndex
 from end_points.common.const.consts import DataBase
 from end_points.common.utils.db import update_record
 from end_points.common.utils.http import APIException
+from end_points.get_stock.operations.stock_name_cache import stock_name_cache
 import dotenv
 dotenv.load_dotenv()
 
 md_licence = os.getenv('MAIRUI_TOKEN')
 
+# per-minute call quota of the Mairui licence, shared by all threads and coroutines through self.rate_limiter
+MAIRUI_CALLS_PER_MINUTE = int(os.getenv('MAIRUI_CALLS_PER_MINUTE', 300))
+# keep-alive connections per host, also the default concurrency of the batch fetchers
+MAIRUI_POOL_SIZE = 16
+MAIRUI_TIMEOUT = 30
+MAIRUI_HEADERS = {'content-type': 'application/json'}
+HISTORY_URL = 'http://api.mairuiapi.com/hsstock/history/'
+
+
 class Mairui:
     _instance = None
     _initialized = False
@@ -30,101 +51,57 @@ class Mairui:
             self.period = kwargs["period"]
         else:
             self.period = "daily"
-
-    def addRecord(self, db, class_name, stock_code, se, bind_key, stock_done_record=None):
+        if not self._initialized:
+            # one keep-alive pool for every call of the process instead of a new connection per request
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAIRUI_POOL_SIZE)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.session.headers.update(MAIRUI_HEADERS)
+            self.rate_limiter = TokenBucket(MAIRUI_CALLS_PER_MINUTE)
+            Mairui._initialized = True
+
+    def addRecord(self, db, class_name, stock_code, se, bind_key, stock_done_record=None, start_date=None):
+        # start_date is accepted for the updater, the history endpoints are always read in full
         time_unit = self.get_time_unit(bind_key)
-        updated = False
         print("Start loading record data for: " + stock_code)
         if 's' in stock_code:
             stock_url = 'http://api.mairuiapi.com/hsindex/history/'
             stock_full = stock_code + '.' + se.upper()
             stock_code = stock_code[2:]
             time_unit = 'd'
-            r = self.get_my_data(stock_url, stock_code, time_unit)
-            for each_data in r:
-                date_time = each_data.get('t').split(' ')[0] + ' 00:00:00'
-                query = db.session.query(class_name).filter(class_name.date == date_time).first()
-                if query:
-                    continue
-                if stock_done_record and stock_done_record.starting_date is None:
-                    stock_done_record.starting_date = date_time
-                    db.session.commit()
-                change_rate = None
-                shake_rate = None
-                change_amount = None
-                close = each_data.get('c')
-                p_close = each_data.get('pc')
-                high = each_data.get('h')
-                low = each_data.get('l')
-                if close and p_close and high and low:
-                    shake_rate = round((high-low)*100/p_close, 2)
-                    change_rate = round((close-p_close)*100/p_close, 2)
-                    change_amount = close - p_close
-                record = class_name(
-                    date=date_time,
-                    open=each_data.get('o'),
-                    high=each_data.get('h'),
-                    low=each_data.get('l'),
-                    close=each_data.get('c'),
-                    volume=each_data.get('v'),
-                    turnover=each_data.get('a'),
-                    shake_rate=shake_rate,
-                    change_rate=change_rate,
-                    change_amount=change_amount,
-                )
-                db.session.add(record)
-                updated = True
-            db.session.commit()
+            r = pd.DataFrame(self.get_my_data(stock_url, stock_code, time_unit))
+            if len(r) > 0:
+                r['date'] = r['t'].str.split(' ').str[0]
+            df = filter_new_records(db, class_name, bind_key, r)
+            if len(df) > 0:
+                # rates are only computed when close, pre close, high and low are all non zero
+                valid = (df[['c', 'pc', 'h', 'l']].fillna(0) != 0).all(axis=1)
+                df['shake_rate'] = ((df.h - df.l) * 100 / df.pc).round(2).where(valid)
+                df['change_rate'] = ((df.c - df.pc) * 100 / df.pc).round(2).where(valid)
+                df['change_amount'] = (df.c - df.pc).where(valid)
+                df = df.rename(columns={'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume', 'a': 'turnover'})
         else:
             stock_url = 'http://api.mairuiapi.com/hsrl/ssjy/'
             # stock_url = 'https://api.mairuiapi.com/hsstock/history/'
             stock_full = stock_code + '.' + se.upper()
-            r = [self.get_my_data(stock_url, stock_code, None)]
-            for each_data in r:
-                date_time = each_data.get('t').split(' ')[0] + ' 00:00:00'
-                query = db.session.query(class_name).filter(class_name.date == date_time).first()
-                if query:
-                    continue
-                if stock_done_record and stock_done_record.starting_date is None:
-                    stock_done_record.starting_date = date_time
-                    db.session.commit()
+            each_data = self.get_my_data(stock_url, stock_code, None)
+            date_time = each_data.get('t').split(' ')[0] + ' 00:00:00'
+            df = filter_new_records(db, class_name, bind_key, pd.DataFrame([dict(each_data, date=date_time)]))
+            if len(df) > 0:
                 # get jlrl and zljlrl
                 zj_stock_url = 'http://api.mairuiapi.com/hsstock/history/transaction/'
                 zj_r = self.get_my_data(zj_stock_url, stock_code, None)[0]
                 if zj_r.get('t') != date_time:
                     raise Exception('Mydata get jlrl and zljlrl failed!')
                 jlr = zj_r.get('zmbtdcjl') + zj_r.get('zmbddcjl') + zj_r.get('zmbzdcjl') + zj_r.get('zmbxdcjl') - zj_r.get('zmstdcjl') - zj_r.get('zmsddcjl') - zj_r.get('zmszdcjl') - zj_r.get('zmsxdcjl')
-                jlrl = round(jlr * 100 / each_data.get('v'), 2)
-                zljlrl = round((zj_r.get('zmbtdcjl') + zj_r.get('zmbddcjl') - zj_r.get('zmstdcjl') - zj_r.get('zmsddcjl')) * 100 / each_data.get('v'), 2)
-                # change_rate = None
-                # shake_rate = None
-                # change_amount = None
-                # close = each_data.get('c')
-                # p_close = each_data.get('pc')
-                # high = each_data.get('h')
-                # low = each_data.get('l')
-                # if close and p_close and high and low:
-                #     shake_rate = (high-low)*100/p_close
-                #     change_rate = (close-p_close)*100/p_close
-                #     change_amount = close - p_close
-                record = class_name(
-                    date=date_time,
-                    open=each_data.get('o'),
-                    high=each_data.get('h'),
-                    low=each_data.get('l'),
-                    close=each_data.get('p'),
-                    volume=each_data.get('v'),
-                    turnover=each_data.get('cje'),
-                    shake_rate=each_data.get('zf'),
-                    turnover_rate=each_data.get('hs'),
-                    change_rate=each_data.get('pc'),
-                    change_amount=each_data.get('ud'),
-                    jlrl=jlrl,
-                    zljlrl=zljlrl
-                )
-                db.session.add(record)
-                updated = True
-            db.session.commit()
+                df['jlrl'] = round(jlr * 100 / each_data.get('v'), 2)
+                df['zljlrl'] = round((zj_r.get('zmbtdcjl') + zj_r.get('zmbddcjl') - zj_r.get('zmstdcjl') - zj_r.get('zmsddcjl')) * 100 / each_data.get('v'), 2)
+                df = df.rename(columns={
+                    'o': 'open', 'h': 'high', 'l': 'low', 'p': 'close', 'v': 'volume', 'cje': 'turnover',
+                    'zf': 'shake_rate', 'hs': 'turnover_rate', 'pc': 'change_rate', 'ud': 'change_amount'
+                })
+        updated = bulk_upsert_records(db, class_name, bind_key, df, stock_done_record) > 0
         print("Add record success for: " + stock_full)
         return updated
 
@@ -156,9 +133,10 @@ class Mairui:
     def update_all_stocks_list(self, db):
         print("Start updating all update_stocks list!")
         stock_url = 'http://api.mairuiapi.com/hslt/list/' + md_licence
-        headers = {'content-type': 'application/json'}
+        changed_codes = []
         try:
-            r = requests.get(stock_url, headers=headers)
+            self.rate_limiter.acquire()
+            r = self.session.get(stock_url, timeout=MAIRUI_TIMEOUT)
             if r.status_code != 200:
                 raise Exception('Build norm emr error: status code {}'.format(r.status_code))
             r.encoding = "utf-8"
@@ -174,6 +152,7 @@ class Mairui:
                 record = db.session.query(Stock).filter(Stock.code == clean_code).scalar()
                 if record:
                     if record.name != name:
+                        changed_codes.append(clean_code)
                         old_name = record.name
                         record.name = name
                         print("Updated stock: {} {} with new name: {}".format(clean_code, old_name, name))
@@ -189,6 +168,7 @@ class Mairui:
                         type='s',
                     )
                     db.session.add(new_record)
+                    changed_codes.append(clean_code)
                     print("Added new stock: {} {}".format(clean_code, name))
                 db.session.commit()
 
@@ -201,43 +181,84 @@ class Mairui:
             db.session.rollback()
             # e = APIException('2209')
             rst = e
+        finally:
+            stock_name_cache.invalidate(changed_codes)
         return
 
 
-    def get_my_data(self, base_url, stock_code, time_slot, repeat_time=10, cq='n', start_time=None, end_time=None):
+    @staticmethod
+    def get_url(base_url, stock_code, time_slot, cq='n', start_time=None, end_time=None):
         if time_slot is not None:
             url_sucession = stock_code + '/' + time_slot + '/' + cq + '/' + md_licence
         else:
             url_sucession = stock_code + '/' + md_licence
 
-
+        query = []
         if start_time is not None:
-            url_sucession = url_sucession + '?st=' + start_time
+            query.append('st=' + start_time)
         if end_time is not None:
-            url_sucession = url_sucession + '&et=' + end_time
+            query.append('et=' + end_time)
+        if len(query) > 0:
+            url_sucession = url_sucession + '?' + '&'.join(query)
+        return base_url + url_sucession
+
+    @staticmethod
+    def parse_response(status_code, text):
+        """Decoded result of one response, None when the call should be retried"""
+        if status_code != 200:
+            print(f"Mairui status code {status_code}")
+            return None
+        if text == '102' or text == '101':
+            raise APIException('8802',
+                               'Licence not valid or reached the Limit with status code: {}.'.format(status_code))
+        return json.loads(text)
+
+    @staticmethod
+    def check_results(results, status_code):
+        if results == [] or results == {} or results is None:
+            raise APIException('8803', 'Stock data is empty with status code: {}.'.format(status_code))
+        return results
 
-        stock_url = base_url + url_sucession
-        headers = {'content-type': 'application/json'}
-        # get stock basic
+    def get_my_data(self, base_url, stock_code, time_slot, repeat_time=10, cq='n', start_time=None, end_time=None):
+        stock_url = self.get_url(base_url, stock_code, time_slot, cq, start_time, end_time)
+        results, status_code = None, None
         for i in range(repeat_time):
-            sleep(0.5)
-            results = None
-            r = requests.get(stock_url, headers=headers)
-            r.encoding = "utf-8"
-            if r.status_code != 200:
-                print(r)
-                # raise APIException('8801', 'Get data frm mydata server failed with status code: {}.'.format(r.status_code))
-            elif r.text == '102' or r.text == '101':
-                raise APIException('8802',
-                                   'Licence not valid or reached the Limit with status code: {}.'.format(r.status_code))
-            else:
-                results = json.loads(r.text)
+            # the quota is enforced by the bucket, only failed attempts back off
+            self.rate_limiter.acquire()
+            try:
+                r = self.session.get(stock_url, timeout=MAIRUI_TIMEOUT)
+                r.encoding = "utf-8"
+                status_code = r.status_code
+                results = self.parse_response(status_code, r.text)
+            except (requests.RequestException, ValueError) as e:
+                print(f"Mairui request failed for {stock_code}: {e}")
+                results = None
             if results is not None:
                 break
-        if results == [] or results == {} or results is None:
-            print(r)
-            raise APIException('8803', 'Stock data is empty with status code: {}.'.format(r.status_code))
-        return results
+            if i < repeat_time - 1:
+                sleep(backoff_delay(i, base=0.5, cap=10))
+        return self.check_results(results, status_code)
+
+    async def get_my_data_async(self, client, base_url, stock_code, time_slot, repeat_time=10, cq='n',
+                                start_time=None, end_time=None):
+        """get_my_data on an httpx.AsyncClient, same retries, limiter and errors"""
+        stock_url = self.get_url(base_url, stock_code, time_slot, cq, start_time, end_time)
+        results, status_code = None, None
+        for i in range(repeat_time):
+            await self.rate_limiter.acquire_async()
+            try:
+                r = await client.get(stock_url)
+                r.encoding = "utf-8"
+                status_code = r.status_code
+                results = self.parse_response(status_code, r.text)
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"Mairui request failed for {stock_code}: {e}")
+                results = None
+            if results is not None:
+                break
+            if i < repeat_time - 1:
+                await asyncio.sleep(backoff_delay(i, base=0.5, cap=10))
+        return self.check_results(results, status_code)
 
 
     def get_latest_date(self, stock_code, se, bind_key=DataBase.stocks):
@@ -300,9 +321,9 @@ class Mairui:
     def update_index_list(self, db):
         print("Start updating index list!")
         stock_url = 'https://api.mairuiapi.com/hszg/list/' + md_licence
-        headers = {'content-type': 'application/json'}
         try:
-            r = requests.get(stock_url, headers=headers)
+            self.rate_limiter.acquire()
+            r = self.session.get(stock_url, timeout=MAIRUI_TIMEOUT)
             if r.status_code != 200:
                 raise Exception('Build norm emr error: status code {}'.format(r.status_code))
             r.encoding = "utf-8"
@@ -360,9 +381,9 @@ class Mairui:
         # zhishu_000905 中证500
         stock_url = 'http://api.mairuiapi.com/hszg/gg/hs300/' + md_licence
         # stock_url = 'http://api.mairuiapi.com/hszg/list/' + md_licence
-        headers = {'content-type': 'application/json'}
         try:
-            r = requests.get(stock_url, headers=headers)
+            self.rate_limiter.acquire()
+            r = self.session.get(stock_url, timeout=MAIRUI_TIMEOUT)
             if r.status_code != 200:
                 raise Exception('Build norm emr error: status code {}'.format(r.status_code))
             r.encoding = "utf-8"
@@ -399,6 +420,51 @@ class Mairui:
         return
 
     def get_stock_history(self, symbol, start_time, end_time, time_slot):
-        base_url = "http://api.mairuiapi.com/hsstock/history/"
-        results = self.get_my_data(base_url, symbol, time_slot, start_time=start_time, end_time=end_time)
+        results = self.get_my_data(HISTORY_URL, symbol, time_slot, start_time=start_time, end_time=end_time)
         return results
+
+    def get_history_batch(self, history_requests, concurrency=MAIRUI_POOL_SIZE):
+        """
+        Fetch many (symbol, time_slot, start_time, end_time) histories concurrently over the
+        pooled session. Throughput is bounded by self.rate_limiter, not by the number of
+        requests. Returns one entry per request in order: the results, or the exception
+        raised for that request.
+        """
+        def fetch(request):
+            symbol, time_slot, start_time, end_time = request
+            try:
+                return self.get_stock_history(symbol, start_time, end_time, time_slot)
+            except Exception as e:
+                print(f"Mairui history failed for {symbol}: {e}")
+                return e
+
+        history_requests = list(history_requests)
+        if len(history_requests) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(history_requests))) as executor:
+            return list(executor.map(fetch, history_requests))
+
+    async def get_history_batch_async(self, history_requests, concurrency=MAIRUI_POOL_SIZE):
+        """
+        get_history_batch for coroutines: one httpx.AsyncClient keeps the connections alive and
+        a semaphore caps the requests in flight. Falls back to the threaded batch when httpx
+        is not installed.
+        """
+        history_requests = list(history_requests)
+        if httpx is None:
+            return await asyncio.to_thread(self.get_history_batch, history_requests, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(headers=MAIRUI_HEADERS, timeout=MAIRUI_TIMEOUT, limits=limits) as client:
+            async def fetch(request):
+                symbol, time_slot, start_time, end_time = request
+                async with semaphore:
+                    try:
+                        return await self.get_my_data_async(client, HISTORY_URL, symbol, time_slot,
+                                                            start_time=start_time, end_time=end_time)
+                    except Exception as e:
+                        print(f"Mairui history failed for {symbol}: {e}")
+                        return e
+
+            return list(await asyncio.gather(*[fetch(request) for request in history_requests]))
@@ -0,0 +1,61 @@
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by all workers calling one provider.
+
+    Tokens refill continuously at calls_per_minute / 60 per second up to `burst`,
+    acquire() blocks until enough tokens are available, so the long-run call rate
+    never exceeds the provider quota however many workers share the bucket.
+    """
+
+    def __init__(self, calls_per_minute, burst=None):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, calls_per_minute // 10))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, tokens):
+        """Take the tokens if available (returns 0), else the seconds until they will be"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Take `tokens` tokens, sleeping while the bucket is short, returns the seconds waited"""
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            wait = self._take(tokens)
+            if wait == 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens=1):
+        """acquire() for coroutines, waits with asyncio.sleep so the event loop keeps running"""
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            wait = self._take(tokens)
+            if wait == 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2 ** attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,284 @@
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# seconds an API response stays fresh, per Tushare api_name
+RESPONSE_TTLS = {
+    'stock_basic': 24 * 3600,
+    'daily': 10 * 60,
+    'moneyflow': 10 * 60,
+    'stk_factor': 10 * 60,
+    'balancesheet': 7 * 24 * 3600,
+    'income': 7 * 24 * 3600,
+    'cashflow': 7 * 24 * 3600,
+}
+DEFAULT_TTL = 10 * 60
+# expired rows are purged every this many writes
+PURGE_EVERY = 500
+# hit / miss counters are written to the shared file every this many lookups
+STATS_FLUSH_EVERY = 100
+
+
+def default_cache_path():
+    root = os.getenv('BAR_STORE_DIR') or os.path.join(os.path.dirname(__file__), 'data_cache', 'bars')
+    return os.path.join(os.path.dirname(root), 'responses', 'tushare.sqlite')
+
+
+def cache_key(api_name, params):
+    """Stable key of one call: the api name plus its parameters in sorted order"""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return f"{api_name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class ResponseCache(ABC):
+    """
+    Cache of API responses keyed on (api_name, params) with a TTL per api_name.
+
+    Subclasses store pickled values through _load / _store; hits and misses are
+    counted per api_name in this process, and by shared backends in their storage.
+    """
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(RESPONSE_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def ttl(self, api_name):
+        return self.ttls.get(api_name, self.default_ttl)
+
+    def _count(self, api_name, outcome):
+        with self._stats_lock:
+            counters = self._stats.setdefault(api_name, {'hits': 0, 'misses': 0})
+            counters[outcome] += 1
+
+    def get(self, api_name, params):
+        """Cached value of the call, None on a miss or an expired entry"""
+        blob = self._load(cache_key(api_name, params), time.time())
+        self._count(api_name, 'misses' if blob is None else 'hits')
+        return None if blob is None else pickle.loads(blob)
+
+    def set(self, api_name, params, value):
+        ttl = self.ttl(api_name)
+        if ttl <= 0:
+            return
+        self._store(cache_key(api_name, params), api_name, time.time() + ttl,
+                    pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_or_fetch(self, api_name, params, fetch):
+        """Cached value of the call, else fetch() stored under the api TTL. Failed fetches are not cached."""
+        value = self.get(api_name, params)
+        if value is None:
+            value = fetch()
+            if value is not None:
+                self.set(api_name, params, value)
+        return value
+
+    def stats(self):
+        """{api_name: {'hits', 'misses'}} plus the process totals under 'total'"""
+        with self._stats_lock:
+            stats = dict((api_name, dict(counters)) for api_name, counters in self._stats.items())
+        stats['total'] = {
+            'hits': sum(counters['hits'] for counters in stats.values()),
+            'misses': sum(counters['misses'] for counters in stats.values()),
+        }
+        return stats
+
+    def shared_stats(self):
+        """{api_name: {'hits', 'misses'}} of every process using the cache, this process only here"""
+        stats = self.stats()
+        stats.pop('total')
+        return stats
+
+    @abstractmethod
+    def _load(self, key, now):
+        """Stored blob of key if it has not expired at now, else None"""
+
+    @abstractmethod
+    def _store(self, key, api_name, expires_at, blob):
+        """Store blob under key until expires_at"""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every entry"""
+
+
+class MemoryResponseCache(ResponseCache):
+    """Per-process cache, for tests or when the disk cache is not wanted"""
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        super().__init__(ttls, default_ttl)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _load(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                return None
+            return entry[1]
+
+    def _store(self, key, api_name, expires_at, blob):
+        with self._lock:
+            self._entries[key] = (expires_at, blob)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    On-disk cache in one SQLite file in WAL mode, so the FastAPI process and the MCP
+    stdio subprocesses share entries. One connection per thread. Hits and misses are
+    also counted in the file, so shared_stats covers every process using it: they are
+    added up in memory and written every STATS_FLUSH_EVERY lookups, by shared_stats and
+    at exit, so a lookup is a read only. Another process's counters can lag by up to
+    STATS_FLUSH_EVERY lookups until it flushes.
+    """
+
+    def __init__(self, path=None, ttls=None, default_ttl=DEFAULT_TTL):
+        super().__init__(ttls, default_ttl)
+        self.path = path or default_cache_path()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._pending = {}
+        self._pending_lookups = 0
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS response_cache ('
+                         'key TEXT PRIMARY KEY, api_name TEXT NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_stats ('
+                         'api_name TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL)')
+        atexit.register(self.flush_stats)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, api_name, outcome):
+        super()._count(api_name, outcome)
+        with self._stats_lock:
+            counters = self._pending.setdefault(api_name, {'hits': 0, 'misses': 0})
+            counters[outcome] += 1
+            self._pending_lookups += 1
+            flush = self._pending_lookups >= STATS_FLUSH_EVERY
+        if flush:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add the counters of this process not written yet to the file, in one transaction"""
+        with self._stats_lock:
+            pending, self._pending, self._pending_lookups = self._pending, {}, 0
+        if len(pending) == 0:
+            return
+        try:
+            with self._connection() as conn:
+                conn.executemany('INSERT INTO cache_stats (api_name, hits, misses) VALUES (?, ?, ?) '
+                                 'ON CONFLICT(api_name) DO UPDATE SET hits = hits + excluded.hits, '
+                                 'misses = misses + excluded.misses',
+                                 [(api_name, counters['hits'], counters['misses'])
+                                  for api_name, counters in pending.items()])
+        except sqlite3.Error as e:
+            print(f"⚠️ 缓存命中统计未更新: {e}")
+
+    def shared_stats(self):
+        self.flush_stats()
+        rows = self._connection().execute('SELECT api_name, hits, misses FROM cache_stats').fetchall()
+        return dict((api_name, {'hits': hits, 'misses': misses}) for api_name, hits, misses in rows)
+
+    def _load(self, key, now):
+        row = self._connection().execute(
+            'SELECT value FROM response_cache WHERE key = ? AND expires_at >= ?', (key, now)).fetchone()
+        return None if row is None else row[0]
+
+    def _store(self, key, api_name, expires_at, blob):
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO response_cache (key, api_name, expires_at, value) VALUES (?, ?, ?, ?)',
+                         (key, api_name, expires_at, sqlite3.Binary(blob)))
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                conn.execute('DELETE FROM response_cache WHERE expires_at < ?', (time.time(),))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM response_cache')
+
+
+def make_response_cache(backend=None):
+    """Cache selected by TUSHARE_CACHE: 'sqlite' (default), 'memory' or 'none' (returns None)"""
+    backend = (backend or os.getenv('TUSHARE_CACHE', 'sqlite')).lower()
+    if backend in ('none', 'off', '0'):
+        return None
+    if backend == 'memory':
+        return MemoryResponseCache()
+    try:
+        return SQLiteResponseCache(os.getenv('TUSHARE_CACHE_PATH'))
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Tushare 响应缓存不可用，改用进程内缓存: {e}")
+        return MemoryResponseCache()
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide Tushare response cache (make_response_cache), None when disabled"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = make_response_cache() or False
+        return _response_cache or None
+
+
+def format_hit_rate(hits, misses):
+    total = hits + misses
+    return f"{hits}/{total} hits ({hits * 100 / total:.0f}%)" if total else "no calls"
+
+
+def cache_snapshot(cache):
+    """shared_stats of cache, taken before a run and passed to cache_report after it"""
+    if cache is None:
+        return None
+    try:
+        return cache.shared_stats()
+    except sqlite3.Error:
+        return None
+
+
+def cache_report(label, before, after):
+    """One log line with the hit rate of every api between two snapshots, None when nothing was called"""
+    if before is None or after is None:
+        return None
+    deltas = {}
+    for api_name, counters in after.items():
+        previous = before.get(api_name, {'hits': 0, 'misses': 0})
+        hits, misses = counters['hits'] - previous['hits'], counters['misses'] - previous['misses']
+        if hits + misses > 0:
+            deltas[api_name] = (hits, misses)
+    if len(deltas) == 0:
+        return None
+    total = format_hit_rate(sum(hits for hits, _ in deltas.values()), sum(misses for _, misses in deltas.values()))
+    per_api = ', '.join(f"{api_name} {format_hit_rate(hits, misses)}" for api_name, (hits, misses) in sorted(deltas.items()))
+    return f"{label}: {total}; {per_api}"
+
+
+def response_cache_snapshot():
+    return cache_snapshot(get_response_cache())
+
+
+def response_cache_report(before):
+    """Hit rate of the Tushare response cache since the `before` snapshot, across processes"""
+    return cache_report('Tushare response cache', before, response_cache_snapshot())
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_processing.data_provider.bar_store import BAR_PUBLISH_HOUR, DATE_FORMAT
+
+CALENDAR_EXCHANGE = 'SSE'
+# first trading day of the Shanghai exchange
+CALENDAR_START = np.datetime64('1990-12-19', 'D')
+# years per trade_cal call, keeps each response well below the row limit
+CALENDAR_FETCH_YEARS = 10
+# seconds a weekday fallback calendar is served before the exchange calendar is fetched again
+CALENDAR_RETRY_SECONDS = 60
+
+
+def default_calendar_path(exchange=CALENDAR_EXCHANGE):
+    root = os.getenv('BAR_STORE_DIR') or os.path.join(os.path.dirname(__file__), 'data_cache', 'bars')
+    return os.path.join(os.path.dirname(root), 'calendar', f'{exchange}.json')
+
+
+def to_days(the_dates):
+    """
+    Vectorized conversion of dates (datetime64 array/Series, Timestamps, datetimes or strings)
+    to a datetime64[D] array. ISO strings are sliced and cast in one numpy call, anything
+    else goes through pandas.
+    """
+    if isinstance(the_dates, (pd.Series, pd.Index, np.ndarray)) and the_dates.dtype.kind == 'M':
+        return np.asarray(the_dates).astype('datetime64[D]')
+    values = list(the_dates)
+    if len(values) == 0:
+        return np.array([], dtype='datetime64[D]')
+    if all(isinstance(value, str) and len(value) >= 10 and value[4] == '-' and value[7] == '-' for value in values):
+        try:
+            return np.array([value[:10] for value in values], dtype='datetime64[D]')
+        except ValueError:
+            pass
+    converted = pd.to_datetime(pd.Series(values, dtype=object), format='mixed')
+    return converted.values.astype('datetime64[D]')
+
+
+def format_days(days):
+    """datetime64[D] days as format_date strings ('%Y-%m-%dT00:00:00'), without a strftime per item"""
+    return [label + 'T00:00:00' for label in np.datetime_as_string(np.asarray(days, dtype='datetime64[D]'), unit='D')]
+
+
+class TradingCalendar:
+    """
+    Sorted trading days with precomputed lookups.
+
+    Every calendar day between the first and the last trading day is mapped to the index
+    of the last trading day on or before it, so "N trading days later" and the latest
+    published trading day are O(1) array lookups.
+    """
+
+    def __init__(self, days, exact=True):
+        self.days = np.unique(np.asarray(days, dtype='datetime64[D]'))
+        # False when built from weekdays because the exchange calendar was unavailable
+        self.exact = exact
+        if len(self.days) == 0:
+            raise ValueError('a trading calendar needs at least one day')
+        self.first, self.last = self.days[0], self.days[-1]
+        offsets = (self.days - self.first).astype(np.int64)
+        is_open = np.zeros(offsets[-1] + 1, dtype=bool)
+        is_open[offsets] = True
+        self._on_or_before = np.cumsum(is_open).astype(np.int32) - 1
+
+    @classmethod
+    def from_weekdays(cls, start, end):
+        """Monday to Friday, a superset of the trading days without the exchange holidays"""
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        return cls(days[np.is_busday(days)], exact=False)
+
+    def __len__(self):
+        return len(self.days)
+
+    def _offsets(self, days):
+        return (days - self.first).astype(np.int64)
+
+    def date_at(self, index):
+        return pd.Timestamp(self.days[index])
+
+    def on_or_before(self, the_date):
+        """Index of the last trading day on or before the_date, -1 before the first one"""
+        offset = self._offsets(to_days([the_date]))[0]
+        if offset < 0:
+            return -1
+        return int(self._on_or_before[min(offset, len(self._on_or_before) - 1)])
+
+    def add_trading_days(self, the_date, n):
+        """
+        The trading day n trading days after (n < 0: before) the_date, counted from the last
+        trading day on or before it. None outside the calendar.
+        """
+        index = self.on_or_before(the_date)
+        if index < 0:
+            return None
+        index += n
+        return self.date_at(index) if 0 <= index < len(self.days) else None
+
+    def latest_trading_day(self, now=None):
+        """Latest trading day whose daily bars are published (after BAR_PUBLISH_HOUR)"""
+        now = now or datetime.now()
+        day = now if now.hour >= BAR_PUBLISH_HOUR else now - timedelta(days=1)
+        index = self.on_or_before(day.date())
+        return self.date_at(index) if index >= 0 else None
+
+
+def fetch_trading_days(exchange=CALENDAR_EXCHANGE, end=None):
+    """Open days of the exchange from CALENDAR_START to end (default: end of this year) from Tushare"""
+    from data_processing.data_provider.tushare import Tushare
+    data_tool = Tushare()
+    end = np.datetime64(end or f'{datetime.now().year}-12-31', 'D')
+    days = []
+    start_year = CALENDAR_START.astype(object).year
+    for year in range(start_year, end.astype(object).year + 1, CALENDAR_FETCH_YEARS):
+        start_date = max(CALENDAR_START, np.datetime64(f'{year}-01-01', 'D'))
+        end_date = min(end, np.datetime64(f'{year + CALENDAR_FETCH_YEARS - 1}-12-31', 'D'))
+        data_tool.rate_limiter.acquire()
+        cal = data_tool.pro.trade_cal(exchange=exchange, start_date=start_date.astype(object).strftime(DATE_FORMAT),
+                                      end_date=end_date.astype(object).strftime(DATE_FORMAT), is_open='1')
+        days.extend(cal['cal_date'].tolist())
+    return np.array([datetime.strptime(day, DATE_FORMAT).date() for day in days], dtype='datetime64[D]'), end
+
+
+def load_trading_calendar(exchange=CALENDAR_EXCHANGE, path=None):
+    """
+    Exchange calendar from the local cache, refreshed from Tushare once the cached range has
+    ended. Falls back to a weekday calendar (exact=False) when it cannot be fetched.
+    """
+    path = path or default_calendar_path(exchange)
+    today = np.datetime64(datetime.now().date(), 'D')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if np.datetime64(cached['synced_end'], 'D') >= today:
+            return TradingCalendar(np.array(cached['days'], dtype='datetime64[D]'))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    try:
+        days, end = fetch_trading_days(exchange)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'exchange': exchange, 'synced_end': str(end), 'days': [str(day) for day in days]}, f)
+        os.replace(tmp_path, path)
+        return TradingCalendar(days)
+    except Exception as e:
+        print(f"⚠️ 交易日历获取失败，使用工作日近似: {e}")
+        return TradingCalendar.from_weekdays(CALENDAR_START, f'{datetime.now().year}-12-31')
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def get_trading_calendar(exchange=CALENDAR_EXCHANGE):
+    """
+    Process-wide TradingCalendar of the exchange, loaded once a day. A weekday fallback
+    (exact=False) is not kept for the day, it is loaded again CALENDAR_RETRY_SECONDS later.
+    """
+    today = datetime.now().date()
+    now = time.monotonic()
+    with _calendars_lock:
+        loaded = _calendars.get(exchange)
+        if loaded is None or loaded[0] != today or (not loaded[1].exact and now >= loaded[2]):
+            loaded = _calendars[exchange] = (today, load_trading_calendar(exchange), now + CALENDAR_RETRY_SECONDS)
+        return loaded[1]
@@ -13,10 +13,37 @@ import tushare as ts
 import dotenv
 
 from db.mysql.db_schemas import Stock
-from end_points.common.utils.db import update_record, get_bind_session
+from end_points.get_stock.operations.stock_name_cache import stock_name_cache
+from data_processing.data_provider.bar_store import BarStore, BAR_COLUMNS, DATE_FORMAT, normalize_bars
+from data_processing.data_provider.rate_limit import TokenBucket
+from data_processing.data_provider.response_cache import get_response_cache
+from data_processing.data_provider.trading_calendar import get_trading_calendar
+from data_processing.update_stocks.download_mydata_util import filter_new_records, bulk_upsert_records, bulk_update_columns
+from end_points.common.const.consts import DataBase
 
 dotenv.load_dotenv()
 
+# most rows a single index_dailybasic call returns
+INDEX_BASIC_PAGE_SIZE = 3000
+# per-minute call quota of the Tushare account, shared by all threads through self.rate_limiter
+TUSHARE_CALLS_PER_MINUTE = int(os.getenv('TUSHARE_CALLS_PER_MINUTE', 200))
+
+# money-flow columns derived from moneyflow + daily
+MONEY_FLOW_COLUMNS = ['jlrl', 'zljlrl']
+
+
+def money_flow_fields(df):
+    """
+    jlrl (net inflow volume %) and zljlrl (main-force net inflow amount %) of rows joining
+    moneyflow and daily on trade_date, computed on whole columns and rounded to 2 decimals.
+    """
+    zl = df.buy_elg_amount - df.sell_elg_amount + df.buy_lg_amount - df.sell_lg_amount
+    return pd.DataFrame({
+        'jlrl': (df.net_mf_vol * 100 / df.vol).round(2),
+        'zljlrl': (zl * 1000 / df.amount).round(2),
+    }, index=df.index)
+
+
 class Tushare:
     _instance = None
     _initialized = False
@@ -44,8 +71,29 @@ class Tushare:
                 print(f"Using {self.adj} method.")
             else:
                 self.adj = None
+            self.bar_store = BarStore()
+            self.rate_limiter = TokenBucket(TUSHARE_CALLS_PER_MINUTE)
+            # (api_name, params) -> response, shared with the MCP subprocesses through the disk backend
+            self.response_cache = get_response_cache()
             Tushare._initialized = True
 
+    def cached_query(self, api_name, **params):
+        """self.pro.<api_name>(**params) through the response cache, misses count against the quota"""
+        def fetch():
+            self.rate_limiter.acquire()
+            return getattr(self.pro, api_name)(**params)
+
+        if self.response_cache is None:
+            return fetch()
+        return self.response_cache.get_or_fetch(api_name, params, fetch)
+
+    def cache_stats(self):
+        """
+        Hit / miss counters of the response cache per api_name, counted by every process
+        sharing the SQLite file (this process only with TUSHARE_CACHE=memory), empty when disabled
+        """
+        return self.response_cache.shared_stats() if self.response_cache is not None else {}
+
     def get_data(self, id) -> pd.DataFrame:
         # df1 = ts.pro_bar(ts_code=id, start_date=self.start_date,end_date='20180101')
         # dfb=pd.concat([df, df1], ignore_index=True)
@@ -67,11 +115,11 @@ class Tushare:
         for i in tqdm(ticker_list, total=len(ticker_list)):
             # nonstandard_id = self.transfer_standard_ticker_to_nonstandard(i)
             # df_temp = self.get_data(nonstandard_id)
+            self.rate_limiter.acquire()
             df_temp = self.get_data(i)
             # self.dataframe = self.dataframe.append(df_temp)
             self.dataframe = pd.concat([self.dataframe, df_temp])
             # print("{} ok".format(i))
-            time.sleep(0.25)
 
         self.dataframe.columns = [
             "tic",
@@ -153,162 +201,155 @@ class Tushare:
             "tic" in columns and "time" in columns and "close" in columns
         )  # input file must have "tic","time" and "close" columns
 
-    def addRecord(self, db, class_name, stock_code, se, bind_key, stock_done_record=None):
-        print("Start loading record data for: " + stock_code + '......')
-        updated = False
-
-        with get_bind_session(db, bind_key) as session:
-            if 's' in stock_code:
-                stock_code = stock_code[2:]
-                symbol = stock_code + '.' + se.upper()
-                df = self.pro.index_daily(ts_code=symbol).sort_values(by=['trade_date'])
-                for index, each_data in df.iterrows():
-                    date_time = each_data['trade_date']
-                    # date_time = '1992-10-20 00:00:00'
-                    query = session.query(class_name).filter(class_name.date == date_time).first()
-                    if query:
-                        continue
-                    if stock_done_record and stock_done_record.starting_date is None:
-                        stock_done_record.starting_date = date_time
-                        db.session.commit()
-                    shake_rate = round((each_data.high - each_data.low) * 100 / each_data.pre_close, 2)
-                    df2 = self.pro.index_dailybasic(ts_code=symbol, trade_date=date_time).squeeze()
-                    record = class_name(
-                        date=date_time,
-                        open=each_data.open,
-                        high=each_data.high,
-                        low=each_data.low,
-                        close=each_data.close,
-                        volume=each_data.vol,
-                        turnover=each_data.amount*1000,
-                        turnover_rate=df2.turnover_rate if df2.empty == False else None,
-                        shake_rate=shake_rate,
-                        change_rate=each_data.pct_chg,
-                        change_amount=each_data.change,
-                    )
-                    session.add(record)
-                    session.commit()
-                    updated = True
-            else:
-                symbol = stock_code + '.' + se.upper()
-                # df = self.pro.daily(ts_code=symbol).sort_values(by=['trade_date'])
-                df = ts.pro_bar(ts_code=symbol, factors=['tor', 'vr'])
-                df2 = self.pro.moneyflow(ts_code=symbol)
-                df = df.merge(df2, on='trade_date')
-                df['zl'] = df.buy_elg_amount - df.sell_elg_amount + df.buy_lg_amount - df.sell_lg_amount
-                df['jlrl'] = df.net_mf_vol * 100 / df.vol
-                df['zljlrl'] = df.zl * 1000 / df.amount
-                df = df.sort_values(by=['trade_date']).round({'jlrl': 2, 'zljlrl': 2})
-                # df.fillna(0)
-                df = df.replace({np.nan: None})#replace all nan to None, and colume dtype became object
-                for _, each_data in df.iterrows():
-                    date_time = each_data['trade_date']
-                    query = session.query(class_name).filter(class_name.date == date_time).first()
-                    if query:
-                        continue
-                    if stock_done_record and stock_done_record.starting_date is None:
-                        stock_done_record.starting_date = date_time
-                        db.session.commit()
-                    if each_data.high is None or each_data.low is None or each_data.pre_close is None:
-                        shake_rate = None
-                    else:
-                        shake_rate = round((each_data.high - each_data.low) * 100 / each_data.pre_close, 2)
-                    # df2 = self.pro.daily_basic(ts_code=symbol, trade_date=date_time).squeeze()
-                    record = class_name(
-                        date=date_time,
-                        open=each_data.open,
-                        high=each_data.high,
-                        low=each_data.low,
-                        close=each_data.close,
-                        volume=each_data.vol,
-                        turnover=each_data.amount * 1000,
-                        turnover_rate=each_data.turnover_rate,
-                        shake_rate=shake_rate,
-                        jlrl=each_data.jlrl,
-                        zljlrl=each_data.zljlrl,
-                        change_rate=each_data.pct_chg,
-                        change_amount=each_data.change,
-                    )
-                    session.add(record)
-                    updated = True
-            session.commit()
-            print("Add record success for: " + stock_code)
+    def addRecord(self, db, class_name, stock_code, se, bind_key, stock_done_record=None, start_date=None):
+        """
+        Set-based ingestion: the stored dates are fetched once and diffed in pandas, the
+        new rows are written by bulk_upsert_records in chunks, index basics come from one
+        ranged index_dailybasic call instead of one call per new day.
 
+        start_date (datetime, optional) limits the download to the days from start_date on,
+        e.g. the missing range found by plan_stale_stocks.
+        """
+        print("Start loading record data for: " + stock_code + '......')
+        start_date = start_date.strftime(DATE_FORMAT) if start_date is not None else None
+        if 's' in stock_code:
+            stock_code = stock_code[2:]
+            symbol = stock_code + '.' + se.upper()
+            self.rate_limiter.acquire()
+            df = self.pro.index_daily(ts_code=symbol, start_date=start_date)
+            df['date'] = pd.to_datetime(df['trade_date'], format=DATE_FORMAT)
+            df = filter_new_records(db, class_name, bind_key, df)
+            if len(df) > 0:
+                basic = self.get_index_dailybasic(symbol, df['date'].iloc[0], df['date'].iloc[-1])
+                df = df.merge(basic, on='date', how='left')
+        else:
+            symbol = stock_code + '.' + se.upper()
+            # df = self.pro.daily(ts_code=symbol).sort_values(by=['trade_date'])
+            # pro_bar with factors is a daily and a daily_basic call
+            self.rate_limiter.acquire(3)
+            df = ts.pro_bar(ts_code=symbol, start_date=start_date, factors=['tor', 'vr'])
+            df2 = self.pro.moneyflow(ts_code=symbol, start_date=start_date)
+            df = df.merge(df2, on='trade_date')
+            df['date'] = pd.to_datetime(df['trade_date'], format=DATE_FORMAT)
+            df = filter_new_records(db, class_name, bind_key, df)
+            if len(df) > 0:
+                df[MONEY_FLOW_COLUMNS] = money_flow_fields(df)
+
+        if len(df) > 0:
+            df['shake_rate'] = ((df.high - df.low) * 100 / df.pre_close).round(2)
+            df = df.rename(columns={'vol': 'volume', 'pct_chg': 'change_rate', 'change': 'change_amount'})
+            df['turnover'] = df.amount * 1000
+        updated = bulk_upsert_records(db, class_name, bind_key, df, stock_done_record) > 0
+        print("Add record success for: " + stock_code)
         return updated
 
-    def updateZJ(self, db, class_name, stock_code, se, dates_to_fill):
-        print("Start loading ZJ data for: " + stock_code)
-        symbol = stock_code + '.' + se.upper()
-        df = self.pro.moneyflow(ts_code=symbol)
-        df['zl'] = df.buy_elg_amount - df.sell_elg_amount + df.buy_lg_amount - df.sell_lg_amount
-        df2 = self.pro.daily(ts_code=symbol)
-        df = df.merge(df2, on='trade_date')
-        df_new = pd.DataFrame([])
-        df_new['date'] = df['trade_date']
-        df_new['jlrl'] = df.net_mf_vol*100/df.vol
-        df_new['zljlrl'] = df.zl * 1000 / df.amount
-
-        df_new = df_new.sort_values(by=['date']).round({'jlrl': 2, 'zljlrl': 2})
-        updated = False
-        for _, each_data in df_new.iterrows():
-            date_time = each_data['date']
-            compare_date = parser().parse(date_time)
-            if compare_date in dates_to_fill and each_data.isna().any() == False:
-                query = db.session.query(class_name).filter(class_name.date == date_time).first()
-                if not query:
-                    continue
-                items = ['jlrl', 'zljlrl']
-                update_record(query, items, each_data)
-                updated = True
-        db.session.commit()
-        if updated == True:
+    def get_index_dailybasic(self, symbol, start_date, end_date):
+        """
+        Index daily basics (date, turnover_rate) between start_date and end_date. One ranged
+        call covers INDEX_BASIC_PAGE_SIZE days, longer ranges are paged backwards from end_date.
+        """
+        pages = []
+        end_date = pd.Timestamp(end_date)
+        while end_date >= start_date:
+            self.rate_limiter.acquire()
+            r = self.pro.index_dailybasic(ts_code=symbol, start_date=start_date.strftime(DATE_FORMAT),
+                                          end_date=end_date.strftime(DATE_FORMAT))
+            if r is None or len(r) == 0:
+                break
+            r = r[['trade_date', 'turnover_rate']].copy()
+            r['date'] = pd.to_datetime(r['trade_date'], format=DATE_FORMAT)
+            pages.append(r[['date', 'turnover_rate']])
+            if len(r) < INDEX_BASIC_PAGE_SIZE:
+                break
+            end_date = r['date'].min() - timedelta(days=1)
+        if len(pages) == 0:
+            return pd.DataFrame(columns=['date', 'turnover_rate'])
+        return pd.concat(pages).drop_duplicates(subset=['date'])
+
+    def get_money_flow(self, symbol, start_date=None, end_date=None):
+        """
+        date, jlrl, zljlrl of one symbol (000001.SZ) between start_date and end_date
+        (datetimes, open ended when None): one ranged moneyflow and one ranged daily call.
+        """
+        params = {'ts_code': symbol}
+        if start_date is not None:
+            params['start_date'] = pd.Timestamp(start_date).strftime(DATE_FORMAT)
+        if end_date is not None:
+            params['end_date'] = pd.Timestamp(end_date).strftime(DATE_FORMAT)
+        self.rate_limiter.acquire(2)
+        df = self.pro.moneyflow(**params).merge(self.pro.daily(**params), on=['ts_code', 'trade_date'])
+        return self._money_flow_frame(df)
+
+    def get_money_flow_by_dates(self, start_date, end_date=None):
+        """
+        stock_code, date, jlrl, zljlrl of the whole market for the trading days between
+        start_date and end_date (default: latest trading day): one moneyflow and one daily
+        call per trading day instead of per symbol, for backfilling a short range of the universe.
+        """
+        calendar = get_trading_calendar()
+        end_date = end_date or calendar.latest_trading_day()
+        days = calendar.days[(calendar.days >= np.datetime64(pd.Timestamp(start_date).date(), 'D')) &
+                             (calendar.days <= np.datetime64(pd.Timestamp(end_date).date(), 'D'))]
+        frames = []
+        for day in days:
+            trade_date = pd.Timestamp(day).strftime(DATE_FORMAT)
+            self.rate_limiter.acquire(2)
+            df = self.pro.moneyflow(trade_date=trade_date).merge(self.pro.daily(trade_date=trade_date),
+                                                                 on=['ts_code', 'trade_date'])
+            frames.append(self._money_flow_frame(df))
+        if len(frames) == 0:
+            return pd.DataFrame(columns=['stock_code', 'date'] + MONEY_FLOW_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _money_flow_frame(df):
+        flows = money_flow_fields(df)
+        flows['date'] = pd.to_datetime(df['trade_date'], format=DATE_FORMAT)
+        flows['stock_code'] = df['ts_code'].str.split('.').str[0]
+        # incomplete rows are skipped, not written as NULL
+        return flows.dropna(subset=MONEY_FLOW_COLUMNS).sort_values(by=['date']).reset_index(drop=True)
+
+    def apply_money_flow(self, db, class_name, stock_code, bind_key, flows):
+        """Write the jlrl / zljlrl of flows to the stored bars with one bulk UPDATE, returns whether any row changed"""
+        updated = bulk_update_columns(db, class_name, bind_key, flows, MONEY_FLOW_COLUMNS) > 0
+        if updated:
             the_stock = db.session.query(Stock).filter(Stock.code == stock_code).first()
-            the_stock.updated_at = datetime.now()
-            db.session.commit()
+            if the_stock is not None:
+                the_stock.updated_at = datetime.now()
+                db.session.commit()
             print("ZJ update success for stock: " + stock_code)
         else:
             print("No ZJ data to update for stock:" + stock_code)
+        return updated
 
-    def updateZJ_All(self, db, class_name, stock_code, se):
+    def updateZJ(self, db, class_name, stock_code, se, dates_to_fill, bind_key=DataBase.stocks):
         print("Start loading ZJ data for: " + stock_code)
-        symbol = stock_code + '.' + se.upper()
-        df = self.pro.moneyflow(ts_code=symbol)
-        df['zl'] = df.buy_elg_amount - df.sell_elg_amount + df.buy_lg_amount - df.sell_lg_amount
-        df2 = self.pro.daily(ts_code=symbol)
-        df = df.merge(df2, on='trade_date')
-        df_new = pd.DataFrame([])
-        df_new['date'] = df['trade_date']
-        df_new['jlrl'] = df.net_mf_vol*100/df.vol
-        df_new['zljlrl'] = df.zl * 1000 / df.amount
-
-        df_new = df_new.sort_values(by=['date']).round({'jlrl': 2, 'zljlrl': 2})
-        updated = False
-        for _, each_data in df_new.iterrows():
-            date_time = each_data['date']
-            if each_data.isna().any() == False:
-                query = db.session.query(class_name).filter(class_name.date == date_time).first()
-                if not query:
-                    continue
-                items = ['jlrl', 'zljlrl']
-                update_record(query, items, each_data)
-                updated = True
-        db.session.commit()
-        if updated == True:
-            the_stock = db.session.query(Stock).filter(Stock.code == stock_code).first()
-            the_stock.updated_at = datetime.now()
-            db.session.commit()
-            print("ZJ update success for stock: " + stock_code)
-        else:
-            print("No ZJ data to update for stock:" + stock_code)
+        dates_to_fill = pd.to_datetime(pd.Series(list(dates_to_fill))).dt.normalize()
+        if len(dates_to_fill) == 0:
+            return False
+        flows = self.get_money_flow(stock_code + '.' + se.upper(), dates_to_fill.min(), dates_to_fill.max())
+        flows = flows[flows['date'].isin(dates_to_fill)]
+        return self.apply_money_flow(db, class_name, stock_code, bind_key, flows)
+
+    def updateZJ_All(self, db, class_name, stock_code, se, bind_key=DataBase.stocks):
+        print("Start loading ZJ data for: " + stock_code)
+        flows = self.get_money_flow(stock_code + '.' + se.upper())
+        return self.apply_money_flow(db, class_name, stock_code, bind_key, flows)
+
 
+    def get_latest_trade_date(self):
+        """Latest SSE trading day whose daily bars are published, from the cached trading calendar"""
+        return get_trading_calendar().latest_trading_day()
 
     def get_latest_date(self, stock_code, se):
         if 's' in stock_code:
             stock_code = stock_code[2:]
         symbol = stock_code + '.' + se.upper()
+        self.rate_limiter.acquire()
         r = ts.realtime_quote(ts_code=symbol).squeeze()
         latest_date = r.DATE
         if r.PRICE == r.HIGH == 0:
+            self.rate_limiter.acquire()
             r_last = self.pro.daily(ts_code=symbol, start_date=self.get_start_date(6)).iloc[0]
             latest_date = parser().parse(r_last.trade_date)
         return latest_date
@@ -372,7 +413,8 @@ class Tushare:
 
             # 获取股票基本信息
             print(f"🔍 [股票代码追踪] 调用 Tushare API stock_basic，传入参数: ts_code='{ts_code}'")
-            basic_info = self.pro.stock_basic(
+            basic_info = self.cached_query(
+                'stock_basic',
                 ts_code=ts_code,
                 fields='ts_code,symbol,name,area,industry,market,list_date'
             )
@@ -428,7 +470,8 @@ class Tushare:
             print(f"🔄 从Tushare获取{ts_code}数据 ({start_date} 到 {end_date})...")
 
             try:
-                data = self.pro.daily(
+                data = self.cached_query(
+                    'daily',
                     ts_code=ts_code,
                     start_date=start_date,
                     end_date=end_date
@@ -463,7 +506,7 @@ class Tushare:
             ts_code = self._normalize_symbol(symbol)
             start_date = start_date.replace('-', '')
             end_date = end_date.replace('-', '')
-            cash_flow_data = self.pro.moneyflow(ts_code=ts_code, start_date=start_date, end_date=end_date)
+            cash_flow_data = self.cached_query('moneyflow', ts_code=ts_code, start_date=start_date, end_date=end_date)
 
             if cash_flow_data is not None and not cash_flow_data.empty:
                 cash_flow_data = cash_flow_data.iloc[0]
@@ -504,7 +547,7 @@ class Tushare:
             ts_code = self._normalize_symbol(symbol)
             start_date = start_date.replace('-', '')
             end_date = end_date.replace('-', '')
-            tech_data = self.pro.stk_factor(ts_code=ts_code, start_date=start_date, end_date=end_date)
+            tech_data = self.cached_query('stk_factor', ts_code=ts_code, start_date=start_date, end_date=end_date)
 
             if tech_data is not None and not tech_data.empty:
                 tech_data = tech_data.iloc[0]
@@ -527,7 +570,8 @@ class Tushare:
 
             # 获取资产负债表
             try:
-                balance_sheet = self.pro.balancesheet(
+                balance_sheet = self.cached_query(
+                    'balancesheet',
                     ts_code=ts_code,
                     start_date=start_date,
                     end_date=end_date,
@@ -541,7 +585,8 @@ class Tushare:
 
             # 获取利润表
             try:
-                income_statement = self.pro.income(
+                income_statement = self.cached_query(
+                    'income',
                     ts_code=ts_code,
                     start_date=start_date,
                     end_date=end_date,
@@ -555,7 +600,8 @@ class Tushare:
 
             # 获取现金流量表
             try:
-                cash_flow = self.pro.cashflow(
+                cash_flow = self.cached_query(
+                    'cashflow',
                     ts_code=ts_code,
                     start_date=start_date,
                     end_date=end_date,
@@ -577,6 +623,7 @@ class Tushare:
         功能与 Mairui 的 update_all_stocks_list 相同
         """
         print("Start updating all stocks list!")
+        changed_codes = []
         try:
             # 获取所有股票列表
             stock_list = self.pro.stock_basic(
@@ -617,6 +664,7 @@ class Tushare:
                 if record:
                     # 记录存在，更新名称和交易所
                     if record.name != name:
+                        changed_codes.append(clean_code)
                         old_name = record.name
                         record.name = name
                         print("Updated stock: {} {} with new name: {}".format(clean_code, old_name, name))
@@ -633,6 +681,7 @@ class Tushare:
                         type='s',
                     )
                     db.session.add(new_record)
+                    changed_codes.append(clean_code)
                     print("Added new stock: {} {}".format(clean_code, name))
 
                 db.session.commit()
@@ -646,17 +695,24 @@ class Tushare:
             print(f"❌ Error updating stocks list: {err}")
             db.session.rollback()
             raise e
+        finally:
+            stock_name_cache.invalidate(changed_codes)
         return
 
-    def get_stock_dataframe(self, stock_code: str, se: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    def get_stock_dataframe(self, stock_code: str, se: str, start_date: str = None, end_date: str = None,
+                            use_cache: bool = True) -> pd.DataFrame:
         """
         获取股票历史K线数据，返回与数据库格式兼容的DataFrame
 
+        默认通过本地K线缓存（BarStore）读取，只从 Tushare 补齐缓存中缺失的首尾日期，
+        数据已是最新时不发起任何网络请求。
+
         Args:
             stock_code: 股票代码（如：000001）
             se: 交易所代码（sh/sz）
             start_date: 开始日期（YYYYMMDD格式）
             end_date: 结束日期（YYYYMMDD格式）
+            use_cache: 是否使用本地K线缓存，False 时直接从 Tushare 获取
 
         Returns:
             DataFrame: 包含以下列的股票数据：
@@ -682,60 +738,15 @@ class Tushare:
             start_date = (datetime.now() - timedelta(days=365*3)).strftime('%Y%m%d')
 
         try:
-            # 获取日线数据
-            df = self.pro.daily(
-                ts_code=symbol,
-                start_date=start_date,
-                end_date=end_date
-            )
-
-            # 获取日线基本面数据（包含换手率）
-            df_basic = self.pro.daily_basic(
-                ts_code=symbol,
-                start_date=start_date,
-                end_date=end_date,
-                fields='ts_code,trade_date,turnover_rate'
-            )
-
-            # 合并数据
-            if df_basic is not None and not df_basic.empty:
-                df = df.merge(df_basic, on=['ts_code', 'trade_date'], how='left')
+            if use_cache:
+                result_df = self.bar_store.get(symbol, start_date, end_date, self._fetch_stock_dataframe)
+            else:
+                result_df = self._fetch_stock_dataframe(symbol, start_date, end_date)
 
-            if df is None or df.empty:
+            if result_df.empty:
                 print(f"⚠️ 未获取到股票数据: {symbol}")
                 return pd.DataFrame()
 
-            # 计算振幅 (shake_rate)
-            # shake_rate = (high - low) / pre_close * 100
-            df['shake_rate'] = ((df['high'] - df['low']) / df['pre_close'] * 100).round(2)
-
-            # 转换日期格式为datetime（重要：后续计算需要对比datetime）
-            df['date'] = pd.to_datetime(df['trade_date'])
-
-            # 重命名列以匹配数据库格式
-            df = df.rename(columns={
-                'open': 'open',
-                'high': 'high',
-                'low': 'low',
-                'close': 'close',
-                'vol': 'volume',
-                'amount': 'turnover',
-                'pct_chg': 'change_rate',
-                'change': 'change_amount'
-            })
-
-            # 选择需要的列（与数据库格式一致）
-            columns_to_keep = [
-                'date', 'open', 'high', 'low', 'close', 'volume',
-                'turnover', 'turnover_rate', 'shake_rate',
-                'change_rate', 'change_amount'
-            ]
-
-            result_df = df[columns_to_keep].copy()
-
-            # 按日期排序
-            result_df = result_df.sort_values('date').reset_index(drop=True)
-
             print(f"✅ 成功获取 {symbol} 数据，共 {len(result_df)} 条记录")
             return result_df
 
@@ -745,6 +756,52 @@ class Tushare:
             print(f"❌ 异常堆栈: {traceback.format_exc()}")
             return pd.DataFrame()
 
+    def _fetch_stock_dataframe(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        从 Tushare 下载 [start_date, end_date] 的日线数据，接口异常直接抛出，无数据时返回空 DataFrame
+        """
+        # 获取日线数据
+        df = self.pro.daily(
+            ts_code=symbol,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+        if df is None or df.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        # 获取日线基本面数据（包含换手率）
+        df_basic = self.pro.daily_basic(
+            ts_code=symbol,
+            start_date=start_date,
+            end_date=end_date,
+            fields='ts_code,trade_date,turnover_rate'
+        )
+
+        # 合并数据
+        if df_basic is not None and not df_basic.empty:
+            df = df.merge(df_basic, on=['ts_code', 'trade_date'], how='left')
+        else:
+            df['turnover_rate'] = np.nan
+
+        # 计算振幅 (shake_rate)
+        # shake_rate = (high - low) / pre_close * 100
+        df['shake_rate'] = ((df['high'] - df['low']) / df['pre_close'] * 100).round(2)
+
+        # 转换日期格式为datetime（重要：后续计算需要对比datetime）
+        df['date'] = pd.to_datetime(df['trade_date'])
+
+        # 重命名列以匹配数据库格式
+        df = df.rename(columns={
+            'vol': 'volume',
+            'amount': 'turnover',
+            'pct_chg': 'change_rate',
+            'change': 'change_amount'
+        })
+
+        # 选择需要的列（与数据库格式一致），统一列类型，按日期排序
+        return normalize_bars(df[BAR_COLUMNS].copy())
+
     # def _calculate_forward_adjusted_prices(self, data: pd.DataFrame) -> pd.DataFrame:
     #     """
     #     基于pct_chg计算前复权价格
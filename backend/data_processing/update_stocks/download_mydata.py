@@ -1,82 +1,233 @@
 import logging
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, date
 from time import sleep
 import pandas as pd
 import akshare as ak
 
-from data_processing.update_stocks.download_mydata_util import create_stock_table
+from data_processing.data_provider.rate_limit import TokenBucket, backoff_delay
+from data_processing.update_stocks.download_mydata_util import create_stock_table, get_max_dates
 from db.mysql.db_schemas import UpdatingStock, Stock, StocksInPool
 from end_points.common.const.consts import DataBase
 from end_points.get_stock.operations.get_stock_utils import get_stock_cap
-from end_points.common.utils.db import get_bind_session
 
 ZJ_START_DATE = pd.Timestamp(2010, 1, 1, 0)
 
-def update_stocks_for_bind(db, data_tool, all_stocks, bind_key):
+# symbols updated concurrently by update_universe
+UPDATE_WORKERS = 4
+UPDATE_MAX_RETRIES = 5
+# quota of a provider without its own rate_limiter
+UPDATE_CALLS_PER_MINUTE = 200
+# calls of a provider without its own rate_limiter (akshare: the market latest date check of
+# the plan, then one history download per symbol); a provider with one acquires it around each
+# of its remote calls
+CHECK_CALLS = 1
+DOWNLOAD_CALLS = 1
+# index whose latest date stands for the market when the provider has no trading calendar
+MARKET_INDEX = ('sh000001', 'sh')
+
+def update_stocks_for_bind(db, data_tool, all_stocks, bind_key, workers=UPDATE_WORKERS):
     print("Start updating stocks for database {}!".format(bind_key))
-    for stock_code, se in all_stocks:
-        update_stock_record(db, data_tool, stock_code, se, bind_key)
-        print(datetime.now())
+    summary = update_universe(db, data_tool, all_stocks, bind_key, workers=workers)
     print("Stocks updating done for database {}!".format(bind_key))
-    return
+    return summary
+
+
+def update_universe(db, data_tool, all_stocks, bind_key, workers=UPDATE_WORKERS,
+                    calls_per_minute=UPDATE_CALLS_PER_MINUTE, max_retries=UPDATE_MAX_RETRIES):
+    """
+    Update all_stocks with `workers` symbols in flight behind one token bucket.
+
+    A provider with its own rate_limiter (Tushare, Mairui) acquires it around each remote
+    call, so the quota is shared with its other callers and counts what a symbol really costs
+    (Tushare: pro_bar with factors and moneyflow, 3 calls per stock). Other providers are
+    budgeted CHECK_CALLS for the plan and DOWNLOAD_CALLS per symbol against a bucket sized to
+    calls_per_minute.
+    A symbol failing with any error is retried with jittered exponential backoff, up to
+    max_retries times.
+
+    Only the stale symbols found by plan_stale_stocks are updated, each from the day after
+    its latest stored date.
+
+    Progress is kept in UpdatingStock, one row per symbol flipped to done when the symbol
+    is finished. If the previous run left rows not done it was interrupted, only the
+    symbols not done yet are updated; otherwise a new run starts over the stale symbols.
+
+    Returns:
+        dict: total, updated, up_to_date, failed (stock codes), elapsed seconds and symbols_per_minute
+    """
+    # None: the provider limits its own calls
+    rate_limiter = None if getattr(data_tool, 'rate_limiter', None) else TokenBucket(calls_per_minute)
+    if rate_limiter is not None:
+        rate_limiter.acquire(CHECK_CALLS)
+    plan = plan_stale_stocks(db, data_tool, all_stocks, bind_key)
+    start_dates = dict((item['stock_code'], item['start_date']) for item in plan)
+    todo = prepare_updating_stocks(db, [(item['stock_code'], item['se']) for item in plan])
+    total = len(todo)
+    print(f"📊 {total}/{len(all_stocks)} stocks to update with {workers} workers")
 
+    start_time = time.time()
+    progress_lock = threading.Lock()
+    counts = {'done': 0, 'updated': 0, 'up_to_date': 0}
+    failed = []
 
-def update_stock_record(db, data_tool, stock_code, se, bind_key, repeat_time=10):
-    print("Start checking status for: " + stock_code)
-    req_update = None  # Initialize req_update
-    for i in range(repeat_time):
-        sleep(0.1)
+    def run_one(stock_code, se):
         try:
-            req_update = need_update(db, data_tool, stock_code, se, bind_key)
-            if req_update != None:
-                break
+            updated = update_stock_with_retry(db, data_tool, stock_code, se, bind_key, rate_limiter, max_retries,
+                                              start_date=start_dates.get(stock_code))
         except Exception as e:
-            print(e)
-            db.session.rollback()
+            logging.error(f"Update of {stock_code} failed after {max_retries} retries: {e}")
+            updated = None
+        finally:
+            db.session.remove()
+        with progress_lock:
+            counts['done'] += 1
+            if updated is None:
+                failed.append(stock_code)
+            elif updated:
+                counts['updated'] += 1
+            else:
+                counts['up_to_date'] += 1
+            elapsed = time.time() - start_time
+            print(f"[{counts['done']}/{total}] {stock_code} "
+                  f"{'failed' if updated is None else 'done'}, {counts['done'] * 60 / max(elapsed, 1e-6):.1f} symbols/min")
 
-    # If all retries failed, assume we need to update
-    if req_update is None:
-        print(f"Could not check update status for {stock_code}, will attempt to create/update table")
-        req_update = True
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='stock_update') as executor:
+        list(executor.map(lambda stock: run_one(*stock), todo))
 
-    if req_update == False:
-        print("Record data is up to date for stock:" + stock_code)
-        return
+    elapsed = time.time() - start_time
+    summary = {
+        'total': total,
+        'updated': counts['updated'],
+        'up_to_date': counts['up_to_date'] + len(all_stocks) - total,
+        'failed': failed,
+        'elapsed': round(elapsed, 1),
+        'symbols_per_minute': round(total * 60 / elapsed, 1) if elapsed > 0 else None,
+    }
+    print(f"✅ {total - len(failed)}/{total} stocks in {summary['elapsed']}s "
+          f"({summary['symbols_per_minute']} symbols/min), {len(failed)} failed")
+    return summary
 
-    stock_class = create_stock_table(db, stock_code, bind_key)
-    updated = data_tool.addRecord(db, stock_class, stock_code, se, bind_key)
-    if updated == True:
-        the_stock = db.session.query(Stock).filter(Stock.code == stock_code).first()
-        the_stock.updated_at = datetime.now()
-        db.session.commit()
-    return
 
-def need_update(db, data_tool, stock_code, se, bind_key):
-    latest_date = data_tool.get_latest_date(stock_code, se)
-    stock_class = create_stock_table(db, stock_code, bind_key)
+def get_latest_trade_date(data_tool):
+    """Latest trading day with published bars, from the provider's calendar or its market index"""
+    if hasattr(data_tool, 'get_latest_trade_date'):
+        return pd.Timestamp(data_tool.get_latest_trade_date()).normalize()
+    return pd.Timestamp(data_tool.get_latest_date(*MARKET_INDEX)).normalize()
 
-    try:
-        with get_bind_session(db, bind_key) as session:
-            row_exist = session.query(stock_class).filter(stock_class.date == latest_date).first()
-    except Exception as e:
-        # Table might not exist yet, so we need to update
-        print(f"Table {stock_code} does not exist or error querying: {e}")
-        return True
 
-    updating = db.session.query(UpdatingStock).filter(UpdatingStock.stock_code == stock_code).first()
-    if row_exist and not updating:
-        req_update = False
+def plan_stale_stocks(db, data_tool, all_stocks, bind_key, latest_date=None):
+    """
+    Stocks of all_stocks whose table stops before the latest trading day, with the
+    missing range. The latest trading day is fetched once and the stored max dates of
+    all tables are read with get_max_dates, no per-stock remote call or query.
+
+    Returns:
+        list of dict: stock_code, se, start_date (day after the last stored date, None
+                      for a missing or empty table) and end_date (latest trading day)
+    """
+    start_time = time.time()
+    if latest_date is None:
+        latest_date = get_latest_trade_date(data_tool)
+    max_dates = get_max_dates(db, [stock_code for stock_code, _ in all_stocks], bind_key)
+    plan = []
+    for stock_code, se in all_stocks:
+        max_date = max_dates.get(stock_code)
+        if max_date is not None and max_date.normalize() >= latest_date:
+            continue
+        plan.append({
+            'stock_code': stock_code,
+            'se': se,
+            'start_date': max_date.normalize() + timedelta(days=1) if max_date is not None else None,
+            'end_date': latest_date,
+        })
+    print(f"📅 {len(plan)}/{len(all_stocks)} stocks stale up to {latest_date.strftime('%Y-%m-%d')}, "
+          f"planned in {time.time() - start_time:.1f}s")
+    return plan
+
+
+def prepare_updating_stocks(db, all_stocks):
+    """Stocks of all_stocks still to update, resuming an interrupted run recorded in UpdatingStock"""
+    records = db.session.query(UpdatingStock.stock_code, UpdatingStock.done).all()
+    finished = set(stock_code for stock_code, done in records if done)
+    if len(records) > 0 and len(finished) < len(records):
+        known = set(stock_code for stock_code, _ in records)
+        todo = [(stock_code, se) for stock_code, se in all_stocks if stock_code not in finished]
+        new_codes = [stock_code for stock_code, _ in todo if stock_code not in known]
+        print(f"Resuming interrupted update, {len(finished)} stocks already done")
     else:
-        req_update = True
-    return req_update
+        db.session.query(UpdatingStock).delete()
+        todo = list(all_stocks)
+        new_codes = [stock_code for stock_code, _ in todo]
+    db.session.add_all([UpdatingStock(stock_code=stock_code, done=False) for stock_code in new_codes])
+    db.session.commit()
+    return todo
+
+
+def update_stock_with_retry(db, data_tool, stock_code, se, bind_key, rate_limiter=None, max_retries=UPDATE_MAX_RETRIES,
+                            start_date=None):
+    """
+    Download a planned stale stock (no freshness check of its own) with jittered backoff
+    retries, marks the UpdatingStock row done on success
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            progress = db.session.query(UpdatingStock).filter(UpdatingStock.stock_code == stock_code).first()
+            updated = update_stock_record(db, data_tool, stock_code, se, bind_key, rate_limiter, progress,
+                                          start_date=start_date)
+            if progress is not None:
+                progress.done = True
+                db.session.commit()
+            return updated
+        except Exception as e:
+            db.session.rollback()
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"⚠️ {stock_code} update failed ({e}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            sleep(delay)
+
 
-def update_stocks_jlrl(db, data_tool, all_stocks, bind_key):
+def update_stock_record(db, data_tool, stock_code, se, bind_key, rate_limiter=None, stock_done_record=None,
+                        start_date=None):
+    """Download the bars of a stock planned stale by plan_stale_stocks, from start_date on"""
+    stock_class = create_stock_table(db, stock_code, bind_key)
+    if rate_limiter is not None:
+        rate_limiter.acquire(DOWNLOAD_CALLS)
+    updated = data_tool.addRecord(db, stock_class, stock_code, se, bind_key, stock_done_record, start_date=start_date)
+    if updated == True:
+        the_stock = db.session.query(Stock).filter(Stock.code == stock_code).first()
+        if the_stock is not None:
+            the_stock.updated_at = datetime.now()
+            db.session.commit()
+    return updated
+
+
+def update_stocks_jlrl(db, data_tool, all_stocks, bind_key, start_date=None, end_date=None):
+    """
+    Re-derive jlrl / zljlrl of the stored bars. Without start_date every stock is backfilled
+    over its full history (one ranged download per stock); with start_date and a provider that
+    has get_money_flow_by_dates, the whole market is downloaded once per trading day and each
+    stock table gets one bulk UPDATE.
+    """
     print("Start updating jlrl for database {}!".format(bind_key))
-    for stock_code, se in all_stocks:
-        stock_class = create_stock_table(db, stock_code, bind_key)
-        data_tool.updateZJ_All(db, stock_class, stock_code, se)
-        print(datetime.now())
+    if start_date is not None and hasattr(data_tool, 'get_money_flow_by_dates'):
+        flows = data_tool.get_money_flow_by_dates(start_date, end_date)
+        flows_by_stock = dict(tuple(flows.groupby('stock_code')))
+        for stock_code, se in all_stocks:
+            stock_flows = flows_by_stock.get(stock_code)
+            if stock_flows is None:
+                continue
+            stock_class = create_stock_table(db, stock_code, bind_key)
+            data_tool.apply_money_flow(db, stock_class, stock_code, bind_key, stock_flows)
+    else:
+        for stock_code, se in all_stocks:
+            stock_class = create_stock_table(db, stock_code, bind_key)
+            data_tool.updateZJ_All(db, stock_class, stock_code, se, bind_key)
+            print(datetime.now())
     print("JLRL updating done for database {}!".format(bind_key))
     return
 
@@ -1,3 +1,14 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, inspect, select, func, literal, table, column, union_all, text, MetaData, Table, Column, \
+    DateTime, Float
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from end_points.common.utils.db import get_bind_session
+from data_processing.data_provider.bar_table import bar_table_enabled, upsert_bars
+from end_points.get_stock.operations.get_stock_utils import clear_stock_frames
 from db.mysql.db_schemas_dynamic import (
     record_table_attr,
     cn_index_table_attr,
@@ -64,3 +75,161 @@ def create_record_table(db, table_name, bind_key):
 
     return NewClass
 
+
+
+
+# rows per INSERT ... ON DUPLICATE KEY UPDATE statement of the bulk ingestion path
+UPSERT_CHUNK_SIZE = 1000
+
+
+def get_existing_dates(db, class_name, bind_key):
+    """All dates already stored in a stock / index table, fetched with a single query"""
+    with get_bind_session(db, bind_key) as session:
+        rows = session.query(class_name.date).all()
+    return pd.DatetimeIndex(pd.to_datetime([row[0] for row in rows])).normalize()
+
+
+def filter_new_records(db, class_name, bind_key, records):
+    """
+    Drop the rows of `records` whose date is already stored, the set-based replacement of
+    one SELECT per row. `records` needs a 'date' column, the result is sorted by date.
+    """
+    if records is None or len(records) == 0:
+        return pd.DataFrame(columns=['date'])
+    records = records.copy()
+    records['date'] = pd.to_datetime(records['date']).dt.normalize()
+    records = records.drop_duplicates(subset=['date'], keep='last')
+    existing = get_existing_dates(db, class_name, bind_key)
+    records = records[~records['date'].isin(existing)]
+    return records.sort_values(by=['date']).reset_index(drop=True)
+
+
+def bulk_upsert_records(db, class_name, bind_key, records, stock_done_record=None, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Write bar rows with one INSERT ... ON DUPLICATE KEY UPDATE per chunk (keyed on the
+    unique date column), committing once per chunk. Cached stockDataFrame frames of the
+    stock are dropped.
+
+    Args:
+        records: DataFrame with 'date' and any of the table's bar columns, usually the
+                 output of filter_new_records
+        stock_done_record: if given and its starting_date is not set yet, it is set to the
+                           first written date
+
+    Returns:
+        int: number of rows written
+    """
+    if records is None or len(records) == 0:
+        return 0
+    table = class_name.__table__
+    columns = [name for name in records.columns if name in table.c and name not in ('id', 'created_at', 'updated_at')]
+    records = records[columns].sort_values(by=['date'])
+    # a zero pre_close / volume gives inf, stored as NULL like a missing value
+    records = records.replace([np.inf, -np.inf], np.nan)
+    records = records.astype(object).where(records.notna(), None)
+
+    if stock_done_record is not None and stock_done_record.starting_date is None:
+        stock_done_record.starting_date = records['date'].iloc[0].to_pydatetime()
+        db.session.commit()
+
+    rows = records.to_dict('records')
+    update_columns = [name for name in columns if name != 'date']
+    with get_bind_session(db, bind_key) as session:
+        is_mysql = session.get_bind().dialect.name == 'mysql'
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if is_mysql:
+                stmt = mysql_insert(table).values(chunk)
+                updates = dict((name, stmt.inserted[name]) for name in update_columns)
+                updates['updated_at'] = datetime.now()
+                stmt = stmt.on_duplicate_key_update(**updates)
+            else:
+                # rows were diffed against the stored dates already, a plain insert is enough
+                stmt = insert(table).values(chunk)
+            session.execute(stmt)
+            session.commit()
+    if bar_table_enabled():
+        # keep the consolidated table in step with the per-stock table
+        upsert_bars(db, class_name.__tablename__, records, bind_key, chunk_size)
+    clear_stock_frames(class_name.__tablename__)
+    return len(rows)
+
+
+def bulk_update_columns(db, class_name, bind_key, records, columns, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Set `columns` of the stored rows whose date is in `records` with one UPDATE ... JOIN:
+    the values are loaded into a temporary table in chunks on the same connection and
+    joined on date, instead of one SELECT + UPDATE per row. Dates that are not stored are
+    ignored. The consolidated stock_bar rows are updated too when it is enabled, cached
+    stockDataFrame frames of the stock are dropped.
+
+    Returns:
+        int: number of stored rows updated
+    """
+    columns = list(columns)
+    if records is None or len(records) == 0:
+        return 0
+    records = records[['date'] + columns].copy()
+    records['date'] = pd.to_datetime(records['date']).dt.normalize()
+    records = records.drop_duplicates(subset=['date'], keep='last').replace([np.inf, -np.inf], np.nan)
+    records = records.astype(object).where(records.notna(), None)
+    rows = records.to_dict('records')
+
+    tmp = Table('tmp_bulk_update', MetaData(), Column('date', DateTime, primary_key=True),
+                *[Column(name, Float) for name in columns], prefixes=['TEMPORARY'])
+    with db.get_engine(bind_key).begin() as connection:
+        quote = connection.dialect.identifier_preparer.quote
+        drop_tmp = text('DROP TEMPORARY TABLE IF EXISTS tmp_bulk_update' if connection.dialect.name == 'mysql'
+                        else 'DROP TABLE IF EXISTS temp.tmp_bulk_update')
+        # temporary tables live as long as the pooled connection, and are not rolled back on MySQL
+        connection.execute(drop_tmp)
+        tmp.create(connection)
+
+        def update(target, condition='', params=None):
+            # condition narrows the date join, e.g. to one symbol of stock_bar
+            if connection.dialect.name == 'mysql':
+                assignments = ', '.join(f't.{quote(name)} = u.{quote(name)}' for name in columns)
+                sql = f'UPDATE {quote(target)} t JOIN tmp_bulk_update u ON t.date = u.date{condition} ' \
+                      f'SET {assignments}, t.updated_at = :now'
+            else:
+                assignments = ', '.join(f'{quote(name)} = u.{quote(name)}' for name in columns)
+                sql = f'UPDATE {quote(target)} AS t SET {assignments}, updated_at = :now ' \
+                      f'FROM tmp_bulk_update AS u WHERE t.date = u.date{condition}'
+            return connection.execute(text(sql), dict(params or {}, now=datetime.now())).rowcount
+
+        try:
+            for start in range(0, len(rows), chunk_size):
+                connection.execute(insert(tmp), rows[start:start + chunk_size])
+            updated = update(class_name.__tablename__)
+            if bar_table_enabled():
+                update('stock_bar', ' AND t.stock_code = :stock_code', {'stock_code': class_name.__tablename__})
+        finally:
+            connection.execute(drop_tmp)
+    clear_stock_frames(class_name.__tablename__)
+    return updated
+
+
+# tables per UNION ALL statement of get_max_dates
+MAX_DATE_UNION_SIZE = 500
+
+
+def get_max_dates(db, stock_codes, bind_key, union_size=MAX_DATE_UNION_SIZE):
+    """
+    stock_code -> latest stored date (Timestamp) of each stock table, None when the table
+    does not exist or is empty. The tables are listed once and read with UNION ALL
+    statements of union_size `SELECT MAX(date)` each, not one query per stock.
+    """
+    engine = db.get_engine(bind_key)
+    existing = set(inspect(engine).get_table_names())
+    max_dates = dict((stock_code, None) for stock_code in stock_codes)
+    table_codes = [stock_code for stock_code in max_dates.keys() if stock_code in existing]
+    with get_bind_session(db, bind_key) as session:
+        for start in range(0, len(table_codes), union_size):
+            selects = [
+                select(literal(stock_code).label('stock_code'), func.max(column('date')).label('max_date'))
+                .select_from(table(stock_code, column('date')))
+                for stock_code in table_codes[start:start + union_size]
+            ]
+            for stock_code, max_date in session.execute(union_all(*selects)).all():
+                max_dates[stock_code] = pd.Timestamp(max_date) if max_date is not None else None
+    return max_dates
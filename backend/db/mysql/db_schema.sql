@@ -136,11 +136,19 @@ CREATE TABLE IF NOT EXISTS `simulator`
     `trading_times`    int(11)          DEFAULT NULL COMMENT '交易次数',
     `indicating_date`  datetime         DEFAULT NULL COMMENT '信号日期',
     `earning_info`     text             DEFAULT NULL COMMENT '收益信息',
+    `first_trade_date` datetime         DEFAULT NULL COMMENT '首次买入日期',
+    `max_drawback`     float            DEFAULT NULL COMMENT '最大回撤百分比',
+    `sharpe`           float            DEFAULT NULL COMMENT '年化夏普比率',
+    `calmar`           float            DEFAULT NULL COMMENT '卡玛比率',
+    `r_cum_earn_after` float            DEFAULT NULL COMMENT '近一月累计收益',
+    `r_earn_rate_after` float           DEFAULT NULL COMMENT '近一月盈利率',
+    `r_avg_earn_after` float            DEFAULT NULL COMMENT '近一月平均收益',
+    `r_trading_times`  int(11)          DEFAULT NULL COMMENT '近一月交易次数',
     `created_at`       datetime         NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `updated_at`       datetime         NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     PRIMARY KEY (`id`) USING BTREE,
     KEY `idx_rule_id` (`rule_id`),
-    KEY `idx_status` (`status`)
+    KEY `idx_status_cum_earn` (`status`, `cum_earn`)
 ) ENGINE = InnoDB
   DEFAULT CHARSET = utf8mb4
   ROW_FORMAT = DYNAMIC
@@ -164,6 +172,32 @@ CREATE TABLE IF NOT EXISTS `simulator_trading`
   ROW_FORMAT = DYNAMIC
   COMMENT='模拟器交易记录';
 
+CREATE TABLE IF NOT EXISTS `simulator_checkpoint`
+(
+    `sim_id`     int(11)  NOT NULL COMMENT '模拟器ID',
+    `last_date`  datetime NOT NULL COMMENT '已处理到的交易日',
+    `state`      text     NOT NULL COMMENT '资金、持仓、资产尾值及运行参数',
+    `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`sim_id`) USING BTREE
+) ENGINE = InnoDB
+  DEFAULT CHARSET = utf8mb4
+  ROW_FORMAT = DYNAMIC
+  COMMENT='模拟器增量运行检查点';
+
+CREATE TABLE IF NOT EXISTS `simulator_equity`
+(
+    `sim_id`       int(11)  NOT NULL COMMENT '模拟器ID',
+    `dates`        blob     NOT NULL COMMENT '交易日，int32 自 1970-01-01 起天数',
+    `equity`       blob     NOT NULL COMMENT '每日收盘净值，float32',
+    `created_at`   datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at`   datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`sim_id`) USING BTREE
+) ENGINE = InnoDB
+  DEFAULT CHARSET = utf8mb4
+  ROW_FORMAT = DYNAMIC
+  COMMENT='模拟器每日盯市净值曲线';
+
 CREATE TABLE IF NOT EXISTS `model_rule_return`
 (
     `rule_id`        int(11)          NOT NULL COMMENT '规则ID',
@@ -14,12 +14,14 @@
 - pool_rule_earn: 股票池规则收益
 - simulator: 模拟器
 - simulator_trading: 模拟器交易记录
+- simulator_checkpoint: 模拟器增量运行检查点
+- simulator_equity: 模拟器每日盯市净值曲线
 - agent: Agent
 - agent_trading: Agent交易记录
 """
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, DOUBLE, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, DOUBLE, Boolean, UniqueConstraint, LargeBinary, Index
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -131,6 +133,11 @@ class PoolRuleEarn(Base):
 
 class Simulator(Base):
     __tablename__ = 'simulator'
+    __table_args__ = (
+        Index('idx_rule_id', 'rule_id'),
+        # serves the status / cum_earn ordering of the simulator list
+        Index('idx_status_cum_earn', 'status', 'cum_earn'),
+    )
     id = Column(Integer, autoincrement=True, primary_key=True)
     stock_code = Column(String(32), nullable=True)
     rule_id = Column(Integer, nullable=False)
@@ -145,6 +152,15 @@ class Simulator(Base):
     trading_times = Column(Integer, nullable=True, comment="交易次数")
     indicating_date = Column(DateTime, nullable=True)
     earning_info = Column(Text, nullable=True, comment="收益信息")
+    # list metrics, materialized by update_sim_model so the list endpoint does not decode earning_info
+    first_trade_date = Column(DateTime, nullable=True, comment="首次买入日期")
+    max_drawback = Column(Float, nullable=True, comment="最大回撤百分比")
+    sharpe = Column(Float, nullable=True, comment="年化夏普比率")
+    calmar = Column(Float, nullable=True, comment="卡玛比率")
+    r_cum_earn_after = Column(Float, nullable=True, comment="近一月累计收益")
+    r_earn_rate_after = Column(Float, nullable=True, comment="近一月盈利率")
+    r_avg_earn_after = Column(Float, nullable=True, comment="近一月平均收益")
+    r_trading_times = Column(Integer, nullable=True, comment="近一月交易次数")
     created_at = Column(DateTime, nullable=False, default=datetime.now)
     updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
@@ -161,12 +177,33 @@ class SimTrading(Base):
     updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
 
+class SimulatorCheckpoint(Base):
+    """模拟器增量运行检查点：已处理到的日期及此时的资金、持仓"""
+    __tablename__ = 'simulator_checkpoint'
+    sim_id = Column(Integer, primary_key=True, autoincrement=False)
+    last_date = Column(DateTime, nullable=False, comment="已处理到的交易日")
+    state = Column(Text, nullable=False, comment="资金、持仓、资产尾值及运行参数")
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+
+class SimulatorEquity(Base):
+    """模拟器每日盯市净值曲线（float32 数组），风险指标写在 simulator 表"""
+    __tablename__ = 'simulator_equity'
+    sim_id = Column(Integer, primary_key=True, autoincrement=False)
+    dates = Column(LargeBinary, nullable=False, comment="交易日，int32 自 1970-01-01 起天数")
+    equity = Column(LargeBinary, nullable=False, comment="每日收盘净值，float32")
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+
 class SimulatorConfig(Base):
     __tablename__ = 'simulator_config'
     id = Column(Integer, primary_key=True, autoincrement=True)
     profit_threshold = Column(Float, default=0, comment='利润阈值百分比')
     stop_loss = Column(Float, default=5, comment='止损百分比')
     max_holding_days = Column(Integer, default=5, comment='最大持有天数')
+    workers = Column(Integer, default=1, comment='模拟器并行处理股票的工作线程/进程数')
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     created_at = Column(DateTime, default=datetime.now)
 
@@ -10,7 +10,7 @@
 
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, DateTime, String, Boolean, Float
+from sqlalchemy import Column, Integer, BigInteger, DateTime, String, Boolean, Float, Index
 from sqlalchemy.orm import declarative_base
 
 from end_points.common.const.consts import DataBase
@@ -101,4 +101,38 @@ def cn_index_table_attr(table_name, bind_key):
         'change_amount':    Column(Float, nullable=True, comment="change"),
         'created_at':       Column(DateTime, nullable=True, default=datetime.now),
         'updated_at':       Column(DateTime, nullable=True, default=datetime.now, onupdate=datetime.now),
-    }
\ No newline at end of file
+    }
+
+
+class StockBar(DynamicBase):
+    """
+    Consolidated daily bars of all stocks and indexes, one row per (stock_code, date).
+
+    Optional replacement of the per-stock tables above, created in each bind database
+    that uses it. The primary key clusters a symbol's bars by date, idx_date_code covers
+    cross-sectional reads ("closes of all stocks on date D"). Partitioned by stock_code
+    so a single-symbol read touches one partition.
+    """
+    __tablename__ = 'stock_bar'
+    __bind_key__ = DataBase.stocks
+    __table_args__ = (
+        Index('idx_date_code', 'date', 'stock_code', 'close'),
+        {'mysql_partition_by': 'KEY(stock_code)', 'mysql_partitions': '32'},
+    )
+    stock_code =    Column(String(12), primary_key=True, comment="stock code")
+    date =          Column(DateTime, primary_key=True, comment="d")
+    open =          Column(Float, nullable=True, comment="o")
+    high =          Column(Float, nullable=True, comment="h")
+    low =           Column(Float, nullable=True, comment="l")
+    close =         Column(Float, nullable=True, comment="c")
+    volume =        Column(BigInteger, nullable=True, comment="v")
+    turnover =      Column(Float, nullable=True, comment="to")
+    turnover_rate = Column(Float, nullable=True, comment="to rate")
+    shake_rate =    Column(Float, nullable=True, comment="sk rate")
+    change_rate =   Column(Float, nullable=True, comment="change")
+    change_amount = Column(Float, nullable=True, comment="change")
+    jlrl =          Column(Float, nullable=True, comment="jlrl")
+    zljlrl =        Column(Float, nullable=True, comment="zljlrl")
+    hyjlrl =        Column(Float, nullable=True, comment="hyjlrl")
+    created_at =    Column(DateTime, nullable=True, default=datetime.now)
+    updated_at =    Column(DateTime, nullable=True, default=datetime.now, onupdate=datetime.now)
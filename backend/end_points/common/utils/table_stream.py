@@ -0,0 +1,148 @@
+# coding=utf-8
+"""
+Streaming table backup: rows are read in keyset-paginated chunks and written as
+gzip-compressed JSON lines (one file per table), and restored with chunked bulk
+inserts, so memory stays bounded by the chunk size whatever the table size.
+"""
+
+import base64
+import gzip
+import json
+from datetime import datetime, date
+from decimal import Decimal
+
+from sqlalchemy import MetaData, Table, select, tuple_, text, inspect
+from sqlalchemy.types import DateTime, Date, LargeBinary
+
+EXPORT_CHUNK_SIZE = 5000
+RESTORE_CHUNK_SIZE = 2000
+# marker of base64 encoded binary values in the json lines
+BINARY_KEY = '$b64'
+
+
+def encode_value(value):
+    """json.dumps default: datetimes as ISO strings, Decimal as float, bytes as {'$b64': ...}"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {BINARY_KEY: base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def column_decoders(table):
+    """column name -> function turning the json value back into the column's python type"""
+    decoders = {}
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            decoders[column.name] = lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+        elif isinstance(column.type, Date):
+            decoders[column.name] = lambda value: date.fromisoformat(value[:10]) if isinstance(value, str) else value
+        elif isinstance(column.type, LargeBinary):
+            decoders[column.name] = lambda value: base64.b64decode(value[BINARY_KEY]) if isinstance(value, dict) else value
+    return decoders
+
+
+def reflect_table(engine, table_name):
+    return Table(table_name, MetaData(), autoload_with=engine)
+
+
+def iter_table_chunks(connection, table, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Rows of table as lists of dicts, chunk_size rows at a time. Pages are keyset-paginated
+    on the primary key (WHERE pk > last ORDER BY pk LIMIT n), so each page is an index range
+    scan; a table without primary key is read with a server-side cursor instead.
+    """
+    pk = list(table.primary_key.columns)
+    if len(pk) == 0:
+        result = connection.execution_options(stream_results=True).execute(select(table))
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if len(rows) == 0:
+                return
+            yield [dict(row._mapping) for row in rows]
+
+    key = pk[0] if len(pk) == 1 else tuple_(*pk)
+    last = None
+    while True:
+        query = select(table).order_by(*pk).limit(chunk_size)
+        if last is not None:
+            query = query.where(key > last)
+        rows = [dict(row._mapping) for row in connection.execute(query)]
+        if len(rows) == 0:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][pk[0].name] if len(pk) == 1 else tuple(rows[-1][column.name] for column in pk)
+
+
+def export_table(engine, table, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write table to path as gzip JSON lines, returns the row count"""
+    count = 0
+    with engine.connect() as connection, gzip.open(path, 'wt', encoding='utf-8') as f:
+        for rows in iter_table_chunks(connection, table, chunk_size):
+            f.writelines(json.dumps(row, ensure_ascii=False, default=encode_value) + '\n' for row in rows)
+            count += len(rows)
+    return count
+
+
+def iter_file_chunks(path, table, chunk_size=RESTORE_CHUNK_SIZE):
+    """Decoded rows of an export file, chunk_size rows at a time"""
+    decoders = column_decoders(table)
+    names = set(column.name for column in table.columns)
+    chunk = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            # columns dropped from the schema since the export are ignored
+            row = dict((name, decoders[name](value) if name in decoders else value)
+                       for name, value in row.items() if name in names)
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def restore_table(engine, table, path, chunk_size=RESTORE_CHUNK_SIZE, truncate=False, ignore_existing=False):
+    """
+    Bulk insert an export file into table, one multi-row INSERT and commit per chunk.
+
+    Rows are expected to be new, truncate empties the table first and ignore_existing
+    (INSERT IGNORE) skips rows whose key is already there. MySQL sessions skip foreign key
+    checks while loading, and unique checks only into an empty table without ignore_existing:
+    INSERT IGNORE and rows next to existing ones need them. Returns the row count read from the file.
+    """
+    count = 0
+    with engine.connect() as connection:
+        is_mysql = connection.dialect.name == 'mysql'
+        if is_mysql:
+            connection.execute(text('SET SESSION foreign_key_checks = 0'))
+        if truncate:
+            connection.execute(table.delete())
+            connection.commit()
+        skip_unique_checks = is_mysql and not ignore_existing and \
+            (truncate or connection.execute(select(table).limit(1)).first() is None)
+        if skip_unique_checks:
+            connection.execute(text('SET SESSION unique_checks = 0'))
+        stmt = table.insert()
+        if ignore_existing:
+            stmt = stmt.prefix_with('IGNORE' if is_mysql else 'OR IGNORE')
+        try:
+            for rows in iter_file_chunks(path, table, chunk_size):
+                connection.execute(stmt, rows)
+                connection.commit()
+                count += len(rows)
+        finally:
+            if skip_unique_checks:
+                connection.execute(text('SET SESSION unique_checks = 1'))
+            if is_mysql:
+                connection.execute(text('SET SESSION foreign_key_checks = 1'))
+    return count
+
+
+def existing_tables(engine):
+    return set(inspect(engine).get_table_names())
@@ -1,4 +1,5 @@
 from datetime import datetime
+from data_processing.data_provider.trading_calendar import to_days
 from db.mysql.db_schemas import Rule, StockRuleEarn
 from end_points.common.const.consts import INIT_MONEY, DataBase, Status
 from end_points.get_stock.operations.get_stock_utils import stockDataFrame
@@ -89,13 +90,10 @@ def cal_avg_earn_model(earn_results):
 
 def indicating(stock_data, indicator_dates, N=1):
     last_indicating_date = None
-    is_indicating = False
     if len(indicator_dates) > 0:
         last_indicating_date = indicator_dates[-1]
-    latest_date = get_latest_N_date(stock_data, N)
-    for the_date in indicator_dates:
-        if the_date >= latest_date:
-            is_indicating = True
+    latest_day = to_days([get_latest_N_date(stock_data, N)])[0]
+    is_indicating = bool(len(indicator_dates) > 0 and (to_days(indicator_dates) >= latest_day).any())
     return is_indicating, last_indicating_date
 
 def get_latest_N_date(stock_data, N):
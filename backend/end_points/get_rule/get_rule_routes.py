@@ -21,6 +21,7 @@ from end_points.get_rule.operations.get_rule_opts import (
 )
 from end_points.get_rule.operations.agent_streaming import stream_agent_execution, stream_single_stock_execution
 from end_points.get_rule.operations.execution_manager import execution_manager
+from end_points.get_rule.operations.agent_executor import AGENT_MAX_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 from end_points.get_rule.rule_schema import (
@@ -320,6 +321,7 @@ async def get_params_for_rule(
 @router.post("/rule/run/{rule_id}", response_model=Dict[str, Any])
 async def run_rule_agent(
     rule_id: int,
+    concurrency: Optional[int] = Query(default=None, ge=1, le=AGENT_MAX_CONCURRENCY),
     db=Depends(get_db)
 ):
     """
@@ -327,12 +329,13 @@ async def run_rule_agent(
 
     Args:
         rule_id: Rule ID
+        concurrency: Number of stocks run at the same time (default: the rule's setting)
 
     Returns:
         Dictionary with code and result
     """
     try:
-        rst = runRuleAgent(db, rule_id)
+        rst = runRuleAgent(db, rule_id, concurrency)
         return rst
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -412,6 +415,7 @@ async def run_agent_for_stock(
 @router.post("/rule/{rule_id}/start")
 async def start_rule_execution_endpoint(
     rule_id: int,
+    concurrency: Optional[int] = Query(default=None, ge=1, le=AGENT_MAX_CONCURRENCY),
     db=Depends(get_db)
 ):
     """
@@ -435,7 +439,8 @@ async def start_rule_execution_endpoint(
                 execution,
                 stream_agent_execution,
                 db,
-                rule_id
+                rule_id,
+                concurrency
             )
         asyncio.run(_run())
 
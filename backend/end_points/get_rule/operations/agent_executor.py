@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, List
+
+from data_processing.data_provider.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# agent runs in flight per rule, AGENT_RULE_CONCURRENCY ('{"3000": 2}') overrides it per rule
+AGENT_CONCURRENCY = int(os.getenv('AGENT_CONCURRENCY', 4))
+AGENT_MAX_CONCURRENCY = 16
+
+
+def _env_json(name):
+    try:
+        return json.loads(os.getenv(name) or '{}')
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring {name}: not a JSON object")
+        return {}
+
+
+def get_rule_concurrency(rule_id, concurrency=None):
+    """Stocks of a rule run at the same time: the explicit value, else the rule's setting, else AGENT_CONCURRENCY"""
+    if concurrency is None:
+        concurrency = _env_json('AGENT_RULE_CONCURRENCY').get(str(rule_id), AGENT_CONCURRENCY)
+    return min(max(1, int(concurrency)), AGENT_MAX_CONCURRENCY)
+
+
+_llm_limiters = {}
+_llm_limiters_lock = threading.Lock()
+
+
+def get_llm_limiter(rule_id):
+    """
+    Token bucket of the LLM provider the rule's agent uses, shared by every rule on that
+    provider in this process, one token per agent run. The provider of a rule comes from
+    AGENT_LLM_PROVIDERS ('{"3000": "deepseek"}'), its agent runs per minute from
+    AGENT_LLM_RATE_LIMITS ('{"deepseek": 30}'). None when the provider has no limit.
+    """
+    provider = _env_json('AGENT_LLM_PROVIDERS').get(str(rule_id), 'default')
+    runs_per_minute = _env_json('AGENT_LLM_RATE_LIMITS').get(provider)
+    if not runs_per_minute:
+        return None
+    with _llm_limiters_lock:
+        limiter = _llm_limiters.get(provider)
+        if limiter is None:
+            limiter = _llm_limiters[provider] = TokenBucket(runs_per_minute, burst=1)
+        return limiter
+
+
+class _CapturedLines:
+    def __init__(self):
+        self.lines = []
+        self.partial = ''
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            parts = (self.partial + text).split('\n')
+            self.partial = parts.pop()
+            self.lines.extend(parts)
+
+    def take(self, start):
+        with self.lock:
+            return self.lines[start:]
+
+
+_captured = contextvars.ContextVar('agent_captured_lines', default=None)
+_router_lock = threading.Lock()
+
+
+class StdoutRouter:
+    """
+    sys.stdout replacement installed once: everything is written to the real stdout and the
+    lines printed inside a capture_lines() context are also collected for that context only,
+    so concurrent agent runs (each in its own asyncio task) keep their output apart.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, text):
+        self.stdout.write(text)
+        sink = _captured.get()
+        if sink is not None:
+            sink.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stdout.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+
+
+@contextmanager
+def capture_lines():
+    """Collect the lines printed by the current task (and the tasks it creates) in the block"""
+    with _router_lock:
+        if not isinstance(sys.stdout, StdoutRouter):
+            sys.stdout = StdoutRouter(sys.stdout)
+    sink = _CapturedLines()
+    token = _captured.set(sink)
+    try:
+        yield sink
+    finally:
+        _captured.reset(token)
+
+
+async def fan_out(stock_codes: List[str], run_stock: Callable[[str], AsyncGenerator[dict, None]],
+                  concurrency: int, limiter: TokenBucket = None) -> AsyncGenerator[dict, None]:
+    """
+    Run run_stock(stock_code) for every stock with at most `concurrency` in flight, each
+    start taking a token from `limiter` when given. Events of all stocks are yielded as
+    they arrive, tagged with their stock_code; a stock_start event with the progress is
+    sent when a stock actually starts and a stock_error when its run raises.
+    """
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(stock_codes)
+    started = 0
+    finished = object()
+
+    async def worker(stock_code):
+        nonlocal started
+        try:
+            async with semaphore:
+                if limiter is not None:
+                    await limiter.acquire_async()
+                started += 1
+                await queue.put({
+                    "type": "stock_start",
+                    "message": f"[{started}/{total}] Processing {stock_code}...",
+                    "stock_code": stock_code,
+                    "progress": f"{started}/{total}"
+                })
+                async for event in run_stock(stock_code):
+                    event.setdefault("stock_code", stock_code)
+                    await queue.put(event)
+        except Exception as e:
+            logger.error(f"Error processing {stock_code}: {e}")
+            await queue.put({
+                "type": "stock_error",
+                "message": f"✗ {stock_code}: {str(e)}",
+                "stock_code": stock_code,
+                "error": str(e)
+            })
+        finally:
+            await queue.put(finished)
+
+    # each task runs in its own copy of the context, so capture_lines() stays per stock
+    tasks = [asyncio.create_task(worker(stock_code)) for stock_code in stock_codes]
+    remaining = len(tasks)
+    try:
+        while remaining > 0:
+            event = await queue.get()
+            if event is finished:
+                remaining -= 1
+                continue
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
@@ -2,6 +2,7 @@ import asyncio
 import json
 import logging
 import os
+import time
 from datetime import datetime
 from typing import AsyncGenerator
 from dotenv import load_dotenv
@@ -10,15 +11,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from db.mysql.db_schemas import Rule, RulePool, PoolStock
+from end_points.get_rule.operations.agent_executor import fan_out, capture_lines, get_rule_concurrency, \
+    get_llm_limiter
+from mcp_servers.tool_cache import tool_cache_snapshot, tool_cache_report
+from data_processing.data_provider.response_cache import response_cache_snapshot, response_cache_report
 
 
 logger = logging.getLogger(__name__)
 
 
-async def stream_agent_execution(db, rule_id: int) -> AsyncGenerator[dict, None]:
+async def stream_agent_execution(db, rule_id: int, concurrency: int = None) -> AsyncGenerator[dict, None]:
     """
     Stream agent execution logs for all stocks in the rule's pools.
 
+    Stocks run concurrently, at most `concurrency` at a time (default: get_rule_concurrency)
+    and their starts throttled by the rule's LLM provider limit, so every event carries
+    the stock_code it belongs to.
+
     Yields:
         dict: Log events with type and data
     """
@@ -41,12 +50,6 @@ async def stream_agent_execution(db, rule_id: int) -> AsyncGenerator[dict, None]
             "timestamp": datetime.now().isoformat()
         }
 
-        yield {
-            "type": "start",
-            "message": f"Starting execution for rule: {rule_record.name} (ID: {rule_id})",
-            "timestamp": datetime.now().isoformat()
-        }
-
         # Get all stocks from pools
         pool_ids = db.session.query(RulePool.pool_id)\
             .filter(RulePool.rule_id == rule_id)\
@@ -84,174 +87,46 @@ async def stream_agent_execution(db, rule_id: int) -> AsyncGenerator[dict, None]
             "stocks": stock_list
         }
 
-        # Process each stock
-        for i, stock_code in enumerate(stock_list, 1):
-            yield {
-                "type": "stock_start",
-                "message": f"[{i}/{len(stock_list)}] Processing {stock_code}...",
-                "stock_code": stock_code,
-                "progress": f"{i}/{len(stock_list)}"
-            }
-
-            try:
-                # For remote agents, we want to capture streaming logs
-                if rule_record.type == 'remote_agent':
-                    async for log_entry in stream_remote_agent_logs(db, rule_id, stock_code):
-                        yield log_entry
-                else:
-                    # For local agents, execute directly in async context
-                    from end_points.get_rule.operations.agent_utils import get_agent_func
-                    from end_points.common.const.consts import Trade
-                    import sys
-                    import threading
-
-                    logger.info(f"Starting local agent execution for {stock_code}, rule_id={rule_id}")
-
-                    # Create structures to capture stdout
-                    captured_lines = []
-                    buffer_lock = threading.Lock()
-                    last_sent_count = 0
-
-                    class OutputCapture:
-                        def __init__(self, original_stdout, lines, lock):
-                            self.original_stdout = original_stdout
-                            self.lines = lines
-                            self.lock = lock
-
-                        def write(self, text):
-                            # Write to original stdout
-                            self.original_stdout.write(text)
-                            # Capture non-empty lines
-                            with self.lock:
-                                if '\n' in text:
-                                    self.lines.append(text.rstrip('\n'))
-
-                        def flush(self):
-                            self.original_stdout.flush()
-
-                    yield {
-                        "type": "log",
-                        "message": f"Starting local agent execution for {stock_code} (may take a few minutes)...",
-                        "stock_code": stock_code
-                    }
-
-                    try:
-                        module_path = rule_record.info
-                        if not module_path:
-                            raise ValueError(f"Local agent {rule_id} must have a module path in info field")
-
-                        agent_func = get_agent_func(module_path)
-                        if agent_func is None:
-                            raise ValueError(f"Failed to import agent from module path: {module_path}")
-
-                        # Redirect stdout to capture agent output
-                        original_stdout = sys.stdout
-                        sys.stdout = OutputCapture(original_stdout, captured_lines, buffer_lock)
-
-                        # Call the agent function
-                        result_or_coro = agent_func(stock_code)
-
-                        if asyncio.iscoroutine(result_or_coro):
-                            # For async agents, run with output streaming and heartbeat
-                            agent_task = asyncio.create_task(result_or_coro)
-
-                            # Check every 5 seconds
-                            check_count = 0
-                            while not agent_task.done():
-                                try:
-                                    await asyncio.wait_for(asyncio.shield(agent_task), timeout=5.0)
-                                    break
-                                except asyncio.TimeoutError:
-                                    check_count += 1
-
-                                    # Send new captured output
-                                    with buffer_lock:
-                                        current_count = len(captured_lines)
-                                        new_lines = captured_lines[last_sent_count:current_count]
-                                        last_sent_count = current_count
-
-                                        for line in new_lines:
-                                            # Filter meaningful lines
-                                            stripped = line.strip()
-                                            if stripped and len(stripped) > 3:
-                                                yield {
-                                                    "type": "log",
-                                                    "message": line,
-                                                    "stock_code": stock_code
-                                                }
-
-                                    # Heartbeat every 30 seconds (6 checks)
-                                    if check_count % 6 == 0:
-                                        elapsed = check_count * 5
-                                        yield {
-                                            "type": "log",
-                                            "message": f"Agent still running... ({elapsed}s elapsed)",
-                                            "stock_code": stock_code
-                                        }
-
-                            # Get result
-                            result = await agent_task
-
-                            # Send remaining output
-                            with buffer_lock:
-                                for line in captured_lines[last_sent_count:]:
-                                    stripped = line.strip()
-                                    if stripped and len(stripped) > 3:
-                                        yield {
-                                            "type": "log",
-                                            "message": line,
-                                            "stock_code": stock_code
-                                        }
-                        else:
-                            result = result_or_coro
-
-                        # Restore stdout
-                        sys.stdout = original_stdout
-
-                        # Convert result to trade type
-                        indicating = Trade.indicating if result is True else Trade.not_indicating
-                        indicating_date = datetime.now().date()
-
-                        # Update trading record
-                        from end_points.get_rule.operations.agent_utils import update_rule_trading
-                        update_rule_trading(db, rule_id, indicating, stock_code, indicating_date)
-
-                        yield {
-                            "type": "log",
-                            "message": f"Local agent execution completed for {stock_code}: {indicating}",
-                            "stock_code": stock_code
-                        }
-
-                        yield {
-                            "type": "stock_complete",
-                            "message": f"✓ {stock_code}: {indicating}",
-                            "stock_code": stock_code,
-                            "result": {'indicating': indicating, 'result': result}
-                        }
+        concurrency = get_rule_concurrency(rule_id, concurrency)
+        yield {
+            "type": "info",
+            "message": f"Running up to {concurrency} stocks at a time",
+            "concurrency": concurrency
+        }
 
-                    except Exception as e:
-                        logger.error(f"Error running local agent for {stock_code}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        yield {
-                            "type": "stock_error",
-                            "message": f"✗ {stock_code}: {str(e)}",
-                            "stock_code": stock_code,
-                            "error": str(e)
-                        }
-            except Exception as e:
-                logger.error(f"Error processing {stock_code}: {e}")
+        async def run_stock(stock_code):
+            if rule_record.type == 'remote_agent':
+                async for log_entry in stream_remote_agent_logs(db, rule_id, stock_code):
+                    yield log_entry
+            else:
+                logger.info(f"Starting local agent execution for {stock_code}, rule_id={rule_id}")
+                async for log_entry in stream_local_agent_logs(db, rule_record, stock_code):
+                    yield log_entry
+
+        # stocks run concurrently, their events arrive interleaved and tagged with stock_code
+        start_time = time.time()
+        cache_before = tool_cache_snapshot()
+        responses_before = response_cache_snapshot()
+        completed, failed = 0, 0
+        async for log_entry in fan_out(stock_list, run_stock, concurrency, get_llm_limiter(rule_id)):
+            if log_entry.get("type") == "stock_complete":
+                completed += 1
+            elif log_entry.get("type") in ("stock_error", "error"):
+                failed += 1
+            yield log_entry
+
+        elapsed = time.time() - start_time
+        for cache_report in (tool_cache_report(cache_before), response_cache_report(responses_before)):
+            if cache_report is not None:
                 yield {
-                    "type": "stock_error",
-                    "message": f"✗ {stock_code}: {str(e)}",
-                    "stock_code": stock_code,
-                    "error": str(e)
+                    "type": "info",
+                    "message": cache_report
                 }
-
         yield {
             "type": "complete",
-            "message": f"Execution complete for rule {rule_id}",
-            "timestamp": datetime.now().isoformat()
+            "message": f"Execution complete for rule {rule_id}: {completed} completed, {failed} failed in {elapsed:.0f}s",
+            "timestamp": datetime.now().isoformat(),
+            "elapsed": round(elapsed, 1)
         }
 
     except Exception as e:
@@ -262,6 +137,99 @@ async def stream_agent_execution(db, rule_id: int) -> AsyncGenerator[dict, None]
         }
 
 
+async def stream_local_agent_logs(db, rule_record, stock_code: str) -> AsyncGenerator[dict, None]:
+    """
+    Run a local agent for one stock and record its decision through update_rule_trading.
+
+    The lines the agent prints are captured for this task only and streamed every 5
+    seconds, with a heartbeat every 30 seconds. Raises when the agent cannot be loaded
+    or fails.
+
+    Yields:
+        dict: Log events
+    """
+    from end_points.get_rule.operations.agent_utils import get_agent_func, update_rule_trading
+    from end_points.common.const.consts import Trade
+
+    yield {
+        "type": "log",
+        "message": f"Starting local agent execution for {stock_code} (may take a few minutes)...",
+        "stock_code": stock_code
+    }
+
+    module_path = rule_record.info
+    if not module_path:
+        raise ValueError(f"Local agent {rule_record.id} must have a module path in info field")
+
+    agent_func = get_agent_func(module_path)
+    if agent_func is None:
+        raise ValueError(f"Failed to import agent from module path: {module_path}")
+
+    sent = 0
+
+    def new_log_entries(sink):
+        nonlocal sent
+        lines = sink.take(sent)
+        sent += len(lines)
+        # Filter meaningful lines
+        return [{"type": "log", "message": line, "stock_code": stock_code}
+                for line in lines if len(line.strip()) > 3]
+
+    with capture_lines() as sink:
+        # Call the agent function
+        result_or_coro = agent_func(stock_code)
+
+        if asyncio.iscoroutine(result_or_coro):
+            # For async agents, run with output streaming and heartbeat
+            agent_task = asyncio.create_task(result_or_coro)
+            try:
+                # Check every 5 seconds
+                check_count = 0
+                while not agent_task.done():
+                    try:
+                        await asyncio.wait_for(asyncio.shield(agent_task), timeout=5.0)
+                        break
+                    except asyncio.TimeoutError:
+                        check_count += 1
+                        for log_entry in new_log_entries(sink):
+                            yield log_entry
+
+                        # Heartbeat every 30 seconds (6 checks)
+                        if check_count % 6 == 0:
+                            yield {
+                                "type": "log",
+                                "message": f"Agent still running... ({check_count * 5}s elapsed)",
+                                "stock_code": stock_code
+                            }
+                result = await agent_task
+            finally:
+                if not agent_task.done():
+                    agent_task.cancel()
+        else:
+            result = result_or_coro
+
+        # Send remaining output
+        for log_entry in new_log_entries(sink):
+            yield log_entry
+
+    # Convert result to trade type
+    indicating = Trade.indicating if result is True else Trade.not_indicating
+    update_rule_trading(db, rule_record.id, indicating, stock_code, datetime.now().date())
+
+    yield {
+        "type": "log",
+        "message": f"Local agent execution completed for {stock_code}: {indicating}",
+        "stock_code": stock_code
+    }
+
+    yield {
+        "type": "stock_complete",
+        "message": f"✓ {stock_code}: {indicating}",
+        "stock_code": stock_code,
+        "result": {'indicating': indicating, 'result': result}
+    }
+
+
 async def stream_remote_agent_logs(db, rule_id: int, stock_code: str) -> AsyncGenerator[dict, None]:
     """
     Stream logs from remote A2A agent execution.
@@ -495,133 +463,10 @@ async def stream_single_stock_execution(db, rule_id: int, stock_code: str) -> As
             async for log_entry in stream_remote_agent_logs(db, rule_id, stock_code):
                 yield log_entry
         else:
-            # For local agents, execute directly in async context
-            from end_points.get_rule.operations.agent_utils import get_agent_func
-            from end_points.common.const.consts import Trade
-            import sys
-            import threading
-
-            # Create structures to capture stdout
-            captured_lines = []
-            buffer_lock = threading.Lock()
-            last_sent_count = 0
-
-            class OutputCapture:
-                def __init__(self, original_stdout, lines, lock):
-                    self.original_stdout = original_stdout
-                    self.lines = lines
-                    self.lock = lock
-
-                def write(self, text):
-                    self.original_stdout.write(text)
-                    with self.lock:
-                        if '\n' in text:
-                            self.lines.append(text.rstrip('\n'))
-
-                def flush(self):
-                    self.original_stdout.flush()
-
             try:
-                yield {
-                    "type": "log",
-                    "message": f"Starting agent execution (may take a few minutes)...",
-                    "stock_code": stock_code
-                }
-
-                module_path = rule_record.info
-                if not module_path:
-                    raise ValueError(f"Local agent {rule_id} must have a module path in info field")
-
-                agent_func = get_agent_func(module_path)
-                if agent_func is None:
-                    raise ValueError(f"Failed to import agent from module path: {module_path}")
-
-                # Redirect stdout to capture agent output
-                original_stdout = sys.stdout
-                sys.stdout = OutputCapture(original_stdout, captured_lines, buffer_lock)
-
-                # Call the agent function
-                result_or_coro = agent_func(stock_code)
-
-                if asyncio.iscoroutine(result_or_coro):
-                    # For async agents, run with output streaming and heartbeat
-                    agent_task = asyncio.create_task(result_or_coro)
-
-                    # Check every 5 seconds
-                    check_count = 0
-                    while not agent_task.done():
-                        try:
-                            await asyncio.wait_for(asyncio.shield(agent_task), timeout=5.0)
-                            break
-                        except asyncio.TimeoutError:
-                            check_count += 1
-
-                            # Send new captured output
-                            with buffer_lock:
-                                current_count = len(captured_lines)
-                                new_lines = captured_lines[last_sent_count:current_count]
-                                last_sent_count = current_count
-
-                                for line in new_lines:
-                                    stripped = line.strip()
-                                    if stripped and len(stripped) > 3:
-                                        yield {
-                                            "type": "log",
-                                            "message": line,
-                                            "stock_code": stock_code
-                                        }
-
-                            # Heartbeat every 30 seconds
-                            if check_count % 6 == 0:
-                                elapsed = check_count * 5
-                                yield {
-                                    "type": "log",
-                                    "message": f"Agent still running... ({elapsed}s elapsed)",
-                                    "stock_code": stock_code
-                                }
-
-                    result = await agent_task
-
-                    # Send remaining output
-                    with buffer_lock:
-                        for line in captured_lines[last_sent_count:]:
-                            stripped = line.strip()
-                            if stripped and len(stripped) > 3:
-                                yield {
-                                    "type": "log",
-                                    "message": line,
-                                    "stock_code": stock_code
-                                }
-                else:
-                    result = result_or_coro
-
-                # Restore stdout
-                sys.stdout = original_stdout
-
-                # Convert result to trade type
-                indicating = Trade.indicating if result is True else Trade.not_indicating
-                indicating_date = datetime.now().date()
-
-                # Update trading record
-                from end_points.get_rule.operations.agent_utils import update_rule_trading
-                update_rule_trading(db, rule_id, indicating, stock_code, indicating_date)
-
-                yield {
-                    "type": "log",
-                    "message": f"Agent execution completed: {indicating}",
-                    "stock_code": stock_code
-                }
-
-                yield {
-                    "type": "stock_complete",
-                    "message": f"✓ {stock_code}: {indicating}",
-                    "stock_code": stock_code,
-                    "result": {'indicating': indicating, 'result': result}
-                }
-
+                async for log_entry in stream_local_agent_logs(db, rule_record, stock_code):
+                    yield log_entry
             except Exception as e:
-                # Restore stdout on error
-                sys.stdout = original_stdout
                 logger.error(f"Error running local agent for {stock_code}: {e}")
                 import traceback
                 traceback.print_exc()
@@ -1,4 +1,6 @@
 import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import asyncio
 import pandas as pd
@@ -7,8 +9,14 @@ from functools import lru_cache
 import logging
 
 from db.mysql.db_schemas import Simulator, AgentTrading, Rule, RulePool, PoolStock
-from end_points.common.const.consts import Trade
-from end_points.get_simulator.operations.get_simulator_utils import update_sim_model
+from end_points.common.const.consts import Trade, RuleType
+from end_points.get_rule.operations.agent_executor import get_rule_concurrency, get_llm_limiter
+from end_points.get_rule.operations.agent_worker_pool import get_worker_pool, worker_pool_processes, \
+    warm_worker_pools
+from mcp_servers.tool_cache import tool_cache_snapshot, tool_cache_report
+from data_processing.data_provider.response_cache import response_cache_snapshot, response_cache_report
+from end_points.get_simulator.operations.get_simulator_utils import update_sim_model, get_sim_config, \
+    load_sim_checkpoint, get_checkpoint_cutoff
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +65,13 @@ def get_agent_func(full_path: str):
         return None
 
 
+def warm_agent_workers(db):
+    """Start the worker pools of all local agent rules, so their first run finds the agent imported"""
+    module_paths = [info for (info,) in db.session.query(Rule.info)
+                    .filter(Rule.type.in_([RuleType.agent, RuleType.local_agent])).all()]
+    return warm_worker_pools(module_paths)
+
+
 def get_agent_buying_stocks(db, rule_id):
     """
     Get all stocks from pools that belong to this rule.
@@ -148,9 +163,28 @@ def update_rule_trading(db, rule_id, trade_type, stock_code, trade_date):
             db.session.commit()
     return
 
-def run_sim_agent(db, agent_sim_id):
+def run_sim_agent(db, agent_sim_id, full_rebuild=False, load_bars=None):
+    """
+    Update a simulator from its rule's AgentTrading signals.
+
+    By default the simulator resumes from its checkpoint and only replays the
+    signals and bars after it. The whole history is replayed when full_rebuild
+    is set, when there is no usable checkpoint, or when signals dated on or before
+    the checkpoint were added after it was taken.
+    load_bars is passed on to update_sim_model.
+    """
     agent_rule_id = db.session.query(Simulator.rule_id).filter(Simulator.id == agent_sim_id).scalar()
-    record = db.session.query(AgentTrading).filter(AgentTrading.rule_id == agent_rule_id).all()
+    checkpoint = None if full_rebuild else load_sim_checkpoint(db, agent_sim_id, get_sim_config(db))
+    query = db.session.query(AgentTrading).filter(AgentTrading.rule_id == agent_rule_id)
+    if checkpoint is not None:
+        cutoff = get_checkpoint_cutoff(checkpoint)
+        backfilled = query.filter(AgentTrading.trading_date <= checkpoint['last_date'])\
+            .filter(AgentTrading.created_at > checkpoint['updated_at']).first()
+        if backfilled is None:
+            query = query.filter(AgentTrading.trading_date >= cutoff)
+        else:
+            checkpoint = None
+    record = query.all()
     indicating_items = []
     for each_item in record:
         stock_code = each_item.stock
@@ -161,7 +195,7 @@ def run_sim_agent(db, agent_sim_id):
         }
         indicating_items.append(indi_item)
 
-    indicating_date = update_sim_model(db, agent_sim_id, indicating_items)
+    indicating_date = update_sim_model(db, agent_sim_id, indicating_items, checkpoint=checkpoint, load_bars=load_bars)
     return indicating_date
 
 
@@ -181,7 +215,20 @@ def run_async(coro):
         return future.result()
 
 
-def run_agent_for_stock(db, rule_id, stock_code):
+def terminate_children(children):
+    """Terminate agent child processes, killing the ones still alive after 5 seconds"""
+    for p in children:
+        try:
+            p.terminate()
+            p.join(timeout=5)  # Wait up to 5 seconds for graceful termination
+            if p.is_alive():
+                p.kill()  # Force kill if still alive
+                p.join()
+        except Exception as e:
+            print(f'Error terminating child process: {e}')
+
+
+def run_agent_for_stock(db, rule_id, stock_code, cleanup_children=True):
     """
     Run an agent-type rule for a single stock.
 
@@ -189,6 +236,8 @@ def run_agent_for_stock(db, rule_id, stock_code):
         db: Database session
         rule_id: Agent rule ID (3000=fingenius, 3001=tauric, 3002=quant_agent_vlm)
         stock_code: Stock code to analyze
+        cleanup_children: terminate the child processes started during this run; off when
+                          several stocks run at once, their children are told apart by the caller
 
     Returns:
         dict: {
@@ -276,14 +325,18 @@ def run_agent_for_stock(db, rule_id, stock_code):
         if not module_path:
             raise ValueError(f"Local agent {rule_id} must have a module path in info field")
 
-        # Dynamically import and execute agent function
-        agent_func = get_agent_func(module_path)
-        if agent_func is None:
-            raise ValueError(f"Failed to import agent from module path: {module_path}")
-
         # Strip stock exchange suffix (e.g., '600519.SH' -> '600519')
         clean_stock_code = stock_code.split('.')[0] if '.' in stock_code else stock_code
-        result = run_async(agent_func(clean_stock_code))
+        pool = get_worker_pool(module_path)
+        if pool is not None:
+            # warm worker process: module already imported, its own event loop and subprocess cleanup
+            result = pool.run(clean_stock_code)
+        else:
+            # Dynamically import and execute agent function
+            agent_func = get_agent_func(module_path)
+            if agent_func is None:
+                raise ValueError(f"Failed to import agent from module path: {module_path}")
+            result = run_async(agent_func(clean_stock_code))
 
         # Convert result to trade type
         indicating = Trade.indicating if result is True else Trade.not_indicating
@@ -313,31 +366,56 @@ def run_agent_for_stock(db, rule_id, stock_code):
             'error': str(e)
         }
     finally:
-        # Only clean up child processes created by this invocation
-        children_after = set(multiprocessing.active_children())
-        new_children = children_after - children_before
-
-        for p in new_children:
-            try:
-                p.terminate()
-                p.join(timeout=5)  # Wait up to 5 seconds for graceful termination
-                if p.is_alive():
-                    p.kill()  # Force kill if still alive
-                    p.join()
-            except Exception as e:
-                print(f'Error terminating child process: {e}')
+        # Only clean up child processes created by this invocation, pool workers stay up
+        if cleanup_children:
+            terminate_children(set(multiprocessing.active_children()) - children_before - worker_pool_processes())
 
 
-def run_agent(db, rule_id):
+def run_agent(db, rule_id, concurrency=None):
     """
     Run an agent-type rule for all stocks in its pools.
 
+    Stocks run on a thread pool, at most `concurrency` at a time (default:
+    get_rule_concurrency), each start taking a token of the rule's LLM provider limit.
+    Results are written by run_agent_for_stock through update_rule_trading.
+
     Args:
         db: Database session
         rule_id: Agent rule ID
+        concurrency: stocks run at the same time
+
+    Returns:
+        list: run_agent_for_stock results in pool order
     """
     buying_stocks_list = get_agent_buying_stocks(db, rule_id)
     print(f'Buying stocks for today are: {buying_stocks_list}')
+    if len(buying_stocks_list) == 0:
+        return []
 
-    for stock_code in buying_stocks_list:
-        run_agent_for_stock(db, rule_id, stock_code)
+    concurrency = min(get_rule_concurrency(rule_id, concurrency), len(buying_stocks_list))
+    limiter = get_llm_limiter(rule_id)
+    children_before = set(multiprocessing.active_children())
+
+    def run(stock_code):
+        try:
+            if limiter is not None:
+                limiter.acquire()
+            return run_agent_for_stock(db, rule_id, stock_code, cleanup_children=concurrency == 1)
+        finally:
+            # scoped sessions are per thread, release this worker's connection
+            db.session.remove()
+
+    start_time = time.time()
+    cache_before = tool_cache_snapshot()
+    responses_before = response_cache_snapshot()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run, buying_stocks_list))
+    terminate_children(set(multiprocessing.active_children()) - children_before - worker_pool_processes())
+
+    succeeded = sum(1 for result in results if result.get('success'))
+    print(f'Agent {rule_id} finished {succeeded}/{len(results)} stocks in {time.time() - start_time:.0f}s '
+          f'with {concurrency} workers')
+    for cache_report in (tool_cache_report(cache_before), response_cache_report(responses_before)):
+        if cache_report is not None:
+            print(cache_report)
+    return results
@@ -0,0 +1,341 @@
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+# worker processes per agent module path, 0 runs agents in the calling process as before
+AGENT_WORKERS = int(os.getenv('AGENT_WORKERS', 4))
+# a worker is replaced after this many runs or once its resident memory is above the limit
+AGENT_WORKER_MAX_TASKS = int(os.getenv('AGENT_WORKER_MAX_TASKS', 50))
+AGENT_WORKER_MAX_RSS_MB = int(os.getenv('AGENT_WORKER_MAX_RSS_MB', 2048))
+# seconds one agent run may take before its worker is killed
+AGENT_WORKER_TIMEOUT = int(os.getenv('AGENT_WORKER_TIMEOUT', 1800))
+# idle workers are pinged before reuse when silent for longer than this
+AGENT_WORKER_PING_INTERVAL = 30
+AGENT_WORKER_PING_TIMEOUT = 10
+# start the pools of every local agent rule with the API instead of on their first run
+AGENT_WORKER_PRELOAD = os.getenv('AGENT_WORKER_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+# seconds a new worker may take to import its agent module
+AGENT_WORKER_START_TIMEOUT = 300
+
+
+class AgentWorkerError(Exception):
+    """An agent run failed inside a worker process, or the worker died or timed out"""
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB, from /proc when available, else the peak from getrusage"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, KB elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def worker_main(module_path, conn, max_tasks, max_rss_mb):
+    """
+    Entry point of a worker process. The agent module is imported once and one event loop
+    is kept for the life of the worker, so module-level state (loaded models, MCP clients)
+    is reused across runs. Messages from the pool:
+        ('run', stock_code) -> ('done', ok, result or error, rss_mb, retire)
+        ('ping', None)      -> ('pong', rss_mb)
+        None                -> exit
+    """
+    from end_points.get_rule.operations.agent_utils import get_agent_func, terminate_children
+
+    def exit_handler(signum, frame):
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, exit_handler)
+    # Ctrl+C in the server terminal is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    agent_func = get_agent_func(module_path)
+    conn.send(('ready', agent_func is not None))
+    if agent_func is None:
+        return
+
+    handled = 0
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                return
+            kind, stock_code = message
+            if kind == 'ping':
+                conn.send(('pong', current_rss_mb()))
+                continue
+
+            children_before = set(multiprocessing.active_children())
+            try:
+                result = agent_func(stock_code)
+                if asyncio.iscoroutine(result):
+                    result = loop.run_until_complete(result)
+                ok = True
+            except Exception as e:
+                traceback.print_exc()
+                ok, result = False, f'{type(e).__name__}: {e}'
+            finally:
+                # agents may start their own subprocesses, they do not outlive the run
+                terminate_children(set(multiprocessing.active_children()) - children_before)
+            handled += 1
+            rss_mb = current_rss_mb()
+            retire = handled >= max_tasks or rss_mb >= max_rss_mb
+            try:
+                conn.send(('done', ok, result, rss_mb, retire))
+            except (TypeError, AttributeError, ValueError) as e:
+                # result that cannot be pickled
+                conn.send(('done', False, f'Unpicklable agent result: {e}', rss_mb, retire))
+            if retire:
+                return
+    except (EOFError, KeyboardInterrupt):
+        return
+    finally:
+        loop.close()
+
+
+class AgentWorker:
+    """One worker process and the parent end of its pipe"""
+
+    def __init__(self, module_path, context, max_tasks, max_rss_mb):
+        self.module_path = module_path
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(module_path, child_conn, max_tasks, max_rss_mb),
+                                       name=f'agent-worker:{module_path}', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        # died, timed out or retired after a failed run, the pool replaces it
+        self.broken = False
+        self.tasks = 0
+        self.rss_mb = 0.0
+        self.last_seen = time.time()
+
+    def _receive(self, timeout):
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        message = self.conn.recv()
+        self.last_seen = time.time()
+        return message
+
+    def wait_ready(self, timeout=AGENT_WORKER_START_TIMEOUT):
+        if self.ready:
+            return
+        try:
+            _, imported = self._receive(timeout)
+        except (TimeoutError, EOFError, OSError):
+            raise AgentWorkerError(f'Agent worker for {self.module_path} did not start')
+        if not imported:
+            self.broken = True
+            raise ValueError(f'Failed to import agent from module path: {self.module_path}')
+        self.ready = True
+
+    def is_healthy(self):
+        """Alive, and answering a ping when it has been silent for a while"""
+        if not self.process.is_alive():
+            return False
+        if time.time() - self.last_seen < AGENT_WORKER_PING_INTERVAL:
+            return True
+        try:
+            self.conn.send(('ping', None))
+            _, self.rss_mb = self._receive(AGENT_WORKER_PING_TIMEOUT)
+            return True
+        except (TimeoutError, EOFError, OSError):
+            return False
+
+    def run(self, stock_code, timeout):
+        """Result of the agent for stock_code and whether the worker retired after it"""
+        try:
+            self.conn.send(('run', stock_code))
+            _, ok, result, self.rss_mb, retire = self._receive(timeout)
+        except TimeoutError:
+            self.broken = True
+            raise AgentWorkerError(f'Agent {self.module_path} timed out after {timeout}s on {stock_code}')
+        except (EOFError, OSError):
+            self.broken = True
+            raise AgentWorkerError(f'Agent worker for {self.module_path} died while running {stock_code}')
+        self.tasks += 1
+        if not ok:
+            self.broken = retire
+            raise AgentWorkerError(result)
+        return result, retire
+
+    def stop(self, timeout=5):
+        try:
+            if self.process.is_alive():
+                self.conn.send(None)
+                self.process.join(timeout)
+        except (OSError, ValueError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+
+
+class AgentWorkerPool:
+    """
+    Pre-warmed worker processes for one agent module path (Rule.info).
+
+    Idle workers wait in a queue; run() takes one, checks its health, sends it the stock
+    and puts it back. Workers that die, time out, reach max_tasks runs or max_rss_mb of
+    memory are replaced by a fresh process, so a run never pays the import and start-up
+    cost of the agent unless its worker was just recycled.
+    """
+
+    def __init__(self, module_path, workers=AGENT_WORKERS, max_tasks=AGENT_WORKER_MAX_TASKS,
+                 max_rss_mb=AGENT_WORKER_MAX_RSS_MB):
+        self.module_path = module_path
+        self.size = workers
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        # spawn: the parent runs threads and an event loop, a forked copy of them is unsafe
+        self.context = multiprocessing.get_context('spawn')
+        self.idle = queue.Queue()
+        self.workers = set()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.recycled = 0
+        for _ in range(workers):
+            self.idle.put(self._start_worker())
+
+    def _start_worker(self):
+        worker = AgentWorker(self.module_path, self.context, self.max_tasks, self.max_rss_mb)
+        with self.lock:
+            self.workers.add(worker)
+        return worker
+
+    def _replace(self, worker):
+        with self.lock:
+            self.workers.discard(worker)
+            self.recycled += 1
+        worker.stop()
+        return self._start_worker()
+
+    def _checkout(self):
+        worker = self.idle.get()
+        if self.closed:
+            self.idle.put(worker)
+            raise AgentWorkerError(f'Agent worker pool for {self.module_path} is shut down')
+        try:
+            worker.wait_ready()
+            if not worker.is_healthy():
+                logger.warning(f'Agent worker {worker.process.pid} for {self.module_path} is unresponsive, '
+                               f'restarting it')
+                worker = self._replace(worker)
+                worker.wait_ready()
+        except Exception:
+            # keep the pool at full size, an import error is raised again by the next run
+            self._release(worker, replace=True)
+            raise
+        return worker
+
+    def _release(self, worker, replace=False):
+        if self.closed:
+            worker.stop()
+            return
+        if replace:
+            worker = self._replace(worker)
+        self.idle.put(worker)
+
+    def run(self, stock_code, timeout=AGENT_WORKER_TIMEOUT):
+        """Run the agent for stock_code in a worker, blocking while all workers are busy"""
+        worker = self._checkout()
+        try:
+            result, retire = worker.run(stock_code, timeout)
+        except AgentWorkerError:
+            self._release(worker, replace=worker.broken)
+            raise
+        if retire:
+            logger.info(f'Recycling agent worker {worker.process.pid} for {self.module_path} '
+                        f'after {worker.tasks} runs, {worker.rss_mb:.0f} MB')
+        self._release(worker, replace=retire)
+        return result
+
+    def processes(self):
+        with self.lock:
+            return set(worker.process for worker in self.workers)
+
+    def stats(self):
+        with self.lock:
+            workers = list(self.workers)
+        return {
+            'module_path': self.module_path,
+            'workers': len(workers),
+            'idle': self.idle.qsize(),
+            'recycled': self.recycled,
+            'tasks': sum(worker.tasks for worker in workers),
+            'rss_mb': dict((worker.process.pid, round(worker.rss_mb, 1)) for worker in workers),
+        }
+
+    def shutdown(self):
+        self.closed = True
+        with self.lock:
+            workers = list(self.workers)
+            self.workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(module_path):
+    """Process-wide worker pool of an agent module path, started on first use. None when AGENT_WORKERS is 0."""
+    if AGENT_WORKERS <= 0:
+        return None
+    with _pools_lock:
+        pool = _pools.get(module_path)
+        if pool is None:
+            pool = _pools[module_path] = AgentWorkerPool(module_path)
+        return pool
+
+
+def warm_worker_pools(module_paths):
+    """Start the pools of these module paths ahead of the first run, the workers import their agent meanwhile"""
+    return [get_worker_pool(module_path) for module_path in set(module_paths) if module_path]
+
+
+def worker_pool_processes():
+    """Worker processes of every pool, callers cleaning up agent children must leave them alone"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    processes = set()
+    for pool in pools:
+        processes |= pool.processes()
+    return processes
+
+
+def worker_pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def shutdown_worker_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+atexit.register(shutdown_worker_pools)
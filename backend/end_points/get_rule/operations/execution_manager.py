@@ -15,9 +15,9 @@ class ExecutionStatus(Enum):
 
 
 class Execution:
-    def __init__(self, execution_id: str, rule_id: int, stock_code: Optional[str] = None):
+    def __init__(self, execution_id: str, rule_id: Optional[int], stock_code: Optional[str] = None):
         self.execution_id = execution_id
-        self.rule_id = rule_id
+        self.rule_id = rule_id  # None for jobs not bound to one rule, e.g. bulk simulator runs
         self.stock_code = stock_code  # None means all stocks
         self.status = ExecutionStatus.PENDING
         self.created_at = datetime.now()
@@ -43,7 +43,7 @@ class ExecutionManager:
         self.cleanup_interval = 3600  # 1 hour
         self.retention_time = 7200  # 2 hours
 
-    def create_execution(self, rule_id: int, stock_code: Optional[str] = None) -> Execution:
+    def create_execution(self, rule_id: Optional[int], stock_code: Optional[str] = None) -> Execution:
         """Create a new execution"""
         import uuid
         execution_id = str(uuid.uuid4())[:8]
@@ -63,7 +63,8 @@ class ExecutionManager:
         execution.status = ExecutionStatus.RUNNING
         execution.add_log({
             "type": "start",
-            "message": f"Execution started for rule {execution.rule_id}"
+            "message": f"Execution started for rule {execution.rule_id}" if execution.rule_id is not None
+            else "Execution started"
         })
 
         try:
@@ -398,11 +398,11 @@ def addRule(db, args):
 
 # Turbulence functionality removed - not used by Agent system
 
-def runRuleAgent(db, rule_id):
-    """Run an agent-type rule"""
+def runRuleAgent(db, rule_id, concurrency=None):
+    """Run an agent-type rule, `concurrency` stocks at a time (default: the rule's setting)"""
     from end_points.get_rule.operations.agent_utils import run_agent
     try:
-        run_agent(db, rule_id)
+        run_agent(db, rule_id, concurrency)
         rst = {
             'code': 'SUCCESS',
             'data': {
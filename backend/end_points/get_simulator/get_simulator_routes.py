@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional
+import json
 import traceback
 import logging
 
@@ -16,6 +18,9 @@ from end_points.get_simulator.operations.simulator_config_ops import (
     get_simulator_config,
     update_simulator_config
 )
+from end_points.get_simulator.operations.bulk_simulator_run import stream_bulk_simulator_run, BULK_RUN_CONCURRENCY, \
+    BULK_RUN_MAX_CONCURRENCY
+from end_points.get_rule.operations.execution_manager import execution_manager
 from end_points.get_simulator.simulator_schema import SimulatorCreateArgs
 from end_points.get_simulator.simulator_config_schema import SimulatorConfigCreate
 from end_points.common.utils.db import get_db
@@ -104,6 +109,7 @@ async def get_simulator(
 async def run_simulator(
     sim_id: int,
     bind_key: Optional[str] = Query(default=None),
+    full_rebuild: bool = Query(default=False),
     db=Depends(get_db)
 ):
     """
@@ -112,18 +118,101 @@ async def run_simulator(
     Args:
         sim_id: Simulator ID
         bind_key: Database bind key
+        full_rebuild: Replay the whole signal history instead of resuming from the checkpoint
 
     Returns:
         Dictionary with code and result
     """
     try:
-        args = {'bind_key': bind_key}
+        args = {'bind_key': bind_key, 'full_rebuild': full_rebuild}
         rst = runSimulator(db, args, sim_id)
         return rst
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/simulators/run")
+async def start_bulk_simulator_run(
+    rule_type: Optional[str] = Query(default=None),
+    full_rebuild: bool = Query(default=False),
+    concurrency: int = Query(default=BULK_RUN_CONCURRENCY, ge=1, le=BULK_RUN_MAX_CONCURRENCY),
+    db=Depends(get_db)
+):
+    """
+    Re-run all simulators, or those of rule_type, as a background job
+
+    Args:
+        rule_type: Rule type filter
+        full_rebuild: Replay the whole signal history instead of resuming from the checkpoints
+        concurrency: Number of simulators run at the same time
+
+    Returns:
+        execution_id to use with /simulators/run/stream endpoint
+    """
+    execution = execution_manager.create_execution(None)
+
+    import asyncio
+    import threading
+
+    def run_in_background():
+        async def _run():
+            await execution_manager.execute_and_capture(
+                execution,
+                stream_bulk_simulator_run,
+                db,
+                rule_type,
+                full_rebuild,
+                concurrency
+            )
+        asyncio.run(_run())
+
+    thread = threading.Thread(target=run_in_background, daemon=True)
+    thread.start()
+
+    return {
+        'code': 'SUCCESS',
+        'execution_id': execution.execution_id,
+        'rule_type': rule_type
+    }
+
+
+@router.get("/simulators/run/stream")
+async def stream_bulk_simulator_run_logs(
+    execution_id: str = Query(..., description="Execution ID from /simulators/run endpoint")
+):
+    """
+    Stream bulk simulator run progress via Server-Sent Events (SSE)
+
+    Args:
+        execution_id: Execution ID from start endpoint
+
+    Returns:
+        StreamingResponse with SSE events
+    """
+    async def event_generator():
+        try:
+            async for log_entry in execution_manager.stream_execution_logs(execution_id):
+                data = json.dumps(log_entry, ensure_ascii=False)
+                yield f"data: {data}\n\n"
+        except Exception as e:
+            logging.error(f"Error in bulk simulator run stream: {e}")
+            error_data = json.dumps({
+                "type": "error",
+                "message": f"Stream error: {str(e)}"
+            }, ensure_ascii=False)
+            yield f"data: {error_data}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.delete("/simulator/{sim_id}", response_model=Dict[str, Any])
 async def delete_simulator(
     sim_id: int,
@@ -236,7 +325,8 @@ async def update_config(
             db,
             config_data.profit_threshold,
             config_data.stop_loss,
-            config_data.max_holding_days
+            config_data.max_holding_days,
+            config_data.workers
         )
         return rst
     except Exception as e:
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncGenerator, Optional
+
+from db.mysql.db_schemas import Simulator, Rule, AgentTrading
+from end_points.get_rule.operations.agent_utils import run_sim_agent
+from end_points.get_stock.operations.get_stock_utils import stockDataFrameFromTushare
+
+logger = logging.getLogger(__name__)
+
+BULK_RUN_CONCURRENCY = 4
+BULK_RUN_MAX_CONCURRENCY = 16
+
+
+class SharedBarLoader:
+    """
+    Per-job stock_code -> bar DataFrame memo, each stock is loaded once however many
+    simulators of the job hold it. Concurrent requests for the same stock wait for
+    the first load instead of starting their own. Frames are shared read-only.
+    """
+
+    def __init__(self, load_bars=None):
+        self.load_bars = load_bars or stockDataFrameFromTushare
+        self._bars = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def _lock(self, stock_code):
+        with self._locks_guard:
+            return self._locks.setdefault(stock_code, threading.Lock())
+
+    def __call__(self, stock_code):
+        with self._lock(stock_code):
+            if stock_code in self._bars:
+                self.hits += 1
+            else:
+                self.loads += 1
+                self._bars[stock_code] = self.load_bars(stock_code)
+            return self._bars[stock_code]
+
+    def clear(self):
+        self._bars.clear()
+
+
+def get_bulk_simulators(db, rule_type: Optional[str] = None):
+    """(sim_id, rule_id) of the simulators to re-run, all of them unless rule_type is given"""
+    query = db.session.query(Simulator.id, Simulator.rule_id).join(Rule, Rule.id == Simulator.rule_id)
+    if rule_type:
+        query = query.filter(Rule.type == rule_type)
+    return query.order_by(Simulator.id).all()
+
+
+def count_bulk_stocks(db, rule_ids):
+    """Number of distinct stocks signalled for rule_ids, i.e. bar loads the job will do at most"""
+    if not rule_ids:
+        return 0
+    return db.session.query(AgentTrading.stock).filter(AgentTrading.rule_id.in_(rule_ids)).distinct().count()
+
+
+def run_one_simulator(db, sim_id, full_rebuild, load_bars):
+    """Run a single simulator on a worker thread, db.session is thread-scoped so it is removed afterwards"""
+    try:
+        return run_sim_agent(db, sim_id, full_rebuild=full_rebuild, load_bars=load_bars)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.remove()
+
+
+async def stream_bulk_simulator_run(db, rule_type: Optional[str] = None, full_rebuild: bool = False,
+                                    concurrency: int = BULK_RUN_CONCURRENCY) -> AsyncGenerator[dict, None]:
+    """
+    Re-run all simulators (or those of rule_type) with at most `concurrency` running at a time.
+
+    Bars are loaded through one SharedBarLoader for the whole job, so overlapping pools
+    download each stock once. A failing simulator is reported and the job moves on.
+
+    Yields:
+        dict: Log events with type and data
+    """
+    concurrency = min(max(int(concurrency), 1), BULK_RUN_MAX_CONCURRENCY)
+    simulators = get_bulk_simulators(db, rule_type)
+    total = len(simulators)
+    if total == 0:
+        yield {
+            "type": "warning",
+            "message": f"No simulators found for rule type {rule_type}" if rule_type else "No simulators found"
+        }
+        return
+
+    stock_count = count_bulk_stocks(db, sorted(set(rule_id for (_, rule_id) in simulators)))
+    db.session.remove()
+    yield {
+        "type": "info",
+        "message": f"Re-running {total} simulators over {stock_count} stocks with concurrency {concurrency}",
+        "sim_ids": [sim_id for (sim_id, _) in simulators],
+        "timestamp": datetime.now().isoformat()
+    }
+
+    start_time = time.time()
+    load_bars = SharedBarLoader()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk_sim')
+    try:
+        futures = {}
+        for sim_id, rule_id in simulators:
+            future = loop.run_in_executor(executor, run_one_simulator, db, sim_id, full_rebuild, load_bars)
+            futures[future] = sim_id
+        done_count = 0
+        failed = []
+        pending = set(futures.keys())
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                sim_id = futures[future]
+                done_count += 1
+                progress = f"{done_count}/{total}"
+                error = future.exception()
+                if error is None:
+                    yield {
+                        "type": "sim_complete",
+                        "message": f"[{progress}] Simulator {sim_id} updated",
+                        "sim_id": sim_id,
+                        "progress": progress,
+                        "bar_loads": load_bars.loads
+                    }
+                else:
+                    failed.append(sim_id)
+                    logger.error(f"Bulk run of simulator {sim_id} failed: {error}")
+                    yield {
+                        "type": "sim_error",
+                        "message": f"[{progress}] Simulator {sim_id} failed: {error}",
+                        "sim_id": sim_id,
+                        "progress": progress
+                    }
+    finally:
+        executor.shutdown(wait=True)
+        load_bars.clear()
+
+    yield {
+        "type": "summary",
+        "message": f"{total - len(failed)}/{total} simulators updated in {time.time() - start_time:.1f}s, "
+                   f"{load_bars.loads} bar loads shared by {load_bars.loads + load_bars.hits} requests",
+        "failed": failed,
+        "bar_loads": load_bars.loads,
+        "bar_hits": load_bars.hits
+    }
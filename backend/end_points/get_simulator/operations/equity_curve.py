@@ -0,0 +1,116 @@
+import numpy as np
+
+from data_processing.data_provider.trading_calendar import to_days
+
+# stored precision of the equity curve, 4 bytes per trading day
+EQUITY_DTYPE = np.float32
+DAYS_DTYPE = np.int32
+TRADING_DAYS_PER_YEAR = 252
+
+
+def get_trading_days(stock_bars):
+    """Sorted union of the bar dates of all loaded stocks, used as the equity curve axis"""
+    days = [to_days(stock_data['date']) for stock_data in stock_bars.values() if len(stock_data) > 0]
+    if len(days) == 0:
+        return np.array([], dtype='datetime64[D]')
+    return np.unique(np.concatenate(days))
+
+
+def get_close_matrix(days, stock_bars, stock_codes):
+    """(days x stock_codes) close prices, a day without a bar carries the previous close forward"""
+    closes = np.full((len(days), len(stock_codes)), np.nan)
+    for col, stock_code in enumerate(stock_codes):
+        stock_data = stock_bars.get(stock_code)
+        if stock_data is None or len(stock_data) == 0:
+            continue
+        bar_days = to_days(stock_data['date'])
+        bar_close = stock_data['close'].ffill().to_numpy(dtype=float)
+        idx = np.searchsorted(bar_days, days, side='right') - 1
+        closes[:, col] = np.where(idx >= 0, bar_close[np.maximum(idx, 0)], np.nan)
+    return closes
+
+
+def build_equity_curve(days, stock_bars, start_cash, cash_points, positions):
+    """
+    Daily mark-to-market equity (cash + shares * close at the end of each day) on `days`.
+
+    Args:
+        days: sorted datetime64[D] axis
+        stock_bars: stock_code -> bar DataFrame with 'date' and 'close'
+        start_cash: cash before the first of cash_points
+        cash_points: [(date, cash)], cash right after each buy / sell in event order
+        positions: [(stock_code, share, bought_date, sell_date)], sell_date None while still open,
+                   a position is held from the end of its buy day up to its sell day
+    """
+    n_days = len(days)
+    if n_days == 0:
+        return np.array([], dtype=float)
+
+    cash = np.full(n_days, float(start_cash))
+    if len(cash_points) > 0:
+        cash_days = to_days([the_date for (the_date, _) in cash_points])
+        cash_values = np.array([money for (_, money) in cash_points], dtype=float)
+        # last event on or before each day, events are in time order so the last one of a day wins
+        idx = np.searchsorted(cash_days, days, side='right') - 1
+        cash = np.where(idx >= 0, cash_values[np.maximum(idx, 0)], cash)
+
+    if len(positions) == 0:
+        return cash
+
+    stock_codes = sorted(set(stock_code for (stock_code, _, _, _) in positions))
+    columns = dict((stock_code, col) for col, stock_code in enumerate(stock_codes))
+    cols = np.array([columns[stock_code] for (stock_code, _, _, _) in positions])
+    shares = np.array([share for (_, share, _, _) in positions], dtype=float)
+    starts = np.searchsorted(days, to_days([bought_date for (_, _, bought_date, _) in positions]), side='left')
+    sell_dates = [sell_date for (_, _, _, sell_date) in positions]
+    ends = np.full(len(positions), n_days)
+    sold = np.array([sell_date is not None for sell_date in sell_dates])
+    if sold.any():
+        ends[sold] = np.searchsorted(days, to_days([d for d in sell_dates if d is not None]), side='left')
+
+    # shares held per (day, stock): +share on the buy day, -share on the sell day, then a running sum
+    delta = np.zeros((n_days + 1, len(stock_codes)))
+    np.add.at(delta, (starts, cols), shares)
+    np.add.at(delta, (ends, cols), -shares)
+    holdings = np.cumsum(delta[:-1], axis=0)
+
+    closes = get_close_matrix(days, stock_bars, stock_codes)
+    market_value = np.where(holdings != 0, holdings * np.nan_to_num(closes), 0).sum(axis=1)
+    return cash + market_value
+
+
+def equity_metrics(equity, risk_free_rate=0.02, days_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Max drawdown (%, <= 0), annualized Sharpe of daily returns and Calmar
+    (annualized return % / |max drawdown %|) of a daily equity series.
+    """
+    max_drawdown, sharpe_year, calmar = None, None, None
+    equity = np.asarray(equity, dtype=float)
+    if len(equity) < 2 or equity[0] <= 0:
+        return max_drawdown, sharpe_year, calmar
+    peak = np.maximum.accumulate(equity)
+    max_drawdown = round(float(np.min(equity / peak - 1)) * 100, 2)
+    returns = np.diff(equity) / equity[:-1]
+    sig = np.std(returns)
+    if sig > 0:
+        sharpe_year = round(float((np.mean(returns) - risk_free_rate / days_per_year) / sig * np.sqrt(days_per_year)), 2)
+    if max_drawdown < 0 and equity[-1] > 0:
+        annual_return = ((equity[-1] / equity[0]) ** (days_per_year / (len(equity) - 1)) - 1) * 100
+        calmar = round(float(annual_return / abs(max_drawdown)), 2)
+    return max_drawdown, sharpe_year, calmar
+
+
+def dump_equity_curve(days, equity):
+    """(dates blob, equity blob): days since epoch as int32 and equity as float32"""
+    dates_blob = np.asarray(days, dtype='datetime64[D]').astype(DAYS_DTYPE).tobytes()
+    equity_blob = np.asarray(equity, dtype=EQUITY_DTYPE).tobytes()
+    return dates_blob, equity_blob
+
+
+def load_equity_curve(dates_blob, equity_blob):
+    """Inverse of dump_equity_curve, returns (datetime64[D] days, float32 equity)"""
+    if not dates_blob or not equity_blob:
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=EQUITY_DTYPE)
+    days = np.frombuffer(dates_blob, dtype=DAYS_DTYPE).astype('datetime64[D]')
+    equity = np.frombuffer(equity_blob, dtype=EQUITY_DTYPE)
+    return days, equity
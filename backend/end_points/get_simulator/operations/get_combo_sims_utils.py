@@ -49,13 +49,14 @@ def cal_combo_sims_earn(db, combo_name, all_sims, init_money=INIT_MONEY):
             earning_rate_choosen = earning_rates > EARN_RATE_THRESJOULD
             earning_rate_choosen = shift(earning_rate_choosen, 1)
             chosen = cum_earns_chosen & earning_rate_choosen
+            # same for every chosen trade of the sim
+            avg_earn = cal_weighted_avg(earns)
             for i, each_chosen in enumerate(chosen):
                 if each_chosen == True:
                     bought_date = bought_dates[i]
                     sell_date = sell_dates[i]
                     earn = earns[i]
                     combo_earns.append(earn)
-                    avg_earn = cal_weighted_avg(earns)
                     chosen_trade = {
                         'sim': sim_id,
                         'bought_date': bought_date,
@@ -9,55 +9,40 @@ from end_points.common.utils.http import APIException
 from end_points.get_rule.operations.agent_utils import run_sim_agent
 from end_points.get_simulator.simulator_schema import SimulatorSchema, SimTradingSchema
 from end_points.get_simulator.operations.get_simulator_utils import write_sim_log, read_sim_log, delete_sim_log, \
-    clean_sim_trading, max_drawback, sharpe, get_last_month_stats, cal_annual_earn
+    clean_sim_trading, delete_sim_checkpoint, delete_sim_equity, load_sim_equity, cal_annual_earn, format_date
 from db.mysql.db_schemas import Simulator, Stock, Rule, SimTrading
 from end_points.get_stock.operations.get_stock_utils import stockDataFrame
+from end_points.get_stock.operations.stock_name_cache import stock_name_cache
 
 def getSimulatorList(db, args):
     status = args.get("status")
     rule_type = args.get("rule_type")
     filter_all = list()
     try:
+        # metrics are materialized by update_sim_model, no earning_info decoding here
         query = db.session.query(Simulator.id, Simulator.stock_code, Simulator.status, Simulator.start_date,
-                                     Simulator.init_money, Simulator.earning_info,
+                                     Simulator.init_money,
                                      Simulator.current_money, Simulator.current_shares, Simulator.cum_earn,
                                      Simulator.avg_earn, Simulator.earning_rate, Simulator.trading_times, Simulator.rule_id, Simulator.indicating_date,
-                                     Simulator.updated_at, Rule.name.label("rule_name"), Rule.type) \
+                                     Simulator.updated_at, Rule.name.label("rule_name"), Rule.type,
+                                     Simulator.first_trade_date, Simulator.max_drawback, Simulator.sharpe, Simulator.calmar,
+                                     Simulator.r_cum_earn_after, Simulator.r_earn_rate_after, Simulator.r_avg_earn_after,
+                                     Simulator.r_trading_times) \
                 .join(Rule, Rule.id == Simulator.rule_id)
         if rule_type:
             filter_all.append(Rule.type == rule_type)
         query = query.filter(and_(*filter_all))
         rows = query.order_by(Simulator.status.desc()).order_by(Simulator.cum_earn.desc()).all()
-        total = query.count()
-        # Use Pydantic to serialize SQLAlchemy objects (FastAPI native way)
-        # Convert Row objects to dictionaries first
-        data = [SimulatorSchema.model_validate(row._asdict()).model_dump() for row in rows]
-        # calculate max drop back and last month stats
-        if rule_type in [RuleType.agent, RuleType.local_agent, RuleType.remote_agent]:
-            for i in range(len(data)):
-                earning_info = data[i].get('earning_info')
-                rule_id = data[i].get('rule_id')
-                earning_dict = json.loads(earning_info) if earning_info is not None else {}
-                earns = earning_dict.get('earns')
-                cum_earn = data[i].get('cum_earn')
-                if earning_dict != {}:
-                    bought_dates = earning_dict.get('bought_dates', [])
-                    if bought_dates and len(bought_dates) > 0:
-                        first_buy_date = bought_dates[0]
-                        annual_earn = cal_annual_earn(first_buy_date, cum_earn)
-                        data[i].update({'annual_earn':annual_earn, 'first_trade_date':first_buy_date})
-                if earns is not None and len(earns) > 0:
-                    update_date = data[i].get('updated_at')
-                    r_cum_earn_after, r_earn_rate_after, r_avg_earn_after, r_trading_times = get_last_month_stats(earning_dict, update_date)
-                    result = {
-                        "max_drawback": max_drawback(earns),
-                        "sharpe": sharpe(earns),
-                        "r_cum_earn_after": r_cum_earn_after,
-                        "r_earn_rate_after": r_earn_rate_after,
-                        "r_avg_earn_after": r_avg_earn_after,
-                        "r_trading_times": r_trading_times,
-                        }
-                    data[i].update(result)
+        total = len(rows)
+        data = []
+        for row in rows:
+            row = row._asdict()
+            first_trade_date = row.pop('first_trade_date')
+            if first_trade_date is not None:
+                # annual_earn depends on today, it is the only metric computed per request
+                row.update({'annual_earn': cal_annual_earn(first_trade_date.date(), row.get('cum_earn') or 0),
+                            'first_trade_date': format_date(first_trade_date)})
+            data.append(SimulatorSchema.model_validate(row).model_dump())
         rst = {
             'code': 'SUCCESS',
             'data': {
@@ -161,10 +146,10 @@ def getSimTrading(db, sim_id, args):
         data = [SimTradingSchema.model_validate(row).model_dump() for row in new_rows]
         stocks = db.session.query(SimTrading.stock).filter(SimTrading.sim_id == sim_id).all()
         stocks = sorted(set([x for (x,) in stocks]))  # Use sorted for deterministic order
+        stock_names = stock_name_cache.get_names(db, [item.get('stock') for item in data])
         for i in range(len(data)):
             stock_code = data[i].get('stock')
-            stock_name = db.session.query(Stock.name).filter(Stock.code == stock_code).scalar()
-            data[i].update({'stock_name':stock_name})
+            data[i].update({'stock_name':stock_names.get(stock_code)})
         rst = {
             'code': 'SUCCESS',
             'data': {
@@ -191,6 +176,8 @@ def deleteSimulator(db, sim_id):
         else:
             # #clean up tradings
             clean_sim_trading(db, sim_id)
+            delete_sim_checkpoint(db, sim_id)
+            delete_sim_equity(db, sim_id)
 
             # delete record
             db.session.delete(record)
@@ -219,8 +206,8 @@ def runSimulator(db, args, sim_id):
             e = APIException('2207')
             rst = e.to_dict()
         else:
-            # Agent system - run agent simulation
-            run_sim_agent(db, sim_id)
+            # Agent system - run agent simulation, incremental unless a full rebuild is asked for
+            run_sim_agent(db, sim_id, full_rebuild=bool(args.get('full_rebuild')))
 
             # Use Pydantic to serialize SQLAlchemy object (FastAPI native way)
             data = SimulatorSchema.model_validate(sim_record).model_dump()
@@ -253,6 +240,14 @@ def getParamsForSim(db, sim_id, args):
             if index_close and len(index_close) > 0:
                 earning_dict.update({'index_close': calculate_growth_rate(index_close)})
 
+        # daily mark-to-market equity as growth rate from the first day
+        days, equity = load_sim_equity(db, sim_id)
+        if len(equity) > 0:
+            earning_dict.update({
+                'equity_dates': [str(day) for day in days],
+                'equity': calculate_growth_rate(equity.astype(float).tolist()),
+            })
+
         rst = {
             'code': 'SUCCESS',
             'data': {
@@ -268,11 +263,13 @@ def getParamsForSim(db, sim_id, args):
     return rst
 
 def get_index_data_for_dates(db, bought_dates, index_code='sh000001'):
-    index_df = stockDataFrame(db, index_code)
     bought_dates_df = pd.DataFrame(bought_dates, columns=['date'])
-    bought_dates_df['date'] = pd.to_datetime(bought_dates_df['date'])
+    bought_dates_df['date'] = pd.to_datetime(bought_dates_df['date']).astype('datetime64[ns]')
+    # only date and close between the first and the last bought date are read
+    index_df = stockDataFrame(db, index_code, start=bought_dates_df['date'].min(), end=bought_dates_df['date'].max(),
+                              columns=['close'])
     index_df_on_date = index_df.merge(bought_dates_df, on=['date'], how='right')
-    close_on_date = list(index_df_on_date.close.values)
+    close_on_date = index_df_on_date.close.astype(float).tolist()
     return close_on_date
 
 def calculate_growth_rate(data):
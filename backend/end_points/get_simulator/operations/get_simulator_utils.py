@@ -1,16 +1,26 @@
 # import threading
 import json
-from datetime import datetime, date
+import multiprocessing
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, date, timedelta
 import codecs
 import os
 
+import pandas as pd
 from pandas import Timestamp
 import numpy as np
 from end_points.common.const.consts import DataBase, INIT_MONEY, Trade, Status, INIT_MONEY_PER_STOCK, RuleType
-from end_points.get_earn.operations.cal_earn_utils import indicating
+from end_points.get_earn.operations.cal_earn_utils import indicating, get_latest_N_date
 HIGH_LIMIT = 0.095
 LOW_LIMIT = -0.095
 MAX_LOSS_PERCENT = 0.05
+# calendar days of signals re-read before a checkpoint on top of 2 days per holding day,
+# so the buy day and holding window of every re-read signal are covered across long holidays
+CHECKPOINT_LOOKBACK_DAYS = 30
+# trading days of the "last month" stats of a simulator
+LAST_MONTH_TRADING_DAYS = 21
 
 def format_date(the_date):
     """Format date to ISO 8601 string"""
@@ -23,10 +33,16 @@ def format_date(the_date):
     return the_date
 # DL model inference removed
 # DL model utils removed
-from db.mysql.db_schemas import SimTrading, Simulator, Stock, Rule
+from sqlalchemy import insert
+from db.mysql.db_schemas import SimTrading, Simulator, Rule, SimulatorCheckpoint, SimulatorEquity
 from end_points.common.tech_indicators.tech_factors_utils import get_indicating_dates, get_trading_items_tech, \
-    cal_assets_multi_buy, buy, cal_weighted_avg, cal_assets, sell
+    buy, cal_weighted_avg, cal_assets, sell
+from end_points.get_simulator.operations.portfolio import Portfolio
+from end_points.get_simulator.operations.equity_curve import build_equity_curve, equity_metrics, get_trading_days, \
+    dump_equity_curve, load_equity_curve
+from data_processing.data_provider.trading_calendar import to_days, format_days, get_trading_calendar
 from end_points.get_stock.operations.get_stock_utils import stockDataFrameFromTushare
+from end_points.get_stock.operations.stock_name_cache import stock_name_cache
 
 
 # def update_sim_model(db, sim_id, indicating_items, top_stocks):
@@ -56,55 +72,287 @@ from end_points.get_stock.operations.get_stock_utils import stockDataFrameFromTu
 #     db.session.commit()
 #     return sim_record.indicating_date
 
-def update_sim_model(db, sim_id, indicating_items):
+def get_sim_config(db):
+    """Sell condition parameters from the global simulator config (id=1), with defaults"""
+    from db.mysql.db_schemas import SimulatorConfig
+    config = db.session.query(SimulatorConfig).filter(SimulatorConfig.id == 1).first()
+    if config:
+        profit_threshold = config.profit_threshold if config.profit_threshold is not None else 0
+        stop_loss = config.stop_loss if config.stop_loss is not None else 5
+        max_holding_days = config.max_holding_days if config.max_holding_days is not None else 5
+    else:
+        # Fallback to defaults if config not exists
+        profit_threshold = 0
+        stop_loss = 5
+        max_holding_days = 5
+    return profit_threshold, stop_loss, max_holding_days
+
+
+def get_sim_workers(db):
+    """Number of stocks processed in parallel by update_sim_model, 1 means sequential"""
+    from db.mysql.db_schemas import SimulatorConfig
+    workers = db.session.query(SimulatorConfig.workers).filter(SimulatorConfig.id == 1).scalar()
+    return max(int(workers), 1) if workers else 1
+
+
+_process_pool = None
+_process_pool_workers = 0
+# pool -> number of runs using it, a pool replaced after a worker count change is shut down by its last user
+_process_pool_users = {}
+_process_pool_lock = threading.Lock()
+
+
+@contextmanager
+def get_process_pool(workers):
+    """
+    Shared process pool for CPU-bound trade generation, re-created when the worker count changes.
+    Runs still using the previous pool (concurrent simulators, bulk jobs) keep it until they finish.
+    """
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != workers:
+            if _process_pool is not None and _process_pool_users.get(_process_pool, 0) == 0:
+                _process_pool_users.pop(_process_pool, None)
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _process_pool_workers = workers
+        pool = _process_pool
+        _process_pool_users[pool] = _process_pool_users.get(pool, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _process_pool_lock:
+            _process_pool_users[pool] -= 1
+            retired = pool is not _process_pool and _process_pool_users[pool] == 0
+            if retired:
+                del _process_pool_users[pool]
+        if retired:
+            pool.shutdown(wait=False)
+
+
+def get_checkpoint_params(sim_record, sim_config):
+    """Run parameters a checkpoint was built with, a checkpoint is only reused when they match"""
+    profit_threshold, stop_loss, max_holding_days = sim_config
+    return {
+        'init_money': sim_record.init_money,
+        'profit_threshold': profit_threshold,
+        'stop_loss': stop_loss,
+        'max_holding_days': max_holding_days,
+    }
+
+
+def load_sim_checkpoint(db, sim_id, sim_config):
+    """
+    Load the incremental-run checkpoint of a simulator.
+    Returns None when there is no checkpoint, it was built with other run parameters,
+    or there is no equity curve to extend from it.
+    """
+    sim_record = db.session.query(Simulator).filter(Simulator.id == sim_id).first()
+    record = db.session.query(SimulatorCheckpoint).filter(SimulatorCheckpoint.sim_id == sim_id).first()
+    if sim_record is None or record is None:
+        return None
+    if db.session.query(SimulatorEquity.sim_id).filter(SimulatorEquity.sim_id == sim_id).scalar() is None:
+        return None
+    state = json.loads(record.state)
+    if state.get('params') != get_checkpoint_params(sim_record, sim_config):
+        return None
+    state.update({'last_date': record.last_date, 'updated_at': record.updated_at})
+    return state
+
+
+def save_sim_checkpoint(db, sim_id, last_date, params, money, bought_items, assets_tail):
+    """Stage the checkpoint in the session, committed together with the simulator record"""
+    record = db.session.query(SimulatorCheckpoint).filter(SimulatorCheckpoint.sim_id == sim_id).first()
+    if record is None:
+        record = SimulatorCheckpoint(sim_id=sim_id)
+        db.session.add(record)
+    record.last_date = last_date
+    record.state = json.dumps({
+        'params': params,
+        'money': money,
+        'bought_items': bought_items,
+        'assets_tail': assets_tail,
+    }, ensure_ascii=False)
+    record.updated_at = datetime.now()
+    return record
+
+
+def get_checkpoint_cutoff(checkpoint):
+    """
+    Earliest signal date whose trades can still produce events after the checkpoint:
+    recent signals plus the signals of positions still open at the checkpoint.
+    """
+    lookback = timedelta(days=CHECKPOINT_LOOKBACK_DAYS + 2 * checkpoint['params']['max_holding_days'])
+    cutoff = checkpoint['last_date'] - lookback
+    for each_item in checkpoint.get('bought_items', []):
+        cutoff = min(cutoff, to_datetime(each_item.get('bought_date')) - lookback)
+    return cutoff
+
+
+def delete_sim_checkpoint(db, sim_id):
+    db.session.query(SimulatorCheckpoint).filter(SimulatorCheckpoint.sim_id == sim_id).delete()
+    return
+
+
+def delete_sim_equity(db, sim_id):
+    db.session.query(SimulatorEquity).filter(SimulatorEquity.sim_id == sim_id).delete()
+    return
+
+
+def load_sim_equity(db, sim_id):
+    """Stored daily equity curve of a simulator as (datetime64[D] days, float32 equity)"""
+    record = db.session.query(SimulatorEquity).filter(SimulatorEquity.sim_id == sim_id).first()
+    if record is None:
+        return load_equity_curve(None, None)
+    return load_equity_curve(record.dates, record.equity)
+
+
+def save_sim_equity(db, sim_id, days, equity):
+    """Stage the equity curve in the session, committed together with the simulator record"""
+    record = db.session.query(SimulatorEquity).filter(SimulatorEquity.sim_id == sim_id).first()
+    if record is None:
+        record = SimulatorEquity(sim_id=sim_id)
+        db.session.add(record)
+    record.dates, record.equity = dump_equity_curve(days, equity)
+    record.updated_at = datetime.now()
+    return record
+
+
+def update_sim_metrics(sim_record, earning_info, equity):
+    """
+    Materialize the list metrics on the simulator record: risk metrics of the daily equity curve
+    (per-trade earns as a fallback), first trade date and the last month stats.
+    Called after updated_at is set, the last month is counted back from it.
+    """
+    earns = earning_info.get('earns', [])
+    bought_dates = earning_info.get('bought_dates', [])
+    max_drawdown, equity_sharpe, calmar = equity_metrics(equity)
+    sim_record.first_trade_date = to_datetime(bought_dates[0]) if len(bought_dates) > 0 else None
+    if len(earns) > 0:
+        sim_record.max_drawback = max_drawdown if max_drawdown is not None else max_drawback(earns)
+        sim_record.sharpe = equity_sharpe if equity_sharpe is not None else sharpe(earns)
+    else:
+        sim_record.max_drawback, sim_record.sharpe = max_drawdown, equity_sharpe
+    sim_record.calmar = calmar
+    sim_record.r_cum_earn_after, sim_record.r_earn_rate_after, sim_record.r_avg_earn_after, sim_record.r_trading_times = \
+        get_last_month_stats(earning_info, sim_record.updated_at)
+    return sim_record
+
+
+def update_sim_equity(db, sim_id, stock_bars, ledger, start_cash, last_date, checkpoint=None):
+    """
+    Extend (or rebuild without a checkpoint) the daily equity curve up to last_date from the
+    cash points and position intervals of a cal_sim_earn_multi_buy replay. The stored days
+    after the checkpoint are rebuilt, their events are replayed again.
+    """
+    if checkpoint is not None:
+        days, equity = load_sim_equity(db, sim_id)
+        kept = days <= np.datetime64(to_datetime(checkpoint['last_date']).date())
+        days, equity = days[kept], equity[kept]
+    else:
+        days, equity = load_equity_curve(None, None)
+    axis = get_trading_days(stock_bars)
+    if last_date is not None:
+        axis = axis[axis <= np.datetime64(to_datetime(last_date).date())]
+    if len(days) > 0:
+        axis = axis[axis > days[-1]]
+    elif len(ledger['positions']) > 0:
+        # the curve starts with the first buy, before it equity is just the initial cash
+        axis = axis[axis >= to_days([bought_date for (_, _, bought_date, _) in ledger['positions']]).min()]
+    else:
+        axis = axis[:0]
+    new_equity = build_equity_curve(axis, stock_bars, start_cash, ledger['cash'], ledger['positions'])
+    days = np.concatenate([days, axis])
+    equity = np.concatenate([equity.astype(float), new_equity])
+    save_sim_equity(db, sim_id, days, equity)
+    return days, equity
+
+
+def update_sim_model(db, sim_id, indicating_items, checkpoint=None, load_bars=None):
     """
     Update simulator model with trading results.
 
+    Without a checkpoint the whole signal history is replayed. With a checkpoint
+    (see load_sim_checkpoint) only trade events after checkpoint['last_date'] are
+    replayed on top of the checkpointed cash and positions, indicating_items then
+    only needs the signals from get_checkpoint_cutoff onwards.
+    The events of a stock are final up to its own last bar, so the new checkpoint is saved
+    at the earliest last bar date of the stocks in play (not moved when a stock has no bars);
+    the events of the stocks ahead of it are replayed again by the next run.
+
     Args:
         db: Database session
         sim_id: Simulator ID
         indicating_items: List of dicts with 'stock_code' and 'indicating_date'
-        top_stocks: DEPRECATED - now extracted from indicating_items automatically
+        checkpoint: Optional checkpoint to resume from
+        load_bars: Optional stock_code -> bar DataFrame loader, defaults to stockDataFrameFromTushare,
+                   bulk runs pass a shared loader so each stock is loaded once across simulators
     """
+    load_bars = load_bars or stockDataFrameFromTushare
     sim_record = db.session.query(Simulator).filter(Simulator.id == sim_id).first()
     init_money = sim_record.init_money
     rule_type = db.session.query(Rule.type).join(Simulator, Simulator.rule_id == Rule.id)\
         .filter(Simulator.id == sim_id).scalar()
 
     # Get sell condition parameters from database config
-    from db.mysql.db_schemas import SimulatorConfig
-    config = db.session.query(SimulatorConfig).filter(SimulatorConfig.id == 1).first()
-    if config:
-        profit_threshold = config.profit_threshold if config.profit_threshold is not None else 0
-        stop_loss = config.stop_loss if config.stop_loss is not None else 5
-        max_holding_days = config.max_holding_days if config.max_holding_days is not None else 5
-    else:
-        # Fallback to defaults if config not exists
-        profit_threshold = 0
-        stop_loss = 5
-        max_holding_days = 5
+    sim_config = get_sim_config(db)
+    profit_threshold, stop_loss, max_holding_days = sim_config
 
     # Extract unique stock codes from indicating_items (sorted for deterministic order)
     top_stocks = sorted(set(item['stock_code'] for item in indicating_items))
+    indicating_dates = get_indicating_dates_by_stock(indicating_items)
+    trading_params = dict(profit_threshold=profit_threshold, stop_loss=stop_loss, max_holding_days=max_holding_days)
+    workers = get_sim_workers(db)
+    if workers > 1 and len(top_stocks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            stock_bars = dict(zip(top_stocks, executor.map(load_bars, top_stocks)))
+        stock_results = get_stocks_trading_items_parallel(stock_bars, indicating_dates, rule_type, workers,
+                                                          **trading_params)
+    else:
+        stock_bars = dict((each_stock, load_bars(each_stock)) for each_stock in top_stocks)
+        stock_results = [generate_stock_trading_items(stock_bars[each_stock], indicating_dates[each_stock],
+                                                      rule_type, **trading_params)
+                         for each_stock in top_stocks]
 
     if_indicating = False
     all_indicating_dates = []
     all_sim_items = []
-    for each_stock in top_stocks:
-        trading_items, is_indicating, last_indicating_date = get_stock_trading_items_model(
-            db, each_stock, indicating_items, rule_type,
-            profit_threshold=profit_threshold,
-            stop_loss=stop_loss,
-            max_holding_days=max_holding_days
-        )
+    last_bar_dates = {}
+    # merge in sorted stock order, same as the sequential path
+    for each_stock, stock_result in zip(top_stocks, stock_results):
+        trading_items, is_indicating, last_indicating_date, last_bar_date = stock_result
         if is_indicating:
             if_indicating = True
         if last_indicating_date is not None:
             all_indicating_dates.append(last_indicating_date)
+        if last_bar_date is not None:
+            last_bar_dates[each_stock] = to_datetime(last_bar_date)
         sim_trading_items = get_sim_trading_items(trading_items, each_stock)
         all_sim_items += sim_trading_items
 
-    cum_earn, avg_earn, earning_rate, trading_times, money, bought_items, earning_info = cal_sim_earn_multi_buy(db, sim_id, all_sim_items, init_money)
+    state = None
+    last_date = max(last_bar_dates.values()) if len(last_bar_dates) > 0 else None
+    final_date = min(last_bar_dates.values()) if 0 < len(last_bar_dates) == len(top_stocks) else None
+    if checkpoint is not None:
+        checkpoint_date = format_date(checkpoint['last_date'])
+        all_sim_items = [item for item in all_sim_items if format_date(item.get('date')) > checkpoint_date]
+        earning_dict = json.loads(sim_record.earning_info) if sim_record.earning_info else {}
+        # the sells after the checkpoint are replayed again, the history is cut back to it
+        kept = sum(1 for sell_date in earning_dict.get('sell_dates', []) if format_date(sell_date) <= checkpoint_date)
+        state = {
+            'money': checkpoint['money'],
+            'bought_items': checkpoint['bought_items'],
+            'assets_tail': checkpoint['assets_tail'],
+            'earns': earning_dict.get('earns', [])[:kept],
+            'sell_dates': earning_dict.get('sell_dates', [])[:kept],
+            'bought_dates': earning_dict.get('bought_dates', [])[:kept],
+            'assets': earning_dict.get('assets', [])[:kept],
+        }
+        last_date = checkpoint['last_date'] if last_date is None else max(last_date, checkpoint['last_date'])
+        final_date = checkpoint['last_date'] if final_date is None else max(final_date, checkpoint['last_date'])
+
+    cum_earn, avg_earn, earning_rate, trading_times, money, bought_items, earning_info, ledger = \
+        cal_sim_earn_multi_buy(db, sim_id, all_sim_items, init_money, state=state, checkpoint_date=final_date)
     if if_indicating:
         sim_record.status = Status.indicating
     elif len(bought_items) > 0:
@@ -114,7 +362,10 @@ def update_sim_model(db, sim_id, indicating_items):
 
     if len(all_indicating_dates) > 0:
         all_indicating_dates.sort()
-        sim_record.indicating_date = all_indicating_dates[-1]
+        if checkpoint is not None and sim_record.indicating_date is not None:
+            sim_record.indicating_date = max(to_datetime(all_indicating_dates[-1]), sim_record.indicating_date)
+        else:
+            sim_record.indicating_date = to_datetime(all_indicating_dates[-1])
 
     # update record
     sim_record.current_money = money
@@ -125,42 +376,64 @@ def update_sim_model(db, sim_id, indicating_items):
     sim_record.earning_rate = earning_rate
     sim_record.trading_times = trading_times
     sim_record.updated_at = datetime.now()
+    if final_date is not None:
+        snapshot = ledger['checkpoint']
+        save_sim_checkpoint(db, sim_id, final_date, get_checkpoint_params(sim_record, sim_config),
+                            snapshot['money'], snapshot['bought_items'], snapshot['assets_tail'])
+    start_cash = checkpoint['money'] if checkpoint is not None else init_money
+    _, equity = update_sim_equity(db, sim_id, stock_bars, ledger, start_cash, last_date, checkpoint=checkpoint)
+    update_sim_metrics(sim_record, earning_info, equity)
     db.session.commit()
     return
 
-def get_stock_trading_items_model(db, stock_code, indicating_items, rule_type=RuleType.agent,
-                                  profit_threshold=0, stop_loss=5, max_holding_days=5):
-    stock_data = stockDataFrameFromTushare(stock_code)
-    indicating_dates = []
+def get_indicating_dates_by_stock(indicating_items):
+    """Group indicating dates by stock code, keeping their original order"""
+    indicating_dates = {}
     for each_item in indicating_items:
-        if each_item['stock_code'] == stock_code:
-            indicating_dates.append(each_item['indicating_date'])
+        indicating_dates.setdefault(each_item['stock_code'], []).append(each_item['indicating_date'])
+    return indicating_dates
+
+
+def generate_stock_trading_items(stock_data, indicating_dates, rule_type=RuleType.agent,
+                                 profit_threshold=0, stop_loss=5, max_holding_days=5):
+    """CPU-only part of get_stock_trading_items_model, module level so it can run in a process pool"""
+    if len(stock_data) == 0:
+        # no bars (e.g. a failed load): no events, and no last bar date to checkpoint at
+        return [], False, None, None
     trading_items = get_trading_items_model(stock_data, indicating_dates,
                                              profit_threshold=profit_threshold,
                                              stop_loss=stop_loss,
                                              max_holding_days=max_holding_days,
                                              rule_type=rule_type)
     is_indicating, last_indicating_date = indicating(stock_data, indicating_dates)
-    return trading_items, is_indicating, last_indicating_date
-    trading_items = get_trading_items_model(stock_data, indicating_dates, rule_type=rule_type)
-    is_indicating, last_indicating_date = indicating(stock_data, indicating_dates)
-    return trading_items, is_indicating, last_indicating_date
+    last_bar_date = get_latest_N_date(stock_data, 1)
+    return trading_items, is_indicating, last_indicating_date, last_bar_date
+
+
+def get_stock_trading_items_model(db, stock_code, indicating_items, rule_type=RuleType.agent,
+                                  profit_threshold=0, stop_loss=5, max_holding_days=5):
+    stock_data = stockDataFrameFromTushare(stock_code)
+    indicating_dates = get_indicating_dates_by_stock(indicating_items).get(stock_code, [])
+    return generate_stock_trading_items(stock_data, indicating_dates, rule_type,
+                                        profit_threshold=profit_threshold,
+                                        stop_loss=stop_loss,
+                                        max_holding_days=max_holding_days)
+
+
+def get_stocks_trading_items_parallel(stock_bars, indicating_dates, rule_type, workers,
+                                      profit_threshold=0, stop_loss=5, max_holding_days=5):
+    """
+    Generate the trading items of the loaded stock_bars (stock_code -> bars) on a process
+    pool (CPU bound), results are returned in stock_bars order.
+    """
+    with get_process_pool(workers) as process_pool:
+        futures = [process_pool.submit(generate_stock_trading_items, stock_data, indicating_dates[stock_code],
+                                       rule_type, profit_threshold, stop_loss, max_holding_days)
+                   for stock_code, stock_data in stock_bars.items()]
+        return [future.result() for future in futures]
 
 def write_sim_log(sim_id, message, color='black', date=None):
-    try:
-        dirname = os.path.dirname(__file__)
-        file_path = os.path.join(dirname, 'sim_logs/{}.html'.format(sim_id))
-        # file_path = './get_simulator/sim_logs/{}.html'.format(sim_id)
-        date_time = datetime.now() if date is None else date
-        # message = date_time.strftime("%Y-%m-%d %H:%M:%S") + ":    " + message
-        message = format_date(date_time) + ":    " + message
-        file = open(file_path, 'a', encoding='utf-8')
-        formatted_message = """<p style="color: {}; font-family: 'Liberation Sans',sans-serif">{}</p>""".format(color, message)
-        file.write(formatted_message)
-    except Exception as e:
-        print(e.args)
-    finally:
-        file.close()
+    write_sim_logs(sim_id, [(message, color, date)])
 
 def read_sim_log(sim_id):
     data = None
@@ -255,76 +528,113 @@ def get_sim_trading_items(trading_items, stock_code):
     # sim_trading_items.sort(key=lambda x: x.get('date'))
     return sim_trading_items
 
-def cal_sim_earn_multi_buy(db, sim_id, sim_trading_items, init_money=INIT_MONEY, buy_slippage=0.001, sell_slippage=0.001):
+def cal_sim_earn_multi_buy(db, sim_id, sim_trading_items, init_money=INIT_MONEY, buy_slippage=0.001, sell_slippage=0.001,
+                           state=None, checkpoint_date=None):
+    """
+    Replay trade events through the multi-buy portfolio.
+    state: optional portfolio to resume from, with 'money', 'bought_items', 'assets_tail'
+        and the earning history lists 'earns', 'sell_dates', 'bought_dates', 'assets'.
+    Also returns the ledger of the replay for the equity curve: 'cash' is the cash after each
+    buy / sell, 'positions' the (stock, share, bought_date, sell_date) of every position held
+    during the replay, sell_date None for the ones still open. With a checkpoint_date,
+    'checkpoint' is the 'money', 'bought_items' and 'assets_tail' after the events up to it.
+    """
     sim_trading_items.sort(key=lambda x: x.get('date'))
-    assets = init_money
     assets_memory = [init_money]
-    money = init_money
+    portfolio = Portfolio(init_money)
     indicating_items = []
-    bought_items = []
     earns = []
     earn_dates = []
     bought_dates = []
+    cash_points = []
+    closed_positions = []
+    if state is not None:
+        portfolio = Portfolio(state['money'], state['bought_items'])
+        assets_memory = [init_money] + list(state['assets'])
+        assets_memory[-1] = state['assets_tail']
+        earns = list(state['earns'])
+        earn_dates = list(state['sell_dates'])
+        bought_dates = list(state['bought_dates'])
+    recorder = SimTradingRecorder(db, sim_id)
+    stock_names = stock_name_cache.get_names(db, [item.get('stock') for item in sim_trading_items])
+    checkpoint_label = format_date(checkpoint_date) if checkpoint_date is not None else None
+    checkpoint = None
+
+    def snapshot():
+        return {'money': portfolio.money, 'bought_items': [dict(each_item) for each_item in portfolio.bought_items],
+                'assets_tail': assets_memory[-1]}
+
     for item in sim_trading_items:
         stock_code = item.get('stock')
         trade_date = item.get('date')
+        if checkpoint_label is not None and checkpoint is None and format_date(trade_date) > checkpoint_label:
+            checkpoint = snapshot()
         trade_price = item.get('price')
         trade_type = item.get('type')
-        stock_name = db.session.query(Stock.name).filter(Stock.code == stock_code).scalar()
+        stock_name = stock_names.get(stock_code)
         if trade_type == Trade.indicating:
             indicating_items.append(item)
             indicating_price = item.get('indicating_price')
-            add_sim_trading_record(db, sim_id, trade_date, Trade.indicating, 0, stock_code,price=indicating_price)
+            recorder.add(trade_date, Trade.indicating, 0, stock_code,price=indicating_price)
         elif trade_type == Trade.fail_to_buy:
             fail_close = item.get('fail_to_buy_close')
-            add_sim_trading_record(db, sim_id, trade_date, Trade.fail_to_buy, 0, stock_code, fail_close)
+            recorder.add(trade_date, Trade.fail_to_buy, 0, stock_code, fail_close)
         elif trade_type == Trade.buy:
-            if INIT_MONEY_PER_STOCK >= 100*trade_price and money >= INIT_MONEY_PER_STOCK:
+            if INIT_MONEY_PER_STOCK >= 100*trade_price and portfolio.money >= INIT_MONEY_PER_STOCK:
                 slippage = min(round(trade_price * buy_slippage, 2), 0.01)
                 trade_price += slippage
                 remain_money, new_share, trading_amount_buy = buy(INIT_MONEY_PER_STOCK, 0, trade_price)
-                money += remain_money - INIT_MONEY_PER_STOCK
+                portfolio.money += remain_money - INIT_MONEY_PER_STOCK
                 bought_item = {'stock': stock_code,
                                'name': stock_name,
                                'price': trade_price,
                                'share': new_share,
                                'bought_date': trade_date,
                                'bought_amount': trading_amount_buy}
-                bought_items.append(bought_item)
-                assets = cal_assets_multi_buy(money, bought_items)
-                add_sim_trading_record(db, sim_id, trade_date, Trade.buy, trading_amount_buy, stock_code, trade_price)
+                portfolio.add(bought_item)
+                cash_points.append((trade_date, portfolio.money))
+                recorder.add(trade_date, Trade.buy, trading_amount_buy, stock_code, trade_price)
             else:
-                add_sim_trading_record(db, sim_id, trade_date, Trade.not_sufficient_to_buy, 0, stock_code, trade_price, cash=round(money, 2))
+                recorder.add(trade_date, Trade.not_sufficient_to_buy, 0, stock_code, trade_price, cash=round(portfolio.money, 2))
                 # print(f'{trade_date} Cash: {money}, not sufficient to buy {stock_code} {stock_name} with price {trade_price}.')
         elif trade_type == Trade.fail_to_sell:
-            for each_item in bought_items:
-                if stock_code == each_item.get('stock'):
-                    fail_close = item.get('fail_to_sell_price')
-                    last_close = item.get('last_close')
-                    add_sim_trading_record(db, sim_id, trade_date, Trade.fail_to_sell, 0, stock_code, fail_close, last_close=last_close)
+            if portfolio.holds(stock_code):
+                fail_close = item.get('fail_to_sell_price')
+                last_close = item.get('last_close')
+                recorder.add(trade_date, Trade.fail_to_sell, 0, stock_code, fail_close, last_close=last_close)
         elif trade_type == Trade.sell:
             bought_date = item.get('bought_date')
-            for each_item in bought_items:
-                check_bought_date = each_item.get('bought_date')
-                if stock_code == each_item.get('stock') and bought_date == check_bought_date:
-                    bought_amount = each_item.get('bought_amount')
-                    share = each_item.get('share')
-                    trade_price = item.get('price')
-                    # earn_raw = (trade_price - bought_price) * share
-                    slippage = min(round(trade_price * sell_slippage, 2), 0.01)
-                    trade_price -= slippage
-                    money, share, trading_amount = sell(money, share, trade_price)
-                    if share == 0:
-                        bought_items.remove(each_item)
-                    assets = cal_assets_multi_buy(money, bought_items)
-                    earn = (assets - assets_memory[-1]) * 100 / bought_amount
-                    earns.append(round(earn, 2))
-                    earn_dates.append((trade_date))
-                    bought_dates.append(bought_date)
-                    assets_memory.append(assets)
-                    add_sim_trading_record(db, sim_id, trade_date, Trade.sell, trading_amount, stock_code, trade_price, earn, bought_date)
+            bought_item = portfolio.pop(stock_code, bought_date)
+            if bought_item is not None:
+                bought_amount = bought_item.get('bought_amount')
+                share = bought_item.get('share')
+                trade_price = item.get('price')
+                # earn_raw = (trade_price - bought_price) * share
+                slippage = min(round(trade_price * sell_slippage, 2), 0.01)
+                trade_price -= slippage
+                portfolio.money, share, trading_amount = sell(portfolio.money, share, trade_price)
+                cash_points.append((trade_date, portfolio.money))
+                closed_positions.append((stock_code, bought_item.get('share'), bought_date, trade_date))
+                assets = portfolio.assets()
+                earn = (assets - assets_memory[-1]) * 100 / bought_amount
+                earns.append(round(earn, 2))
+                earn_dates.append((trade_date))
+                bought_dates.append(bought_date)
+                assets_memory.append(assets)
+                recorder.add(trade_date, Trade.sell, trading_amount, stock_code, trade_price, earn, bought_date)
         else:
             print(trade_date, trade_type, stock_code, stock_name, trade_price)
+    assets = portfolio.assets()
+    money = portfolio.money
+    bought_items = portfolio.bought_items
+    ledger = {
+        'cash': cash_points,
+        'positions': closed_positions + [(each_item.get('stock'), each_item.get('share'), each_item.get('bought_date'), None)
+                                         for each_item in bought_items],
+    }
+    if checkpoint_label is not None:
+        ledger['checkpoint'] = checkpoint or snapshot()
+    recorder.flush()
     total_earn = round((assets - init_money)*100/init_money, 2)
     avg_earn = cal_weighted_avg(earns)
     num_earns = sum(x > 0 for x in earns)
@@ -340,45 +650,120 @@ def cal_sim_earn_multi_buy(db, sim_id, sim_trading_items, init_money=INIT_MONEY,
         'avg_earns_after': avg_earns_after,
         'assets': assets_memory[1:]
     }
-    return total_earn, avg_earn, earning_rate, trade_times, money, bought_items, earning_info
+    return total_earn, avg_earn, earning_rate, trade_times, money, bought_items, earning_info, ledger
 
 
-def add_sim_trading_record(db, sim_id, trade_date, trade_type, trading_amount, stock_code, price=None, earn=0, bought_at='', last_close=None, cash=None):
-    query = db.session.query(SimTrading).filter(SimTrading.sim_id == sim_id) \
-        .filter(SimTrading.stock == stock_code) \
-        .filter(SimTrading.trading_date == trade_date)\
-        .filter(SimTrading.trading_type == trade_type).first()
-    if query:
-        return
-    record = SimTrading(
-        sim_id=sim_id,
-        stock=stock_code,
-        trading_date=trade_date,
-        trading_type=trade_type,
-        trading_amount=trading_amount
-    )
-    db.session.add(record)
-    db.session.commit()
-    stock_name = db.session.query(Stock.name).filter(Stock.code==stock_code).scalar()
+def to_datetime(the_date):
+    """Parse a trade date (ISO string / date / Timestamp) to datetime, the type stored in SimTrading"""
+    if isinstance(the_date, Timestamp):
+        return the_date.to_pydatetime()
+    if isinstance(the_date, datetime):
+        return the_date
+    if isinstance(the_date, date):
+        return datetime(the_date.year, the_date.month, the_date.day)
+    return datetime.fromisoformat(str(the_date))
+
+
+def sim_trading_message(trade_type, trading_amount, stock_code, stock_name, price=None, earn=0, bought_at='', last_close=None, cash=None):
+    message, color = None, None
     if trade_type == Trade.buy:
         message = "Buying {} for {} {} with close price {}!".format(trading_amount, stock_code, stock_name, round(price,2))
-        write_sim_log(sim_id, message, 'ForestGreen', trade_date)
+        color = 'ForestGreen'
     elif trade_type == Trade.fail_to_buy:
         message = "Failed to buy {} {} with close price {}!".format(stock_code, stock_name, price)
-        write_sim_log(sim_id, message, 'coffee', trade_date)
+        color = 'coffee'
     elif trade_type == Trade.not_sufficient_to_buy:
         message = "Cash: {}, less than INIT_MONEY_PER_STOCK or not sufficient to buy {} {} with close price {}!".format(cash, stock_code, stock_name, price)
-        write_sim_log(sim_id, message, 'silver', trade_date)
+        color = 'silver'
     elif trade_type == Trade.fail_to_sell:
         message = "Failed to sell {} {} with price {} and last close price {}!".format(stock_code, stock_name, price, last_close)
-        write_sim_log(sim_id, message, 'coffee', trade_date)
+        color = 'coffee'
     elif trade_type == Trade.sell:
         message = "Selling {} for {} {} bought at {} with price {}!  Earned: {}%!".format(trading_amount, stock_code, stock_name, bought_at, price, round(earn, 2))
-        write_sim_log(sim_id, message, 'tomato', trade_date)
+        color = 'tomato'
     elif trade_type == Trade.indicating:
         message = "Stock {} {} is indicating with close price {}!".format(stock_code, stock_name, price)
-        write_sim_log(sim_id, message, 'darkorange', trade_date)
-    return
+        color = 'darkorange'
+    return message, color
+
+
+def write_sim_logs(sim_id, entries):
+    """Append (message, color, date) entries to the sim log with a single file open"""
+    if len(entries) == 0:
+        return
+    file = None
+    try:
+        dirname = os.path.dirname(__file__)
+        file_path = os.path.join(dirname, 'sim_logs/{}.html'.format(sim_id))
+        file = open(file_path, 'a', encoding='utf-8')
+        for message, color, the_date in entries:
+            date_time = datetime.now() if the_date is None else the_date
+            message = format_date(date_time) + ":    " + message
+            file.write("""<p style="color: {}; font-family: 'Liberation Sans',sans-serif">{}</p>""".format(color, message))
+    except Exception as e:
+        print(e.args)
+    finally:
+        if file is not None:
+            file.close()
+
+
+class SimTradingRecorder:
+    """
+    Collects the SimTrading rows of one simulator run.
+
+    Existing (stock, trading_date, trading_type) keys are prefetched once and new rows
+    are deduplicated in memory, flush() writes them with one bulk insert in one
+    transaction and appends their log lines with one file open.
+    """
+
+    def __init__(self, db, sim_id):
+        self.db = db
+        self.sim_id = sim_id
+        existing = db.session.query(SimTrading.stock, SimTrading.trading_date, SimTrading.trading_type)\
+            .filter(SimTrading.sim_id == sim_id).all()
+        self.keys = set((stock, trading_date, trading_type) for (stock, trading_date, trading_type) in existing)
+        self.rows = []
+        self.log_items = []
+
+    def add(self, trade_date, trade_type, trading_amount, stock_code, price=None, earn=0, bought_at='', last_close=None, cash=None):
+        trading_date = to_datetime(trade_date)
+        key = (stock_code, trading_date, trade_type)
+        if key in self.keys:
+            return
+        self.keys.add(key)
+        now = datetime.now()
+        self.rows.append({
+            'sim_id': self.sim_id,
+            'stock': stock_code,
+            'trading_date': trading_date,
+            'trading_type': trade_type,
+            'trading_amount': trading_amount,
+            'created_at': now,
+            'updated_at': now,
+        })
+        self.log_items.append((trade_date, trade_type, trading_amount, stock_code, price, earn, bought_at, last_close, cash))
+
+    def flush(self):
+        if len(self.rows) > 0:
+            try:
+                self.db.session.execute(insert(SimTrading), self.rows)
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+            names = stock_name_cache.get_names(self.db, [row['stock'] for row in self.rows])
+            entries = []
+            for trade_date, trade_type, trading_amount, stock_code, price, earn, bought_at, last_close, cash in self.log_items:
+                message, color = sim_trading_message(trade_type, trading_amount, stock_code, names.get(stock_code),
+                                                     price, earn, bought_at, last_close, cash)
+                if message is not None:
+                    entries.append((message, color, trade_date))
+            write_sim_logs(self.sim_id, entries)
+        inserted = len(self.rows)
+        self.rows = []
+        self.log_items = []
+        return inserted
+
 
 # def terminate_thread(sim_id):
 #     threads = threading.enumerate()
@@ -430,14 +815,18 @@ def sharpe(earns, risk_free_rate=0.02, days_per_year=252):
 # Turbulence functions removed - not used by Agent system
 
 def get_last_month_stats(earning_dict, update_date):
-    # cut_date_timestamp = datetime.strptime(update_date, "%Y-%m-%dT%H:%M:%S").timestamp() - 30*24*3600
-    cut_date_timestamp = update_date.timestamp() - 30 * 24 * 3600
-    cut_date = datetime.fromtimestamp(cut_date_timestamp)
+    """
+    Stats of the sells in the last LAST_MONTH_TRADING_DAYS trading days up to update_date,
+    the 30 calendar days before it when update_date is outside the trading calendar
+    """
+    cut_day = get_trading_calendar().add_trading_days(update_date, 1 - LAST_MONTH_TRADING_DAYS)
+    if cut_day is None:
+        cut_day = update_date - timedelta(days=30)
+    cut_day = np.datetime64(cut_day.date(), 'D')
     cum_earn_after, earn_rate_after, avg_earn_after, trading_times = None, None, None, None
     earning_dates = earning_dict.get('sell_dates')
     if earning_dates is not None:
-        recent_dates = list(filter(lambda i: i > str(cut_date), earning_dates))
-        trading_times = len(recent_dates)
+        trading_times = int(np.count_nonzero(to_days(earning_dates) >= cut_day))
         if trading_times > 0:
             cum_earn_after = round(earning_dict.get('cum_earns_after')[-trading_times], 2)
             avg_earn_after = round(earning_dict.get('avg_earns_after')[-trading_times], 2)
@@ -455,77 +844,114 @@ def cal_annual_earn(first_buy_date, cum_earn):
     return round(annual_earn, 2)
 
 
+def _format_dates(dates, indexes):
+    """Format the dates at the given bar indexes, the same way format_date does"""
+    selected = dates.iloc[indexes]
+    if pd.api.types.is_datetime64_any_dtype(selected):
+        values = selected.to_numpy(dtype='datetime64[ns]')
+        days = values.astype('datetime64[D]')
+        if (values == days).all():
+            # daily bars are at midnight, labelled in one vectorized pass
+            return format_days(days)
+        return list(selected.dt.strftime("%Y-%m-%dT%H:%M:%S"))
+    return [format_date(d) for d in selected]
+
+
 def get_trading_items_model(stock_data, indicator_dates, profit_threshold=0, stop_loss=5, max_holding_days=5, rule_type=RuleType.agent):
+    """
+    Vectorized signal -> trade conversion.
+
+    Signal dates are mapped to bar indexes with one searchsorted pass, then the
+    buy / fail_to_buy, fail_to_sell and profit / stop loss / time exits of all
+    signals are evaluated as (signals x max_holding_days) arrays.
+    Each signal gives one trading item; tests/test_trading_items_parity.py checks it
+    against the original per-bar loop.
+    """
     stock_data = stock_data.reset_index(drop=True)
-    trading_items = []
-    open_prices = stock_data['open']
-    close_prices = stock_data['close']
     dates = stock_data['date']
+    close_prices = stock_data['close'].to_numpy(dtype=np.float64)
     data_length = len(dates)
+    if data_length == 0 or len(indicator_dates) == 0:
+        return []
 
-    # Convert stop_loss from percentage to decimal (e.g., 5 -> 0.05)
     stop_loss_decimal = stop_loss / 100.0
-    # Convert profit_threshold from percentage to decimal (e.g., 0 -> 0.00, 1 -> 0.01)
     profit_threshold_decimal = profit_threshold / 100.0
 
-    # 将 indicator_dates 转换为字符串集合，避免类型不匹配导致的比较失败
-    indicator_dates_str = {d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else str(d)[:10]
-                           for d in indicator_dates}
+    # map every bar to the (sorted, unique) signal days in one pass
+    signal_days = np.unique(to_days(indicator_dates))
+    bar_days = to_days(dates)
+    positions = np.searchsorted(signal_days, bar_days)
+    matched = signal_days[np.minimum(positions, len(signal_days) - 1)] == bar_days
+    signal_index = np.flatnonzero(matched)
+    if len(signal_index) == 0:
+        return []
+
+    indicating_prices = close_prices[signal_index]
+
+    # buy on the next bar unless it hits the upper limit
+    buy_index = signal_index + 1
+    has_buy_bar = buy_index < data_length
+    buy_prices = close_prices[np.minimum(buy_index, data_length - 1)]
+    valid_buy = has_buy_bar & ~np.isnan(buy_prices) & ~np.isnan(indicating_prices)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily_percent = (buy_prices - indicating_prices) / indicating_prices
+    fail_to_buy = valid_buy & (daily_percent >= HIGH_LIMIT)
+    bought = valid_buy & ~fail_to_buy
+
+    # holding window: one column per holding day
+    holding_days = max(int(max_holding_days), 0)
+    day_offsets = np.arange(holding_days)
+    sell_index = signal_index[:, None] + 2 + day_offsets[None, :]
+    in_range = (sell_index < data_length) & bought[:, None]
+    clipped_index = np.minimum(sell_index, data_length - 1)
+    sell_prices = close_prices[clipped_index]
+    last_closes = close_prices[clipped_index - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loss_percent = (buy_prices[:, None] - sell_prices) / buy_prices[:, None]
+        daily_loss_percent = (sell_prices - last_closes) / last_closes
+        profit_percent = (sell_prices - buy_prices[:, None]) / buy_prices[:, None]
+    last_day = day_offsets[None, :] == holding_days - 1
+    fail_to_sell = in_range & (daily_loss_percent <= LOW_LIMIT) & ~last_day
+    exits = in_range & ~fail_to_sell & (
+        (profit_percent >= profit_threshold_decimal) | (loss_percent >= stop_loss_decimal) | last_day)
+    has_exit = exits.any(axis=1) if holding_days > 0 else np.zeros(len(signal_index), dtype=bool)
+    exit_day = np.where(has_exit, exits.argmax(axis=1) if holding_days > 0 else 0, holding_days)
+    fail_to_sell &= day_offsets[None, :] < exit_day[:, None]
+
+    # format only the dates that end up in trading items
+    needed_index = np.unique(np.concatenate([
+        signal_index, buy_index[valid_buy], sell_index[fail_to_sell],
+        sell_index[np.flatnonzero(has_exit), exit_day[has_exit]]]))
+    date_strs = dict(zip(needed_index.tolist(), _format_dates(dates, needed_index)))
 
-    for each_index in range(data_length):
-        date = dates[each_index]
-        # 统一转换为字符串格式进行比较
-        date_str = date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date)[:10]
-        if date_str in indicator_dates_str:
-            indicating_price = close_prices[each_index]
-            trading_item = {
-                "indicating_date": format_date(date),
-                "indicating_price": indicating_price,
-            }
-            buying_index = each_index + 1
-            if buying_index < data_length:
-                buy_date = format_date(dates[buying_index])
-                buy_price = close_prices[buying_index]
-                if not np.isnan(buy_price) and not np.isnan(indicating_price):
-                    daily_percent = (buy_price - indicating_price) / indicating_price
-                    if daily_percent >= HIGH_LIMIT:
-                        trading_item.update({
-                            "fail_to_buy_date": buy_date,
-                            "fail_to_buy_close": buy_price,
-                        })
-                    else:
-                        trading_item.update({
-                            "buy_date": buy_date,
-                            "buy_price": buy_price,
-                        })
-                        fail_to_sell_items = []
-                        for j in range(max_holding_days):
-                            selling_index = each_index + 2 + j
-                            if selling_index < data_length:
-                                sell_date = format_date(dates[selling_index])
-                                sell_price = close_prices[selling_index]
-                                last_date_close = close_prices[selling_index-1]
-                                loss_percent = (buy_price - sell_price) / buy_price
-                                daily_loss_percent = (sell_price - last_date_close) / last_date_close
-                                if (daily_loss_percent <= LOW_LIMIT) and (j != max_holding_days-1):
-                                    fs_item = {
-                                        "fail_to_sell_date": sell_date,
-                                        "fail_to_sell_price": sell_price,
-                                        "last_close": last_date_close,
-                                    }
-                                    fail_to_sell_items.append(fs_item)
-                                    trading_item.update({'fail_to_sell_items': fail_to_sell_items})
-                                else:
-                                    # Sell conditions (OR logic):
-                                    # 1. Profit: (sell_price - buy_price) / buy_price >= profit_threshold
-                                    # 2. Stop loss: loss_percent >= stop_loss_decimal
-                                    # 3. Time exit: reached max_holding_days
-                                    profit_percent = (sell_price - buy_price) / buy_price
-                                    if (profit_percent >= profit_threshold_decimal) or (loss_percent >= stop_loss_decimal) or (j == max_holding_days-1):
-                                        trading_item.update({
-                                            "sell_date": sell_date,
-                                            "sell_price": sell_price,
-                                        })
-                                        break
-            trading_items.append(trading_item)
-    return trading_items
\ No newline at end of file
+    trading_items = []
+    for k in range(len(signal_index)):
+        trading_item = {
+            "indicating_date": date_strs[signal_index[k]],
+            "indicating_price": indicating_prices[k],
+        }
+        if fail_to_buy[k]:
+            trading_item.update({
+                "fail_to_buy_date": date_strs[buy_index[k]],
+                "fail_to_buy_close": buy_prices[k],
+            })
+        elif bought[k]:
+            trading_item.update({
+                "buy_date": date_strs[buy_index[k]],
+                "buy_price": buy_prices[k],
+            })
+            fail_days = np.flatnonzero(fail_to_sell[k])
+            if len(fail_days) > 0:
+                trading_item['fail_to_sell_items'] = [{
+                    "fail_to_sell_date": date_strs[sell_index[k, j]],
+                    "fail_to_sell_price": sell_prices[k, j],
+                    "last_close": last_closes[k, j],
+                } for j in fail_days]
+            if has_exit[k]:
+                j = exit_day[k]
+                trading_item.update({
+                    "sell_date": date_strs[sell_index[k, j]],
+                    "sell_price": sell_prices[k, j],
+                })
+        trading_items.append(trading_item)
+    return trading_items
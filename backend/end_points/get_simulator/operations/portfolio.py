@@ -0,0 +1,57 @@
+from end_points.common.tech_indicators.tech_factors_utils import cal_assets_multi_buy
+
+
+class Portfolio:
+    """
+    Cash plus open positions of a multi-buy simulator.
+
+    Positions are indexed by (stock, bought_date) and per stock, so opening, closing and
+    looking up a position are O(1) instead of a scan of the bought_items list.
+
+    assets() sums the open positions in the order they were bought, the same float
+    additions as cal_assets_multi_buy, so the assets and earns match the list replay
+    exactly. The open positions are bounded by cash / INIT_MONEY_PER_STOCK.
+    """
+
+    def __init__(self, money, bought_items=None):
+        self.money = money
+        self._positions = {}
+        self._stock_positions = {}
+        for each_item in bought_items or []:
+            self.add(each_item)
+
+    def add(self, bought_item):
+        """Open a position, bought_item is the dict stored in current_shares / the checkpoint"""
+        key = (bought_item.get('stock'), bought_item.get('bought_date'))
+        if key in self._positions:
+            raise ValueError(f'position {key} is already open')
+        self._positions[key] = bought_item
+        self._stock_positions.setdefault(key[0], {})[key] = bought_item
+
+    def pop(self, stock_code, bought_date):
+        """Close and return the position bought on bought_date, None if it is not open"""
+        bought_item = self._positions.pop((stock_code, bought_date), None)
+        if bought_item is not None:
+            stock_positions = self._stock_positions[stock_code]
+            del stock_positions[(stock_code, bought_date)]
+            if len(stock_positions) == 0:
+                del self._stock_positions[stock_code]
+        return bought_item
+
+    def get(self, stock_code, bought_date):
+        return self._positions.get((stock_code, bought_date))
+
+    def holds(self, stock_code):
+        return stock_code in self._stock_positions
+
+    def assets(self):
+        """Cash plus open positions at cost"""
+        return cal_assets_multi_buy(self.money, self._positions.values())
+
+    @property
+    def bought_items(self):
+        """Open positions in the order they were bought"""
+        return list(self._positions.values())
+
+    def __len__(self):
+        return len(self._positions)
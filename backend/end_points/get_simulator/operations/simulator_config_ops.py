@@ -12,7 +12,8 @@ def get_simulator_config(db):
                 id=1,
                 profit_threshold=0,
                 stop_loss=5,
-                max_holding_days=5
+                max_holding_days=5,
+                workers=1
             )
             db.session.add(config)
             db.session.commit()
@@ -24,6 +25,7 @@ def get_simulator_config(db):
                 'profit_threshold': config.profit_threshold,
                 'stop_loss': config.stop_loss,
                 'max_holding_days': config.max_holding_days,
+                'workers': config.workers,
                 'updated_at': config.updated_at.isoformat() if config.updated_at else None
             }
         }
@@ -36,7 +38,7 @@ def get_simulator_config(db):
         }
 
 
-def update_simulator_config(db, profit_threshold, stop_loss, max_holding_days):
+def update_simulator_config(db, profit_threshold, stop_loss, max_holding_days, workers=None):
     """Update global simulator configuration (id=1)"""
     try:
         config = db.session.query(SimulatorConfig).filter(SimulatorConfig.id == 1).first()
@@ -47,6 +49,8 @@ def update_simulator_config(db, profit_threshold, stop_loss, max_holding_days):
         config.profit_threshold = profit_threshold
         config.stop_loss = stop_loss
         config.max_holding_days = max_holding_days
+        if workers is not None:
+            config.workers = max(int(workers), 1)
         
         db.session.add(config)
         db.session.commit()
@@ -58,6 +62,7 @@ def update_simulator_config(db, profit_threshold, stop_loss, max_holding_days):
                 'profit_threshold': config.profit_threshold,
                 'stop_loss': config.stop_loss,
                 'max_holding_days': config.max_holding_days,
+                'workers': config.workers,
                 'updated_at': config.updated_at.isoformat() if config.updated_at else None
             }
         }
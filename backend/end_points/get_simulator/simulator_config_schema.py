@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, ConfigDict
 
 
@@ -6,6 +7,7 @@ class SimulatorConfigCreate(BaseModel):
     profit_threshold: float = 0
     stop_loss: float = 5
     max_holding_days: int = 5
+    workers: Optional[int] = None
 
 
 class SimulatorConfigResponse(BaseModel):
@@ -14,6 +16,7 @@ class SimulatorConfigResponse(BaseModel):
     profit_threshold: float
     stop_loss: float
     max_holding_days: int
+    workers: int | None = None
     updated_at: str | None = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -49,6 +49,7 @@ class SimulatorSchema(BaseModel):
     first_trade_date: Optional[str] = None
     max_drawback: Optional[float] = None
     sharpe: Optional[float] = None
+    calmar: Optional[float] = None
     r_cum_earn_after: Optional[float] = None
     r_earn_rate_after: Optional[float] = None
     r_avg_earn_after: Optional[float] = None
@@ -1,8 +1,14 @@
+import threading
+import time
+from collections import OrderedDict
+
 import pandas
 import pandas as pd
+from sqlalchemy import select, table, column, literal_column
 from end_points.common.const.consts import DataBase
 from db.mysql.db_schemas import Stock, Pool, PoolStock, RulePool, StocksInPool
 from db.mysql.db_schemas_dynamic import get_stock_model
+from data_processing.data_provider.bar_table import bar_table_enabled, read_symbol_bars
 
 
 def get_stocks_for_pool(session, pool_id):
@@ -20,12 +26,88 @@ def updateStockNumForPool(db, pool_id):
     db.session.commit()
     return
 
-def stockDataFrame(db, stock_code, bind_key=DataBase.stocks):
-    engine = db.get_engine(bind_key=bind_key)
-    stock_data = pandas.read_sql_table(stock_code, engine)
-    stock_data = stock_data.drop(columns=['id']).sort_values(by='date')
+# recently read frames, keyed by (bind_key, table, start, end, columns)
+STOCK_FRAME_CACHE_SIZE = 64
+# seconds a cached frame is served before it is read again, bars change once a day
+STOCK_FRAME_CACHE_TTL = 600
+_stock_frames = OrderedDict()
+_stock_frames_lock = threading.Lock()
+
+
+def compact_stock_frame(stock_data):
+    """
+    Date columns as datetime64[ns], bar columns numeric with float32 instead of float64
+    (NULL as NaN, half the memory), whatever types the driver returned
+    """
+    for name in stock_data.columns:
+        if name in ('date', 'created_at', 'updated_at'):
+            stock_data[name] = pd.to_datetime(stock_data[name]).astype('datetime64[ns]')
+        else:
+            stock_data[name] = pd.to_numeric(stock_data[name], errors='coerce')
+            if stock_data[name].dtype == 'float64':
+                stock_data[name] = stock_data[name].astype('float32')
     return stock_data
 
+
+def read_stock_table(db, stock_code, bind_key=DataBase.stocks, start=None, end=None, columns=None):
+    """Read a per-stock table with the date range and column projection done in SQL"""
+    if columns:
+        selected = [column('date')] + [column(name) for name in columns if name != 'date']
+    else:
+        selected = [literal_column('*')]
+    query = select(*selected).select_from(table(stock_code, column('date')))
+    if start is not None:
+        query = query.where(column('date') >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        query = query.where(column('date') <= pd.Timestamp(end).to_pydatetime())
+    query = query.order_by(column('date'))
+    engine = db.get_engine(bind_key=bind_key)
+    with engine.connect() as conn:
+        stock_data = pandas.read_sql_query(query, conn)
+    return stock_data.drop(columns=['id'], errors='ignore')
+
+
+def stockDataFrame(db, stock_code, bind_key=DataBase.stocks, start=None, end=None, columns=None):
+    """
+    Bars of a stock / index sorted by date, compacted by compact_stock_frame.
+
+    Args:
+        start, end: optional inclusive date bounds, pushed into the WHERE clause
+        columns: optional bar columns to read besides date, pushed into the SELECT
+
+    Frames are kept in a small in-process LRU for STOCK_FRAME_CACHE_TTL seconds, callers
+    get their own copy.
+    """
+    key = (bind_key, stock_code, start, end, tuple(columns) if columns else None)
+    now = time.monotonic()
+    with _stock_frames_lock:
+        cached = _stock_frames.get(key)
+        if cached is not None and now - cached[0] < STOCK_FRAME_CACHE_TTL:
+            _stock_frames.move_to_end(key)
+            return cached[1].copy()
+
+    stock_data = None
+    if bar_table_enabled():
+        stock_data = read_symbol_bars(db, stock_code, bind_key, start, end, columns)
+    if stock_data is None or len(stock_data) == 0:
+        stock_data = read_stock_table(db, stock_code, bind_key, start, end, columns)
+    stock_data = compact_stock_frame(stock_data)
+
+    with _stock_frames_lock:
+        _stock_frames[key] = (now, stock_data)
+        _stock_frames.move_to_end(key)
+        while len(_stock_frames) > STOCK_FRAME_CACHE_SIZE:
+            _stock_frames.popitem(last=False)
+    return stock_data.copy()
+
+
+def clear_stock_frames(stock_code=None):
+    """Drop cached frames, of one stock / index or all of them"""
+    with _stock_frames_lock:
+        for key in list(_stock_frames.keys()):
+            if stock_code is None or key[1] == stock_code:
+                del _stock_frames[key]
+
 def get_pool_names(db, stock_code):
     pool_names = ''
     pools = db.session.query(Pool.name).join(PoolStock, Pool.id==PoolStock.pool_id).filter(PoolStock.stock_code==stock_code).all()
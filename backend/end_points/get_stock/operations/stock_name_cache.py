@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+from db.mysql.db_schemas import Stock
+
+STOCK_NAME_CACHE_SIZE = 20000
+STOCK_NAME_CACHE_TTL = 3600
+
+
+class StockNameCache:
+    """
+    Bounded, process-wide code -> Stock.name cache.
+
+    Misses are resolved with a single `IN` query per call, unknown codes are cached
+    as None so they are not queried again. Entries expire after `ttl` seconds so
+    changes made by other processes are picked up, update_all_stocks_list also
+    invalidates the codes it changes.
+    """
+
+    def __init__(self, max_size=STOCK_NAME_CACHE_SIZE, ttl=STOCK_NAME_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._names = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_names(self, db, stock_codes):
+        """Return {code: name} for stock_codes, loading missing codes in bulk"""
+        stock_codes = set(code for code in stock_codes if code is not None)
+        now = time.time()
+        names = {}
+        missing = []
+        with self._lock:
+            for code in stock_codes:
+                entry = self._names.get(code)
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._names.move_to_end(code)
+                    names[code] = entry[0]
+                else:
+                    missing.append(code)
+        if len(missing) > 0:
+            rows = db.session.query(Stock.code, Stock.name).filter(Stock.code.in_(missing)).all()
+            loaded = dict((code, name) for (code, name) in rows)
+            with self._lock:
+                for code in missing:
+                    names[code] = loaded.get(code)
+                    self._names[code] = (names[code], now)
+                    self._names.move_to_end(code)
+                while len(self._names) > self.max_size:
+                    self._names.popitem(last=False)
+        return names
+
+    def get_name(self, db, stock_code):
+        return self.get_names(db, [stock_code]).get(stock_code)
+
+    def invalidate(self, stock_codes=None):
+        """Drop the given codes, or everything when stock_codes is None"""
+        with self._lock:
+            if stock_codes is None:
+                self._names.clear()
+            else:
+                for code in stock_codes:
+                    self._names.pop(code, None)
+
+
+stock_name_cache = StockNameCache()
@@ -25,6 +25,9 @@ import time
 from end_points.config.global_var import global_var
 from end_points.config.routes import register_routes
 from end_points.init_global import init_global
+from end_points.get_rule.operations.agent_utils import warm_agent_workers
+from end_points.get_rule.operations.agent_worker_pool import AGENT_WORKERS, AGENT_WORKER_PRELOAD, \
+    shutdown_worker_pools
 
 
 # Lifespan context manager for startup and shutdown events
@@ -40,9 +43,16 @@ async def lifespan(app: FastAPI):
         logging.error(f"Could not initialize global variables: {e}")
         logging.warning("Some features may not work correctly")
 
+    if AGENT_WORKERS > 0 and AGENT_WORKER_PRELOAD:
+        try:
+            warm_agent_workers(global_var['db'])
+        except Exception as e:
+            logging.error(f"Could not start agent worker pools: {e}")
+
     yield
 
     # Shutdown
+    shutdown_worker_pools()
     db = global_var.get("db")
     if db is not None:
         try:
@@ -94,7 +94,7 @@ class EnhancedFinGeniusAnalyzer:
                     visualizer.show_progress_update(f"注册研究员", f"专家: {agent.name}")
             
             # Run research with tool call visualization
-            visualizer.show_progress_update("开始深度研究", "多专家顺序分析中（每3秒一个）...")
+            visualizer.show_progress_update("开始深度研究", "多专家并行分析中...")
             
             # Enhance agents with visualization
             self._enhance_agents_with_visualization(research_env)
@@ -199,6 +199,7 @@ class EnhancedFinGeniusAnalyzer:
         # Merge research results
         if research_results:
             final_results['research_summary'] = research_results['summary']
+            final_results['research_timing'] = research_results.get('timing')
         
         # Add battle insights
         if battle_results and "vote_count" in battle_results:
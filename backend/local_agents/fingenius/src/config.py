@@ -105,6 +105,14 @@ class TTSSettings(BaseModel):
     default_output_dir: str = Field("results", description="默认音频文件输出目录")
 
 
+class ResearchSettings(BaseModel):
+    """配置研究阶段的专家并发"""
+
+    concurrency: int = Field(3, description="同时运行的研究专家数")
+    agent_timeout: int = Field(300, description="单个专家的超时秒数，超时后使用已完成步骤的部分结果")
+    llm_calls_per_minute: int = Field(0, description="本进程每分钟大模型调用次数上限，0 为不限制")
+
+
 class MCPServerConfig(BaseModel):
     """Configuration for a single MCP server"""
 
@@ -162,6 +170,7 @@ class AppConfig(BaseModel):
     )
     mcp_config: Optional[MCPSettings] = Field(None, description="MCP configuration")
     tts_config: Optional[TTSSettings] = Field(None, description="TTS configuration")
+    research_config: Optional[ResearchSettings] = Field(None, description="Research phase configuration")
 
     class Config:
         arbitrary_types_allowed = True
@@ -277,6 +286,9 @@ class Config:
             # 创建默认TTS配置
             tts_settings = TTSSettings()
 
+        # 研究阶段并发配置，未配置时使用默认值
+        research_settings = ResearchSettings(**raw_config.get("research", {}))
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -289,6 +301,7 @@ class Config:
             "search_config": search_settings,
             "mcp_config": mcp_settings,
             "tts_config": tts_settings,
+            "research_config": research_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -315,6 +328,11 @@ class Config:
         """获取TTS配置"""
         return self._config.tts_config
 
+    @property
+    def research_config(self) -> ResearchSettings:
+        """获取研究阶段并发配置"""
+        return self._config.research_config
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
@@ -1,5 +1,6 @@
 import asyncio
-from typing import Any, Dict
+import time
+from typing import Any, Dict, List
 from pydantic import Field
 from local_agents.fingenius.src.agent.chip_analysis import ChipAnalysisAgent
 from local_agents.fingenius.src.agent.hot_money import HotMoneyAgent
@@ -7,6 +8,7 @@ from local_agents.fingenius.src.agent.risk_control import RiskControlAgent
 from local_agents.fingenius.src.agent.sentiment import SentimentAgent
 from local_agents.fingenius.src.agent.technical_analysis import TechnicalAnalysisAgent
 from local_agents.fingenius.src.agent.big_deal_analysis import BigDealAnalysisAgent
+from local_agents.fingenius.src.config import config
 from local_agents.fingenius.src.environment.base import BaseEnvironment
 from local_agents.fingenius.src.logger import logger
 from local_agents.fingenius.src.schema import Message
@@ -80,53 +82,67 @@ class ResearchEnvironment(BaseEnvironment):
                         )
                         logger.info(f"Added basic stock info to {agent_key}'s context")
 
-            # Run analysis tasks sequentially with 3-second intervals
+            # Run the specialists concurrently, they only share the read-only basic info above
+            research = config.research_config
+            agent_keys = [k for k in self.analysis_mapping.keys() if k in self.agents]
+            total_agents = len(agent_keys)
+            semaphore = asyncio.Semaphore(max(1, research.concurrency))
             results = {}
             summary = {}
-            agent_count = 0
-            total_agents = len([k for k in self.analysis_mapping.keys() if k in self.agents])
-            
+            timings = {}
+            statuses = {}
+            started = 0
+            finished = 0
+
             # Import visualizer for progress display
             try:
                 from local_agents.fingenius.src.console import visualizer
                 show_visual = True
             except:
                 show_visual = False
-            
-            for agent_key, result_key in self.analysis_mapping.items():
-                if agent_key not in self.agents:
-                    continue
-                    
-                agent_count += 1
-                logger.info(f"🔄 Starting analysis with {agent_key} ({agent_count}/{total_agents})")
-                
-                # Show agent starting in terminal
-                if show_visual:
-                    visualizer.show_agent_starting(agent_key, agent_count, total_agents)
-                
-                try:
-                    # Run individual agent
-                    agent_results = await self.agents[agent_key].run(stock_code=stock_code)
-                    result = "\n".join(agent_results) if agent_results else "No steps executed"
-                    results[result_key] = result
-                    agent_summary = self.extract_report_summary(agent_results)
-                    summary[result_key] = agent_summary
-                    logger.info(f"✅ Completed analysis with {agent_key}")
-                    
-                    # Show agent completion in terminal
+
+            async def run_specialist(agent_key: str) -> None:
+                nonlocal started, finished
+                result_key = self.analysis_mapping[agent_key]
+                async with semaphore:
+                    started += 1
+                    logger.info(f"🔄 Starting analysis with {agent_key} ({started}/{total_agents})")
                     if show_visual:
-                        visualizer.show_agent_completed(agent_key, agent_count, total_agents)
-                    
-                    # Wait 3 seconds before next agent (except for the last one)
-                    if agent_count < total_agents:
-                        logger.info(f"⏳ Waiting 3 seconds before next agent...")
-                        if show_visual:
-                            visualizer.show_waiting_next_agent(3)
-                        await asyncio.sleep(3)
-                        
-                except Exception as e:
-                    logger.error(f"❌ Error with {agent_key}: {str(e)}")
-                    results[result_key] = f"Error: {str(e)}"
+                        visualizer.show_agent_starting(agent_key, started, total_agents)
+
+                    agent_start = time.time()
+                    try:
+                        agent_results = await asyncio.wait_for(
+                            self.agents[agent_key].run(stock_code=stock_code), timeout=research.agent_timeout
+                        )
+                        statuses[result_key] = "completed"
+                    except asyncio.TimeoutError:
+                        # keep the steps finished before the timeout, the report goes on without the rest
+                        agent_results = self.partial_results(agent_key)
+                        agent_results.append(f"Terminated: timed out after {research.agent_timeout}s")
+                        statuses[result_key] = "timeout"
+                        logger.warning(f"⏱️ {agent_key} timed out after {research.agent_timeout}s, "
+                                       f"using {len(agent_results) - 1} partial steps")
+                    except Exception as e:
+                        logger.error(f"❌ Error with {agent_key}: {str(e)}")
+                        results[result_key] = f"Error: {str(e)}"
+                        statuses[result_key] = "error"
+                        timings[result_key] = round(time.time() - agent_start, 1)
+                        return
+
+                    timings[result_key] = round(time.time() - agent_start, 1)
+                    results[result_key] = "\n".join(agent_results) if agent_results else "No steps executed"
+                    summary[result_key] = self.extract_report_summary(agent_results)
+                    finished += 1
+                    logger.info(f"✅ Finished analysis with {agent_key} ({statuses[result_key]}) in {timings[result_key]}s")
+                    if show_visual:
+                        visualizer.show_agent_completed(agent_key, finished, total_agents)
+
+            research_start = time.time()
+            await asyncio.gather(*(run_specialist(agent_key) for agent_key in agent_keys))
+            wall_clock = round(time.time() - research_start, 1)
+            logger.info(f"Research on {stock_code} took {wall_clock}s for {total_agents} agents "
+                        f"(sum of agent times {sum(timings.values()):.1f}s, concurrency {research.concurrency})")
 
             if not results:
                 return {
@@ -139,7 +155,12 @@ class ResearchEnvironment(BaseEnvironment):
                 results["basic_info"] = basic_info_result.output
 
             # Store and return complete results (without generating report here)
-            self.results = {**results, "stock_code": stock_code, "summary": summary}
+            self.results = {
+                **results,
+                "stock_code": stock_code,
+                "summary": summary,
+                "timing": {"wall_clock": wall_clock, "agents": timings, "status": statuses},
+            }
             return self.results
 
         except Exception as e:
@@ -159,6 +180,15 @@ class ResearchEnvironment(BaseEnvironment):
 
         await super().cleanup()
 
+    def partial_results(self, agent_key: str) -> List[str]:
+        """Steps of an interrupted agent, rebuilt from the assistant messages in its memory"""
+        agent = self.get_agent(agent_key)
+        if not agent or not hasattr(agent, "memory"):
+            return []
+        contents = [message.content for message in agent.memory.messages
+                    if message.role == "assistant" and message.content]
+        return [f"Step {i}: Thought:\n{content}" for i, content in enumerate(contents, 1)]
+
     def extract_report_summary(self, agent_results):
         extracted_summary = ''
         for each_result in agent_results:
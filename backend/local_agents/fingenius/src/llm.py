@@ -17,6 +17,7 @@ from tenacity import (
 )
 
 
+from data_processing.data_provider.rate_limit import TokenBucket
 from local_agents.fingenius.src.config import LLMSettings, config
 from local_agents.fingenius.src.exceptions import TokenLimitExceeded
 from local_agents.fingenius.src.logger import logger  # Assuming a logger is set up in your app
@@ -31,6 +32,22 @@ from local_agents.fingenius.src.schema import (
 
 REASONING_MODELS = ["o1", "o3-mini"]
 
+# shared by every LLM instance and agent of the process, built on first use
+_llm_rate_limiter = None
+
+
+async def wait_for_llm_rate_limit() -> None:
+    """Wait for a token of the research.llm_calls_per_minute bucket, no-op when it is not set"""
+    global _llm_rate_limiter
+    calls_per_minute = config.research_config.llm_calls_per_minute
+    if calls_per_minute <= 0:
+        return
+    if _llm_rate_limiter is None:
+        _llm_rate_limiter = TokenBucket(calls_per_minute, burst=1)
+    waited = await _llm_rate_limiter.acquire_async()
+    if waited > 0:
+        logger.info(f"LLM rate limit: waited {waited:.1f}s")
+
 
 class TokenCounter:
     # Token constants
@@ -332,6 +349,7 @@ class LLM:
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
+        await wait_for_llm_rate_limit()
         try:
             # Format system and user messages
             if system_msgs:
@@ -448,6 +466,7 @@ class LLM:
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
+        await wait_for_llm_rate_limit()
         try:
             # Format messages
             formatted_messages = self.format_messages(messages)
@@ -598,6 +617,7 @@ class LLM:
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
+        await wait_for_llm_rate_limit()
         try:
             # Validate tool_choice
             if tool_choice not in TOOL_CHOICE_VALUES:
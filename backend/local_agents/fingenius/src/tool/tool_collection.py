@@ -4,6 +4,7 @@ from typing import Any, Dict, List
 from local_agents.fingenius.src.exceptions import ToolError
 from local_agents.fingenius.src.logger import logger
 from local_agents.fingenius.src.tool.base import BaseTool, ToolFailure, ToolResult
+from mcp_servers.tool_cache import cached_tool_call
 
 
 class ToolCollection:
@@ -30,7 +31,9 @@ class ToolCollection:
             return ToolFailure(error=f"Tool {name} is invalid")
         try:
             tool_input = tool_input or {}
-            result = await tool(**tool_input)
+            # research tools of concurrent agents share results for the same stock and day
+            result = await cached_tool_call(name, tool_input, lambda: tool(**tool_input),
+                                            is_error=lambda result: bool(getattr(result, "error", None)))
             return result
         except ToolError as e:
             return ToolFailure(error=e.message)
@@ -1,59 +1,50 @@
-import asyncio
-import multiprocessing
-import signal
-import sys
+"""
+FinGenius 常驻工作进程池
 
-from local_agents.fingenius.main import fingenius_main
+工作进程由 end_points/get_rule/operations/agent_worker_pool.py 提供，对任意 Rule.info
+模块路径通用：每个进程只导入一次 Agent 模块并保持一个事件循环，任务经空闲进程队列分发，
+按运行次数 / 内存回收。这里从命令行读取股票代码，交给 FinGenius 的进程池执行。
 
+使用方法：
+    python local_agents/fingenius/workers/fingenius_worker.py 600519 000001 --workers 2
+"""
 
-def worker_process(task_queue):
-    """
-    一个后台工作进程，从队列中获取任务并执行
-    """
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-    # 注册信号处理器以实现优雅退出
-    def cleanup_handler(signum, frame):
-        print(f"工作进程收到信号 {signum}，正在退出...")
-        # 这里的清理逻辑可以根据需要添加
-        sys.exit(0)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
-    signal.signal(signal.SIGINT, cleanup_handler)
-    signal.signal(signal.SIGTERM, cleanup_handler)
+from end_points.get_rule.operations.agent_worker_pool import AgentWorkerPool, AgentWorkerError
 
-    print("后台工作进程已启动，等待任务...")
-    while True:
-        try:
-            # 从队列中获取任务，等待1秒以允许正常退出
-            stock_code = task_queue.get(timeout=1)
-            print(f"工作进程开始处理股票代码: {stock_code}")
+FINGENIUS_MODULE = 'local_agents.fingenius.main.fingenius_main'
 
-            # 使用 asyncio.run 在后台进程中执行异步任务
-            asyncio.run(fingenius_main(stock_code), debug=True)
 
-            print(f"股票代码 {stock_code} 的任务完成")
-        except multiprocessing.queues.Empty:
-            # 如果队列为空，继续等待
-            continue
-        except Exception as e:
-            print(f"工作进程执行任务时出错: {e}")
+def main():
+    parser = argparse.ArgumentParser(description='用常驻工作进程池运行 FinGenius')
+    parser.add_argument('stock_codes', nargs='+', help='股票代码')
+    parser.add_argument('--workers', type=int, default=2, help='工作进程数')
+    parser.add_argument('--module', type=str, default=FINGENIUS_MODULE, help='Agent 模块路径 (Rule.info)')
+    args = parser.parse_args()
 
+    pool = AgentWorkerPool(args.module, workers=args.workers)
 
-# 这是工作进程的入口
-if __name__ == "__main__":
-    # 在 worker 进程中，设置 spawn 启动方法
-    try:
-        multiprocessing.set_start_method("spawn", force=True)
-    except RuntimeError:
-        pass  # 已经在主进程中设置过，忽略
+    def run(stock_code):
+        try:
+            return stock_code, pool.run(stock_code)
+        except (AgentWorkerError, ValueError) as e:
+            return stock_code, f'失败: {e}'
 
-    # 创建一个队列来传递任务
-    task_queue = multiprocessing.Queue()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for stock_code, result in executor.map(run, args.stock_codes):
+                print(f"股票代码 {stock_code} 的任务完成: {result}")
+    finally:
+        pool.shutdown()
 
-    # 启动工作进程
-    worker = multiprocessing.Process(target=worker_process, args=(task_queue,))
-    worker.daemon = True  # 确保主进程退出时子进程也退出
-    worker.start()
 
-    # 在主进程中，你可以使用 task_queue.put() 来添加任务
-    # 例如：task_queue.put('AAPL')
-    # ... 在这里，你可以启动你的 Flask 应用
\ No newline at end of file
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn", force=True)
+    main()
@@ -16,6 +16,41 @@ from common.consts import Agents
 
 load_dotenv()
 
+TIMEFRAME = '1h'
+# calendar days of bars analysed up to today
+HISTORY_DAYS = 30
+
+
+def history_window():
+    end_dt = datetime.now().strftime('%Y%m%d')
+    start_dt = (datetime.now() - timedelta(days=HISTORY_DAYS)).strftime('%Y%m%d')
+    return start_dt, end_dt
+
+
+async def analyze_symbol(analyzer, symbol, df):
+    if df.empty:
+        return {"error": "No data available for the specified parameters"}
+
+    results = await analyzer.run_analysis(df, symbol, TIMEFRAME)
+    formatted_results = analyzer.extract_analysis_results(results)
+    final_decision = formatted_results.get('final_decision').get('decision')
+    final_decision = extract_decision(final_decision)
+    output_path = Path(__file__).resolve().parent/f'reports/{datetime.now().strftime("%Y-%m-%d")}/'
+    output_results(formatted_results, symbol, output_path, Agents.quant_agent)
+    print(f'The final decision is {final_decision}')
+    return final_decision
+
+
+def release_client(tech_client):
+    # 清理 MCP client
+    print("清理 MCP clients...")
+    if tech_client is not None:
+        del tech_client
+    import gc
+    gc.collect()
+    print("MCP clients 已清理")
+
+
 async def qa_main(symbol):
     tech_client = None
     try:
@@ -23,33 +58,43 @@ async def qa_main(symbol):
         tech_client, tech_tools = await get_tech_tools_mcp_async()
         analyzer = WebTradingAnalyzer(tech_tools)
 
-        timeframe = '1h'
-        end_dt = datetime.now().strftime('%Y%m%d')
-        start_dt = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
-        df = analyzer.fetch_my_data_with_date(symbol, start_dt, end_dt, timeframe)
-        # df = pd.DataFrame([])
-        if df.empty:
-            return {"error": "No data available for the specified parameters"}
-
-        results = await analyzer.run_analysis(df, symbol, timeframe)
-        formatted_results = analyzer.extract_analysis_results(results)
-        final_decision = formatted_results.get('final_decision').get('decision')
-        final_decision = extract_decision(final_decision)
-        output_path = Path(__file__).resolve().parent/f'reports/{datetime.now().strftime("%Y-%m-%d")}/'
-        output_results(formatted_results, symbol, output_path, Agents.quant_agent)
-        print(f'The final decision is {final_decision}')
-        return final_decision
+        start_dt, end_dt = history_window()
+        df = analyzer.fetch_my_data_with_date(symbol, start_dt, end_dt, TIMEFRAME)
+        return await analyze_symbol(analyzer, symbol, df)
     except Exception as e:
         print(e)
         return {"error": str(e)}
     finally:
-        # 清理 MCP client
-        print("清理 MCP clients...")
-        if tech_client is not None:
-            del tech_client
-        import gc
-        gc.collect()
-        print("MCP clients 已清理")
+        release_client(tech_client)
+
+
+async def qa_pool_main(symbols):
+    """
+    qa_main over a stock pool: the bars of every symbol are fetched in one concurrent Mairui
+    batch (fetch_my_data_batch) and one MCP client serves all the analyses.
+    Returns symbol -> decision, {"error": ...} for the symbols that failed.
+    """
+    tech_client = None
+    decisions = {}
+    try:
+        tech_client, tech_tools = await get_tech_tools_mcp_async()
+        analyzer = WebTradingAnalyzer(tech_tools)
+
+        start_dt, end_dt = history_window()
+        frames = await analyzer.fetch_my_data_batch(symbols, start_dt, end_dt, TIMEFRAME)
+        for symbol in symbols:
+            try:
+                decisions[symbol] = await analyze_symbol(analyzer, symbol, frames[symbol])
+            except Exception as e:
+                print(e)
+                decisions[symbol] = {"error": str(e)}
+    except Exception as e:
+        print(e)
+        for symbol in symbols:
+            decisions.setdefault(symbol, {"error": str(e)})
+    finally:
+        release_client(tech_client)
+    return decisions
 
 def extract_decision(decision):
     final_decision = False
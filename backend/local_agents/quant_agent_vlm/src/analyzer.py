@@ -11,6 +11,9 @@ import yfinance as yf
 from local_agents.quant_agent_vlm.src.trading_graph import TradingGraph
 from data_processing.data_provider.mairui import Mairui
 
+# analyzer timeframes -> Mairui history time slots
+MAIRUI_INTERVALS = {'5m': '5', '15m': '15', '30m': '30', '60m': '60', '1h': '60', '1d': 'd'}
+
 
 class WebTradingAnalyzer:
     def __init__(self, mcp_tools):
@@ -206,50 +209,77 @@ class WebTradingAnalyzer:
 
     def fetch_my_data_with_date(self, symbol: str, start_date: str,
                                           end_date: str, interval: str = '60m') -> pd.DataFrame:
-        """Fetch OHLCV data from Yahoo Finance using datetime objects for exact time precision."""
+        """Fetch OHLCV bars of one symbol from Mairui over its pooled keep-alive session."""
         try:
             print(f"Fetching {symbol} from {start_date} to {end_date} with interval {interval}")
-            mydata = Mairui()
-            results = mydata.get_stock_history(symbol, start_date, end_date, '60')
-            df = pd.DataFrame(results)
+            results = Mairui().get_stock_history(symbol, start_date, end_date, self.get_mairui_interval(interval))
+            return self.to_ohlcv_frame(symbol, results)
 
-            if df is None or df.empty:
-                print(f"No data returned for {symbol}")
-                return pd.DataFrame()
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            return pd.DataFrame()
 
-            # Rename columns if needed
-            column_mapping = {
-                't': 'Datetime',
-                'o': 'Open',
-                'h': 'High',
-                'l': 'Low',
-                'c': 'Close',
-                'v': 'Volume'
-            }
+    async def fetch_my_data_batch(self, symbols: list, start_date: str, end_date: str,
+                                  interval: str = '60m') -> Dict[str, pd.DataFrame]:
+        """
+        Fetch the bars of a whole stock pool concurrently, bounded by the Mairui quota.
+        Returns symbol -> DataFrame, empty for the symbols that failed.
+        """
+        time_slot = self.get_mairui_interval(interval)
+        history_requests = [(symbol, time_slot, start_date, end_date) for symbol in symbols]
+        results = await Mairui().get_history_batch_async(history_requests)
+        frames = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching data for {symbol}: {result}")
+                frames[symbol] = pd.DataFrame()
+            else:
+                frames[symbol] = self.to_ohlcv_frame(symbol, result)
+        return frames
 
-            # Only rename columns that exist
-            existing_columns = {old: new for old, new in column_mapping.items() if old in df.columns}
-            df = df.rename(columns=existing_columns)
+    @staticmethod
+    def get_mairui_interval(interval: str) -> str:
+        """Mairui time slot of a timeframe ('1h' / '60m' -> '60'), 60 minutes by default"""
+        return MAIRUI_INTERVALS.get(interval, '60')
 
-            # Ensure we have the required columns
-            required_columns = ["Datetime", "Open", "High", "Low", "Close"]
-            if not all(col in df.columns for col in required_columns):
-                print(f"Warning: Missing columns. Available: {list(df.columns)}")
-                return pd.DataFrame()
+    @staticmethod
+    def to_ohlcv_frame(symbol: str, results) -> pd.DataFrame:
+        """Mairui history rows as a Datetime/Open/High/Low/Close frame, empty when unusable"""
+        df = pd.DataFrame(results)
 
-            # Select only the required columns
-            df = df[required_columns]
-            df['Datetime'] = pd.to_datetime(df['Datetime'])
+        if df is None or df.empty:
+            print(f"No data returned for {symbol}")
+            return pd.DataFrame()
 
-            print(f"Successfully fetched {len(df)} data points for {symbol}")
-            print(f"Date range: {df['Datetime'].min()} to {df['Datetime'].max()}")
+        # Rename columns if needed
+        column_mapping = {
+            't': 'Datetime',
+            'o': 'Open',
+            'h': 'High',
+            'l': 'Low',
+            'c': 'Close',
+            'v': 'Volume'
+        }
 
-            return df
+        # Only rename columns that exist
+        existing_columns = {old: new for old, new in column_mapping.items() if old in df.columns}
+        df = df.rename(columns=existing_columns)
 
-        except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
+        # Ensure we have the required columns
+        required_columns = ["Datetime", "Open", "High", "Low", "Close"]
+        if not all(col in df.columns for col in required_columns):
+            print(f"Warning: Missing columns. Available: {list(df.columns)}")
             return pd.DataFrame()
 
+        # Select only the required columns
+        df = df[required_columns]
+        df['Datetime'] = pd.to_datetime(df['Datetime'])
+
+        print(f"Successfully fetched {len(df)} data points for {symbol}")
+        print(f"Date range: {df['Datetime'].min()} to {df['Datetime'].max()}")
+
+        return df
+
     def get_available_assets(self) -> list:
         """Get list of available assets from the asset mapping dictionary."""
         return sorted(list(self.asset_mapping.keys()))
@@ -9,7 +9,7 @@ if project_root not in sys.path:
 
 from mcp_servers.tools.stock_utils import StockUtils
 
-from mcp_servers.utils import get_mcp_studio_tools_async
+from mcp_servers.utils import get_mcp_studio_tools_async, run_mcp_server
 from mcp_servers.combo_mcp_servers.trading_agent_tools_mcp_utils import *
 from datetime import datetime, timedelta
 
@@ -146,4 +146,4 @@ async def get_trading_agent_tools_mcp_async():
 
 
 if __name__ == '__main__':
-    trading_agent_tools_mcp.run(transport="stdio")
+    run_mcp_server(trading_agent_tools_mcp, tool_kit_name)
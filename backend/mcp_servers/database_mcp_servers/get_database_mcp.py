@@ -9,7 +9,7 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from mcp_servers.utils import get_mcp_studio_tools_async
+from mcp_servers.utils import get_mcp_studio_tools_async, run_mcp_server
 from mcp_servers.database_mcp_servers.get_database_mcp_utils import get_sims_for_type, get_sim_result
 from end_points.get_earn.earn_schema import StockRuleEarnSchema
 from db.mysql.db_schemas import Simulator, Rule, StockRuleEarn, Stock
@@ -116,4 +116,4 @@ if __name__ == '__main__':
         config.read_string("[s]\n" + stream.read())
     config = transform_config(config)
     global_session = init_session(config)
-    get_database_mcp.run(transport="stdio")
\ No newline at end of file
+    run_mcp_server(get_database_mcp, tool_kit_name)
\ No newline at end of file
@@ -11,7 +11,7 @@ from fastmcp import FastMCP
 from mcp_servers.news_mcp_servers.news_tools_mcp_utils import format_news_report, deduplicate_news
 from mcp_servers.tools.web_search import baidu_search, bocha_ai_search
 from local_agents.tauric_mcp.agents.utils.utils import NewsItem
-from mcp_servers.utils import get_mcp_studio_tools_async
+from mcp_servers.utils import get_mcp_studio_tools_async, run_mcp_server
 
 
 tool_kit_name = 'NewsToolsMCP'
@@ -84,4 +84,4 @@ async def get_news_mcp_tools_async():
 
 if __name__ == '__main__':
     # run_trading_agent_tools_mcp()
-    trading_agent_tools_mcp.run(transport="stdio")
+    run_mcp_server(trading_agent_tools_mcp, tool_kit_name)
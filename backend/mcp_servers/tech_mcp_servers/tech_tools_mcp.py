@@ -6,7 +6,7 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from mcp_servers.utils import get_mcp_studio_tools_async
+from mcp_servers.utils import get_mcp_studio_tools_async, run_mcp_server
 import matplotlib
 from mcp.server import FastMCP
 from local_agents.quant_agent_vlm.src import color_style
@@ -297,4 +297,4 @@ async def get_tech_tools_mcp_async():
 
 
 if __name__ == '__main__':
-    tech_tools_mcp.run(transport="stdio")
+    run_mcp_server(tech_tools_mcp, tool_kit_name)
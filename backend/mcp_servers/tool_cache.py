@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from data_processing.data_provider.response_cache import SQLiteResponseCache, MemoryResponseCache, \
+    default_cache_path, cache_snapshot, cache_report
+
+logger = logging.getLogger(__name__)
+
+# seconds a tool result stays fresh, per tool name; tools not listed are never cached.
+# The trading date is part of the key, so results never carry over to the next session.
+TOOL_TTLS = {
+    # Tauric: TradingAgentTools / NewsToolsMCP
+    'get_stock_market_data': 10 * 60,
+    'get_stock_fundamentals_data': 24 * 3600,
+    'get_realtime_stock_news': 15 * 60,
+    'get_stock_news_sentiment': 30 * 60,
+    # quant VLM: TechToolsMCP, the images are pure functions of the K-line data
+    'generate_kline_image': 24 * 3600,
+    'generate_trend_image': 24 * 3600,
+    # FinGenius research tools
+    'stock_info_request': 3600,
+    'chip_analysis_tool': 3600,
+    'risk_control_tool': 3600,
+    'technical_analysis_tool': 10 * 60,
+    'big_deal_analysis_tool': 10 * 60,
+    'hot_money_tool': 30 * 60,
+    'sentiment_tool': 30 * 60,
+}
+# errors of reading or storing a result (unpicklable values, a locked or broken file): the
+# tool call goes on without the cache
+CACHE_ERRORS = (pickle.PicklingError, pickle.UnpicklingError, TypeError, AttributeError, sqlite3.Error)
+
+
+def get_tool_ttls():
+    """TOOL_TTLS with the MCP_TOOL_TTLS overrides ('{"get_stock_market_data": 300}', 0 disables a tool)"""
+    try:
+        overrides = json.loads(os.getenv('MCP_TOOL_TTLS') or '{}')
+    except json.JSONDecodeError:
+        logger.warning("Ignoring MCP_TOOL_TTLS: not a JSON object")
+        overrides = {}
+    return dict(TOOL_TTLS, **overrides)
+
+
+def normalize_args(value):
+    """Arguments in a canonical form: None dropped, strings stripped, integral floats as ints (keys are sorted by cache_key)"""
+    if isinstance(value, dict):
+        return dict((str(key), normalize_args(item)) for key, item in value.items() if item is not None)
+    if isinstance(value, (list, tuple)):
+        return [normalize_args(item) for item in value]
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+_trading_date = (0, None)
+
+
+def current_trading_date():
+    """Latest trading day with published bars, looked up once a minute; today when the calendar is unavailable"""
+    global _trading_date
+    checked_at, trading_date = _trading_date
+    now = time.time()
+    if trading_date is None or now - checked_at > 60:
+        try:
+            from data_processing.data_provider.trading_calendar import get_trading_calendar
+            trading_date = get_trading_calendar().latest_trading_day().strftime('%Y-%m-%d')
+        except Exception:
+            trading_date = datetime.now().strftime('%Y-%m-%d')
+        _trading_date = (now, trading_date)
+    return trading_date
+
+
+class SQLiteToolResultCache(SQLiteResponseCache):
+    """
+    Tool results on disk, shared by every agent process (worker pool, MCP servers, scripts).
+    Hits and misses are counted in the file (SQLiteResponseCache), so the hit rate of a pool
+    run can be read across all the processes that served it.
+    """
+
+    def __init__(self, path=None, ttls=None):
+        super().__init__(path or os.path.join(os.path.dirname(default_cache_path()), 'mcp_tools.sqlite'),
+                         ttls=ttls, default_ttl=0)
+
+
+class MemoryToolResultCache(MemoryResponseCache):
+    """Per-process tool cache, MCP_TOOL_CACHE=memory"""
+
+    def __init__(self, ttls=None):
+        super().__init__(ttls=ttls, default_ttl=0)
+
+
+_tool_cache = None
+_tool_cache_lock = threading.Lock()
+
+
+def get_tool_cache():
+    """Process-wide tool cache selected by MCP_TOOL_CACHE: 'sqlite' (default), 'memory' or 'none' (None)"""
+    global _tool_cache
+    with _tool_cache_lock:
+        if _tool_cache is None:
+            backend = os.getenv('MCP_TOOL_CACHE', 'sqlite').lower()
+            if backend in ('none', 'off', '0'):
+                _tool_cache = False
+            elif backend == 'memory':
+                _tool_cache = MemoryToolResultCache(get_tool_ttls())
+            else:
+                try:
+                    _tool_cache = SQLiteToolResultCache(os.getenv('MCP_TOOL_CACHE_PATH'), get_tool_ttls())
+                except (OSError, sqlite3.Error) as e:
+                    print(f"⚠️ MCP 工具结果缓存不可用，改用进程内缓存: {e}")
+                    _tool_cache = MemoryToolResultCache(get_tool_ttls())
+        return _tool_cache or None
+
+
+async def cached_tool_call(tool_name, args, call, is_error=None):
+    """
+    Result of `await call()` for a tool, served from the cache when the same tool was called
+    with the same normalized args on the current trading date. Tools without a TTL are called
+    directly; results for which is_error(result) is true are not stored. A cache that fails
+    to read or store (CACHE_ERRORS) is logged and the live result returned. Every cached
+    call prints a cache header line to the agent log.
+    """
+    cache = get_tool_cache()
+    if cache is None or cache.ttl(tool_name) <= 0:
+        return await call()
+    params = {'args': normalize_args(args or {}), 'trading_date': current_trading_date()}
+    start_time = time.time()
+    try:
+        result = cache.get(tool_name, params)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Tool cache read of {tool_name} failed, calling it: {e}")
+        result = None
+    if result is not None:
+        print(f"[MCP cache] HIT {tool_name} {json.dumps(params['args'], ensure_ascii=False, default=str)[:80]} "
+              f"({params['trading_date']}, {(time.time() - start_time) * 1000:.0f}ms)")
+        return result
+    result = await call()
+    stored = result is not None and not (is_error is not None and is_error(result))
+    if stored:
+        try:
+            cache.set(tool_name, params, result)
+        except CACHE_ERRORS as e:
+            logger.warning(f"Tool cache write of {tool_name} failed: {e}")
+            stored = False
+    print(f"[MCP cache] MISS {tool_name} {json.dumps(params['args'], ensure_ascii=False, default=str)[:80]} "
+          f"({params['trading_date']}, {time.time() - start_time:.1f}s{'' if stored else ', not stored'})")
+    return result
+
+
+def tool_cache_snapshot():
+    """Shared hit/miss counters, taken before a pool run and passed to tool_cache_report after it"""
+    return cache_snapshot(get_tool_cache())
+
+
+def tool_cache_report(before):
+    """One log line with the hit rate of every tool since the `before` snapshot, None when nothing was cached"""
+    return cache_report('MCP tool cache', before, tool_cache_snapshot())
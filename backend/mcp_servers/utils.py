@@ -1,11 +1,136 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from urllib.parse import urlparse
+
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
+from mcp_servers.tool_cache import cached_tool_call
+
+logger = logging.getLogger(__name__)
+
+MCP_ROOT = os.path.dirname(os.path.abspath(__file__))
+# tool kits that can run as shared long-lived servers: name -> (server file, default port)
+MCP_SERVERS = {
+    'TradingAgentTools': (os.path.join(MCP_ROOT, 'combo_mcp_servers', 'trading_agent_tools_mcp.py'), 8931),
+    'NewsToolsMCP': (os.path.join(MCP_ROOT, 'news_mcp_servers', 'news_tools_mcp.py'), 8932),
+    'TechToolsMCP': (os.path.join(MCP_ROOT, 'tech_mcp_servers', 'tech_tools_mcp.py'), 8933),
+    'DatabaseTool': (os.path.join(MCP_ROOT, 'database_mcp_servers', 'get_database_mcp.py'), 8934),
+}
+MCP_HOST = os.getenv('MCP_HOST', '127.0.0.1')
+# 'shared': connect to the servers started by scripts/run_mcp_servers.py, falling back to
+# a stdio subprocess when one is not reachable; 'stdio': a subprocess per agent run
+MCP_MODE = os.getenv('MCP_MODE', 'shared').lower()
+# seconds to wait for a shared server before falling back to stdio
+MCP_CONNECT_TIMEOUT = 2
+
+
+def get_mcp_server_url(tool_name):
+    """URL of the shared server of a tool kit, MCP_SERVER_URLS ('{"TechToolsMCP": "http://..."}') overrides it"""
+    try:
+        urls = json.loads(os.getenv('MCP_SERVER_URLS') or '{}')
+    except json.JSONDecodeError:
+        urls = {}
+    if tool_name in urls:
+        return urls[tool_name]
+    if tool_name not in MCP_SERVERS:
+        return None
+    return f'http://{MCP_HOST}:{MCP_SERVERS[tool_name][1]}/mcp'
+
+
+def run_mcp_server(mcp, tool_name):
+    """
+    __main__ of a tool kit server: stdio by default (spawned per agent run), or a long-lived
+    streamable HTTP server with --transport streamable-http [--port N]
+    """
+    parser = argparse.ArgumentParser(description=f'{tool_name} MCP server')
+    parser.add_argument('--transport', choices=['stdio', 'streamable-http', 'sse'], default='stdio')
+    parser.add_argument('--host', type=str, default=MCP_HOST)
+    parser.add_argument('--port', type=int, default=MCP_SERVERS.get(tool_name, (None, 8930))[1])
+    args = parser.parse_args()
+    if args.transport != 'stdio':
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+    mcp.run(transport=args.transport)
+
+
+async def _server_reachable(url):
+    """TCP connect to the server of url, so a missing server costs milliseconds rather than a client timeout"""
+    parsed = urlparse(url)
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(parsed.hostname, parsed.port or 80),
+                                           MCP_CONNECT_TIMEOUT)
+        writer.close()
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+
+def _cached_coroutine(tool_name, call):
+    async def coroutine(**arguments):
+        return await cached_tool_call(tool_name, arguments, lambda: call(**arguments))
+    return coroutine
+
+
+def cache_tool_results(tools):
+    """Put the tool result cache (mcp_servers.tool_cache) in front of the MCP tools"""
+    for tool in tools:
+        call = getattr(tool, 'coroutine', None)
+        if call is not None:
+            tool.coroutine = _cached_coroutine(tool.name, call)
+    return tools
+
+
+# tool_name -> (client, tools) of the shared servers, reused by every run of the process
+_shared_clients = {}
+# one lock per event loop, worker processes and run_async threads each run their own
+_shared_locks = weakref.WeakKeyDictionary()
+
+
+async def get_shared_mcp_tools_async(tool_name):
+    """
+    Pooled client of a shared tool kit server and its tools, None when the server is not
+    reachable. The tools list is fetched once per process; each tool call opens a short HTTP
+    session on the running server instead of starting a Python subprocess.
+    """
+    url = get_mcp_server_url(tool_name)
+    if url is None:
+        return None
+    if not await _server_reachable(url):
+        _shared_clients.pop(tool_name, None)
+        return None
+    lock = _shared_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+    async with lock:
+        cached = _shared_clients.get(tool_name)
+        if cached is not None:
+            return cached
+        try:
+            client = MultiServerMCPClient({tool_name: {"url": url, "transport": "streamable_http"}})
+            tools = cache_tool_results(await client.get_tools())
+        except Exception as e:
+            logger.warning(f'Shared MCP server {tool_name} at {url} failed: {e}')
+            return None
+        _shared_clients[tool_name] = (client, tools)
+        return client, tools
+
 
 async def get_mcp_studio_tools_async(tool_path, tool_name):
     """
     创建MCP客户端并获取工具
+    MCP_MODE=shared (默认) 时优先使用常驻的共享服务，不可用时回退为 stdio 子进程
     返回: (client, tools) 元组，调用者负责关闭 client
     """
+    start_time = time.time()
+    if MCP_MODE == 'shared':
+        shared = await get_shared_mcp_tools_async(tool_name)
+        if shared is not None:
+            logger.info(f'{tool_name}: {len(shared[1])} tools from shared server in {time.time() - start_time:.2f}s')
+            return shared
+
     client = MultiServerMCPClient(
         {
             tool_name: {
@@ -16,6 +141,6 @@ async def get_mcp_studio_tools_async(tool_path, tool_name):
         }
     )
 
-    all_tools = await client.get_tools()
+    all_tools = cache_tool_results(await client.get_tools())
+    logger.info(f'{tool_name}: {len(all_tools)} tools over stdio in {time.time() - start_time:.2f}s')
     return client, all_tools
-
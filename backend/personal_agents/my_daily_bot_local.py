@@ -4,7 +4,7 @@ import asyncio
 import json
 
 from common.consts import Agents
-from local_agents.quant_agent_vlm.main import qa_main
+from local_agents.quant_agent_vlm.main import qa_pool_main
 from local_agents.tauric_mcp.main import tauric_main
 
 # Add project root to Python path
@@ -34,6 +34,12 @@ async def daily_bot_main(trading_agent_name):
             print("❌ Failed to select stocks")
             return None
 
+        quant_decisions = {}
+        if trading_agent_name == Agents.quant_agent:
+            # the bars of all the selected stocks are fetched in one batch
+            quant_decisions = await qa_pool_main([stock_selection.get('selected_stock_code')
+                                                  for stock_selection in selection_results])
+
         results = []
         for i, stock_selection in enumerate(selection_results, 1):
             stock_code = stock_selection.get('selected_stock_code')
@@ -48,7 +54,7 @@ async def daily_bot_main(trading_agent_name):
             if trading_agent_name == Agents.tauric:
                 analysis_result = await tauric_main(stock_code)
             elif trading_agent_name == Agents.quant_agent:
-                analysis_result = await qa_main(stock_code)
+                analysis_result = quant_decisions.get(stock_code)
 
             results.append({
                 "stock_selection": stock_selection,
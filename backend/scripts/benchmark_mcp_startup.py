@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+对比 MCP 工具加载耗时: 每次运行启动 stdio 子进程 vs 连接常驻共享服务
+
+先启动共享服务 (python scripts/run_mcp_servers.py)，再运行:
+
+    python scripts/benchmark_mcp_startup.py --rounds 5
+    python scripts/benchmark_mcp_startup.py --servers TechToolsMCP --rounds 10
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp_servers import utils as mcp_utils
+from mcp_servers.utils import MCP_SERVERS, get_mcp_server_url, get_shared_mcp_tools_async
+
+
+async def load_stdio(tool_name):
+    tool_path = MCP_SERVERS[tool_name][0]
+    client = MultiServerMCPClient({tool_name: {"command": sys.executable, "args": [tool_path], "transport": "stdio"}})
+    return await client.get_tools()
+
+
+async def load_shared(tool_name, pooled):
+    if not pooled:
+        # a fresh client per run, what an agent pays without the process-wide pool
+        client = MultiServerMCPClient({tool_name: {"url": get_mcp_server_url(tool_name), "transport": "streamable_http"}})
+        return await client.get_tools()
+    shared = await get_shared_mcp_tools_async(tool_name)
+    if shared is None:
+        raise RuntimeError(f'{tool_name} shared server is not running')
+    return shared[1]
+
+
+async def measure(load, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await load()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def describe(timings):
+    return f"median {statistics.median(timings):.3f}s, max {max(timings):.3f}s"
+
+
+async def main(servers, rounds):
+    for tool_name in servers:
+        stdio = await measure(lambda: load_stdio(tool_name), rounds)
+        print(f"{tool_name:18s} stdio          {describe(stdio)}")
+        try:
+            fresh = await measure(lambda: load_shared(tool_name, False), rounds)
+            mcp_utils._shared_clients.pop(tool_name, None)
+            pooled = await measure(lambda: load_shared(tool_name, True), rounds)
+        except Exception as e:
+            print(f"{tool_name:18s} shared         不可用: {e}")
+            continue
+        print(f"{tool_name:18s} shared         {describe(fresh)}")
+        print(f"{tool_name:18s} shared, pooled {describe(pooled)}  "
+              f"({statistics.median(stdio) / max(statistics.median(pooled), 1e-6):.0f}x)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--servers', nargs='*', default=list(MCP_SERVERS), choices=list(MCP_SERVERS))
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.servers, args.rounds))
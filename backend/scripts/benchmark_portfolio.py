@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+对比模拟器组合引擎: 旧的 bought_items 列表扫描 vs Portfolio 索引
+
+    python scripts/benchmark_portfolio.py --events 100000 --open 500
+"""
+import argparse
+import random
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from end_points.common.tech_indicators.tech_factors_utils import buy, sell, cal_assets_multi_buy
+from end_points.get_simulator.operations.portfolio import Portfolio
+
+MONEY_PER_STOCK = 10000
+
+
+def synthetic_events(n_events, n_open, seed=0):
+    """n_events buy/sell events, each position is sold after on average n_open other buys"""
+    rng = random.Random(seed)
+    events = []
+    open_positions = []
+    day = 0
+    while len(events) < n_events:
+        day += 1
+        stock = '%06d' % rng.randrange(5000)
+        bought_date = '%08d-%s' % (day, stock)
+        events.append(('buy', stock, bought_date, round(rng.uniform(3, 90), 2)))
+        open_positions.append((stock, bought_date))
+        if len(open_positions) > n_open or rng.random() < 0.3:
+            stock, bought_date = open_positions.pop(rng.randrange(len(open_positions)))
+            events.append(('sell', stock, bought_date, round(rng.uniform(3, 90), 2)))
+    return events[:n_events]
+
+
+def run_list(events, init_money):
+    money = init_money
+    bought_items = []
+    assets_memory = [init_money]
+    earns = []
+    for trade_type, stock, bought_date, price in events:
+        if trade_type == 'buy':
+            remain_money, share, amount = buy(MONEY_PER_STOCK, 0, price)
+            money += remain_money - MONEY_PER_STOCK
+            bought_items.append({'stock': stock, 'price': price, 'share': share,
+                                 'bought_date': bought_date, 'bought_amount': amount})
+            assets = cal_assets_multi_buy(money, bought_items)
+        else:
+            for each_item in bought_items:
+                if stock == each_item.get('stock') and bought_date == each_item.get('bought_date'):
+                    money, share, amount = sell(money, each_item.get('share'), price)
+                    bought_items.remove(each_item)
+                    assets = cal_assets_multi_buy(money, bought_items)
+                    earns.append(round((assets - assets_memory[-1]) * 100 / each_item.get('bought_amount'), 2))
+                    assets_memory.append(assets)
+    return earns, assets_memory
+
+
+def run_portfolio(events, init_money):
+    portfolio = Portfolio(init_money)
+    assets_memory = [init_money]
+    earns = []
+    for trade_type, stock, bought_date, price in events:
+        if trade_type == 'buy':
+            remain_money, share, amount = buy(MONEY_PER_STOCK, 0, price)
+            portfolio.money += remain_money - MONEY_PER_STOCK
+            portfolio.add({'stock': stock, 'price': price, 'share': share,
+                           'bought_date': bought_date, 'bought_amount': amount})
+        else:
+            bought_item = portfolio.pop(stock, bought_date)
+            if bought_item is not None:
+                portfolio.money, share, amount = sell(portfolio.money, bought_item.get('share'), price)
+                assets = portfolio.assets()
+                earns.append(round((assets - assets_memory[-1]) * 100 / bought_item.get('bought_amount'), 2))
+                assets_memory.append(assets)
+    return earns, assets_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--open', type=int, default=500, help='open positions kept before selling')
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events, args.open)
+    init_money = MONEY_PER_STOCK * (args.open + 2)
+    print(f"📊 {len(events)} 个事件, 最多 {args.open + 1} 个持仓")
+
+    start = time.perf_counter()
+    list_earns, list_assets = run_list(events, init_money)
+    list_time = time.perf_counter() - start
+    start = time.perf_counter()
+    earns, assets = run_portfolio(events, init_money)
+    portfolio_time = time.perf_counter() - start
+
+    max_diff = max(abs(a - b) for a, b in zip(list_assets, assets))
+    print(f"列表扫描:  {list_time:.3f}s")
+    print(f"Portfolio: {portfolio_time:.3f}s ({list_time / portfolio_time:.1f}x)")
+    print(f"earns 一致: {list_earns == earns}, assets 最大偏差: {max_diff:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,17 @@
 
 支持功能：
 1. 导出为 SQL 文件（可用于完整恢复）
-2. 导出为 JSON 文件（便于查看和部分恢复）
+2. 导出为 JSON 文件（每表一个 gzip 压缩的 JSON Lines 文件，按主键分页流式读取，内存占用与表大小无关）
 3. 自动按时间戳命名导出文件
 
+JSON 导出用 scripts/restore_database.py 并行恢复。
+
 使用方法：
     python scripts/export_database.py                    # 导出为 SQL 和 JSON
     python scripts/export_database.py --sql-only         # 仅导出 SQL
     python scripts/export_database.py --json-only        # 仅导出 JSON
     python scripts/export_database.py --output-dir ./backups
+    python scripts/export_database.py --json-only --stock-binds cn_stocks cn_stocks_m  # 同时导出每只股票的K线表
 """
 
 import os
@@ -28,12 +31,36 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from end_points.init_global import init_global, load_config_file
 from end_points.config.global_var import global_var
+from end_points.common.utils.table_stream import EXPORT_CHUNK_SIZE, export_table, reflect_table, existing_tables
+from data_processing.data_provider.bar_table import list_stock_tables
 from db.mysql.db_schemas import (
     Stock, StockIndex, UpdatingStock, StocksInPool,
     Pool, PoolStock, Rule, RulePool, StockRuleEarn, PoolRuleEarn,
-    Simulator, SimTrading, SimulatorConfig, AgentTrading
+    Simulator, SimTrading, SimulatorCheckpoint, SimulatorEquity, SimulatorConfig, AgentTrading
 )
 
+# 主库中导出的表
+EXPORT_TABLES = [
+    (Stock, 'stock'),
+    (StockIndex, 'stock_index'),
+    (UpdatingStock, 'updating_stock'),
+    (StocksInPool, 'stocks_in_pool'),
+    (Pool, 'pool'),
+    (PoolStock, 'pool_stock'),
+    (Rule, 'rule'),
+    (RulePool, 'rule_pool'),
+    (StockRuleEarn, 'stock_rule_earn'),
+    (PoolRuleEarn, 'pool_rule_earn'),
+    (Simulator, 'simulator'),
+    (SimTrading, 'simulator_trading'),
+    (SimulatorCheckpoint, 'simulator_checkpoint'),
+    (SimulatorEquity, 'simulator_equity'),
+    (SimulatorConfig, 'simulator_config'),
+    (AgentTrading, 'agent_trading'),
+]
+# 主库在元数据中的 bind 名
+MAIN_BIND = 'main'
+
 
 def get_db_config(config_file='../../service.conf'):
     """从配置文件获取数据库连接信息"""
@@ -85,95 +112,78 @@ def export_to_sql(db_config, output_file):
         return False
 
 
-def export_table_to_json(db_session, table_class, table_name, output_dir):
-    """导出单个表为 JSON 文件"""
-    print(f"  📋 导出表: {table_name}")
-
+def export_table_to_json(engine, table, bind_name, output_dir, chunk_size=EXPORT_CHUNK_SIZE):
+    """流式导出单个表为 <bind>/<table>.jsonl.gz，返回元数据条目，失败返回 None"""
+    relative_path = os.path.join(bind_name, f"{table.name}.jsonl.gz")
     try:
-        # 查询所有数据
-        records = db_session.query(table_class).all()
-
-        # 转换为字典列表
-        data = []
-        for record in records:
-            record_dict = {}
-            for c in record.__table__.columns:
-                value = getattr(record, c.name)
-                # 处理 datetime 对象
-                if isinstance(value, datetime):
-                    value = value.isoformat()
-                record_dict[c.name] = value
-            data.append(record_dict)
-
-        # 写入 JSON 文件
-        output_file = os.path.join(output_dir, f"{table_name}.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-
-        print(f"    ✅ {table_name}: {len(data)} 条记录")
-        return len(data)
-
+        count = export_table(engine, table, os.path.join(output_dir, relative_path), chunk_size)
+        return {'name': table.name, 'bind_key': bind_name, 'file': relative_path, 'records': count}
     except Exception as e:
-        print(f"    ❌ {table_name} 导出失败: {str(e)}")
-        return 0
+        print(f"    ❌ {table.name} 导出失败: {str(e)}")
+        return None
 
 
-def export_to_json(db_config, output_dir):
-    """使用 SQLAlchemy 导出所有表为 JSON 文件"""
+def export_to_json(db_config, output_dir, config_file='../../service.conf', stock_binds=None,
+                   chunk_size=EXPORT_CHUNK_SIZE):
+    """流式导出主库的表（以及 stock_binds 中的每只股票K线表）为 gzip JSON Lines 文件"""
     print(f"📊 正在导出数据库到 JSON 目录: {output_dir}")
 
     # 初始化数据库连接
     try:
-        config_file = '../../service.conf'
         init_global(config_file)
         db = global_var["db"]
 
-        # 创建输出目录
-        os.makedirs(output_dir, exist_ok=True)
-
-        # 定义要导出的表
-        tables = [
-            (Stock, 'stock'),
-            (StockIndex, 'stock_index'),
-            (UpdatingStock, 'updating_stock'),
-            (StocksInPool, 'stocks_in_pool'),
-            (Pool, 'pool'),
-            (PoolStock, 'pool_stock'),
-            (Rule, 'rule'),
-            (RulePool, 'rule_pool'),
-            (StockRuleEarn, 'stock_rule_earn'),
-            (PoolRuleEarn, 'pool_rule_earn'),
-            (Simulator, 'simulator'),
-            (SimTrading, 'simulator_trading'),
-            (SimulatorConfig, 'simulator_config'),
-            (AgentTrading, 'agent_trading'),
-        ]
-
-        total_records = 0
-        # 导出每个表
-        for table_class, table_name in tables:
-            count = export_table_to_json(db.session, table_class, table_name, output_dir)
-            total_records += count
-
+        exported = []
+        failed = []
+
+        engine = db.get_engine()
+        os.makedirs(os.path.join(output_dir, MAIN_BIND), exist_ok=True)
+        present = existing_tables(engine)
+        for table_class, table_name in EXPORT_TABLES:
+            if table_name not in present:
+                print(f"  ⏭️  跳过不存在的表: {table_name}")
+                continue
+            entry = export_table_to_json(engine, table_class.__table__, MAIN_BIND, output_dir, chunk_size)
+            if entry is None:
+                failed.append(table_name)
+                continue
+            exported.append(entry)
+            print(f"  📋 {table_name}: {entry['records']} 条记录")
+
+        for bind_key in stock_binds or []:
+            engine = db.get_engine(bind_key)
+            os.makedirs(os.path.join(output_dir, bind_key), exist_ok=True)
+            stock_tables = list_stock_tables(db, bind_key)
+            print(f"  📈 {bind_key}: {len(stock_tables)} 张股票表")
+            for i, table_name in enumerate(stock_tables, 1):
+                entry = export_table_to_json(engine, reflect_table(engine, table_name), bind_key, output_dir, chunk_size)
+                if entry is None:
+                    failed.append(f"{bind_key}.{table_name}")
+                    continue
+                exported.append(entry)
+                if i % 500 == 0 or i == len(stock_tables):
+                    print(f"    [{i}/{len(stock_tables)}]")
+
+        total_records = sum(entry['records'] for entry in exported)
         # 创建元数据文件
         metadata = {
             'export_time': datetime.now().isoformat(),
             'database': db_config['database'],
-            'total_tables': len(tables),
+            'format': 'jsonl.gz',
+            'total_tables': len(exported),
             'total_records': total_records,
-            'tables': [
-                {'name': name, 'model': model.__name__}
-                for model, name in tables
-            ]
+            'tables': exported,
         }
 
         metadata_file = os.path.join(output_dir, '_metadata.json')
         with open(metadata_file, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
 
-        print(f"\n✅ JSON 导出成功! 共 {len(tables)} 个表, {total_records} 条记录")
+        if failed:
+            print(f"\n⚠️ {len(failed)} 个表导出失败: {', '.join(failed)}")
+        print(f"\n✅ JSON 导出成功! 共 {len(exported)} 个表, {total_records} 条记录")
         print(f"📁 输出目录: {output_dir}")
-        return True
+        return len(failed) == 0
 
     except Exception as e:
         print(f"❌ JSON 导出失败: {str(e)}")
@@ -188,6 +198,8 @@ def main():
     parser.add_argument('--json-only', action='store_true', help='仅导出 JSON 文件')
     parser.add_argument('--output-dir', type=str, default='./backups', help='输出目录')
     parser.add_argument('--config', type=str, default='../../service.conf', help='配置文件路径')
+    parser.add_argument('--stock-binds', nargs='*', default=[], help='同时导出这些库中的每只股票K线表')
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='每次分页读取的行数')
 
     args = parser.parse_args()
 
@@ -218,7 +230,7 @@ def main():
     # 导出 JSON
     if not args.sql_only:
         json_dir = os.path.join(backup_dir, 'json_export')
-        if not export_to_json(db_config, json_dir):
+        if not export_to_json(db_config, json_dir, args.config, args.stock_binds, args.chunk_size):
             success = False
 
     print(f"\n{'='*60}")
@@ -72,13 +72,16 @@ def import_data():
                 existing.profit_threshold = config_data['profit_threshold']
                 existing.stop_loss = config_data['stop_loss']
                 existing.max_holding_days = config_data['max_holding_days']
+                if config_data.get('workers') is not None:
+                    existing.workers = config_data['workers']
                 print(f"  更新配置: profit={config_data['profit_threshold']}%, stop_loss={config_data['stop_loss']}%, days={config_data['max_holding_days']}")
             else:
                 new_config = SimulatorConfig(
                     id=config_data['id'],
                     profit_threshold=config_data['profit_threshold'],
                     stop_loss=config_data['stop_loss'],
-                    max_holding_days=config_data['max_holding_days']
+                    max_holding_days=config_data['max_holding_days'],
+                    workers=config_data.get('workers') or 1
                 )
                 db.session.add(new_config)
                 print(f"  插入配置: profit={config_data['profit_threshold']}%, stop_loss={config_data['stop_loss']}%, days={config_data['max_holding_days']}")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# encoding=utf8
+"""
+把每只股票一张表的K线数据迁移到合并表 stock_bar
+
+每张表用一条 INSERT ... SELECT 在数据库内复制，已存在的 (stock_code, date) 会被覆盖，
+因此可以重复执行（例如迁移中断后）。迁移完成后设置 USE_BAR_TABLE=1 启用合并表读取。
+
+使用方法：
+    python scripts/migrate_bar_table.py                          # 迁移 cn_stocks 中所有股票表
+    python scripts/migrate_bar_table.py --stocks 600000 sh000001 # 只迁移指定表
+    python scripts/migrate_bar_table.py --bind-key cn_stocks_m
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from end_points.init_global import init_global
+from end_points.config.global_var import global_var
+from end_points.common.const.consts import DataBase
+from data_processing.data_provider.bar_table import create_bar_table, list_stock_tables, migrate_stock_table
+
+
+def migrate(db, bind_key, stock_codes=None):
+    """迁移 stock_codes（默认全部股票表），返回 (成功表数, 失败表列表)"""
+    create_bar_table(db, bind_key)
+    stock_codes = stock_codes or list_stock_tables(db, bind_key)
+    total = len(stock_codes)
+    print(f"📊 {bind_key}: 共 {total} 张股票表待迁移")
+
+    start_time = time.time()
+    rows = 0
+    failed = []
+    for i, stock_code in enumerate(stock_codes, 1):
+        try:
+            rows += migrate_stock_table(db, stock_code, bind_key)
+        except Exception as e:
+            failed.append(stock_code)
+            print(f"❌ {stock_code} 迁移失败: {e}")
+        if i % 100 == 0 or i == total:
+            print(f"[{i}/{total}] {rows} 行, {time.time() - start_time:.1f}s")
+    print(f"✅ 迁移完成: {total - len(failed)}/{total} 张表, {len(failed)} 张失败")
+    return total - len(failed), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='迁移股票K线到合并表 stock_bar')
+    parser.add_argument('--bind-key', type=str, default=DataBase.stocks, help='数据库 bind key')
+    parser.add_argument('--stocks', nargs='*', default=None, help='只迁移这些股票/指数表')
+    parser.add_argument('--config', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'service.conf'),
+                        help='配置文件路径')
+    args = parser.parse_args()
+
+    init_global(args.config)
+    db = global_var['db']
+    _, failed = migrate(db, args.bind_key, args.stocks)
+    sys.exit(0 if len(failed) == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# encoding=utf8
+"""
+从 export_database.py 的 JSON 导出并行恢复数据库
+
+每个表的 .jsonl.gz 文件按块读取，每块一条多行 INSERT 批量写入（MySQL 会话中关闭
+unique / foreign key 检查），多个表由线程池并行恢复，内存占用只与块大小有关。
+目标表不存在时自动创建。
+
+使用方法：
+    python scripts/restore_database.py --input-dir backups/backup_xxx/json_export
+    python scripts/restore_database.py --input-dir ... --workers 8 --truncate   # 先清空目标表
+    python scripts/restore_database.py --input-dir ... --ignore-existing        # 跳过已存在的主键
+    python scripts/restore_database.py --input-dir ... --tables simulator simulator_trading
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from end_points.init_global import init_global
+from end_points.config.global_var import global_var
+from end_points.common.utils.table_stream import RESTORE_CHUNK_SIZE, restore_table, reflect_table, existing_tables
+from data_processing.update_stocks.download_mydata_util import create_stock_table
+from db.mysql.db_schemas import Base
+
+MAIN_BIND = 'main'
+RESTORE_WORKERS = 4
+
+
+def get_target_table(db, entry, present):
+    """目标库中的表对象，不存在时按模型 / 股票表结构创建"""
+    bind_key, table_name = entry['bind_key'], entry['name']
+    if bind_key == MAIN_BIND:
+        table = Base.metadata.tables[table_name]
+        if table_name not in present[bind_key]:
+            Base.metadata.create_all(bind=db.get_engine(), tables=[table], checkfirst=True)
+        return table
+    engine = db.get_engine(bind_key)
+    if table_name not in present[bind_key]:
+        create_stock_table(db, table_name, bind_key)
+    return reflect_table(engine, table_name)
+
+
+def restore_entry(db, input_dir, entry, present, chunk_size, truncate, ignore_existing):
+    bind_key = entry['bind_key']
+    engine = db.get_engine(None if bind_key == MAIN_BIND else bind_key)
+    table = get_target_table(db, entry, present)
+    return restore_table(engine, table, os.path.join(input_dir, entry['file']), chunk_size, truncate, ignore_existing)
+
+
+def restore(db, input_dir, workers=RESTORE_WORKERS, tables=None, chunk_size=RESTORE_CHUNK_SIZE,
+            truncate=False, ignore_existing=False):
+    """并行恢复 input_dir 中的表（tables 为空时全部），返回 (恢复行数, 失败表列表)"""
+    with open(os.path.join(input_dir, '_metadata.json'), 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    entries = [entry for entry in metadata['tables'] if not tables or entry['name'] in tables]
+    # 大表先开始，避免最后只剩一个大表在单线程恢复
+    entries.sort(key=lambda entry: entry['records'], reverse=True)
+    present = dict((bind_key, existing_tables(db.get_engine(None if bind_key == MAIN_BIND else bind_key)))
+                   for bind_key in set(entry['bind_key'] for entry in entries))
+    total = len(entries)
+    print(f"📊 共 {total} 个表, {sum(entry['records'] for entry in entries)} 条记录待恢复, {workers} 个线程")
+
+    start_time = time.time()
+    rows = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(restore_entry, db, input_dir, entry, present, chunk_size, truncate,
+                                        ignore_existing), entry) for entry in entries)
+        for i, future in enumerate(as_completed(futures), 1):
+            entry = futures[future]
+            try:
+                rows += future.result()
+            except Exception as e:
+                failed.append(f"{entry['bind_key']}.{entry['name']}")
+                print(f"❌ {entry['bind_key']}.{entry['name']} 恢复失败: {e}")
+            if i % 100 == 0 or i == total or entry['records'] >= 100000:
+                elapsed = time.time() - start_time
+                print(f"[{i}/{total}] {rows} 行, {elapsed:.1f}s, {rows / max(elapsed, 1e-6):.0f} 行/s")
+    print(f"✅ 恢复完成: {total - len(failed)}/{total} 个表, {rows} 行, {len(failed)} 个失败")
+    return rows, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行恢复 JSON 导出的数据库备份')
+    parser.add_argument('--input-dir', type=str, required=True, help='export_database.py 生成的 json_export 目录')
+    parser.add_argument('--workers', type=int, default=RESTORE_WORKERS, help='并行恢复的线程数')
+    parser.add_argument('--tables', nargs='*', default=None, help='只恢复这些表')
+    parser.add_argument('--chunk-size', type=int, default=RESTORE_CHUNK_SIZE, help='每条 INSERT 的行数')
+    parser.add_argument('--truncate', action='store_true', help='恢复前清空目标表')
+    parser.add_argument('--ignore-existing', action='store_true', help='跳过主键已存在的行')
+    parser.add_argument('--config', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'service.conf'),
+                        help='配置文件路径')
+    args = parser.parse_args()
+
+    init_global(args.config)
+    db = global_var['db']
+    _, failed = restore(db, args.input_dir, args.workers, args.tables, args.chunk_size, args.truncate,
+                        args.ignore_existing)
+    sys.exit(0 if len(failed) == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# encoding=utf8
+"""
+以常驻 HTTP 服务方式运行 MCP 工具服务
+
+每个工具集 (TradingAgentTools / NewsToolsMCP / TechToolsMCP / DatabaseTool) 启动一个
+streamable-http 子进程，监听 mcp_servers/utils.py 中 MCP_SERVERS 的端口；子进程退出后自动重启。
+Agent 在 MCP_MODE=shared (默认) 时连接这些服务，服务不可用时回退为每次运行启动 stdio 子进程。
+
+使用方法：
+    python scripts/run_mcp_servers.py
+    python scripts/run_mcp_servers.py --servers TechToolsMCP NewsToolsMCP
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_servers.utils import MCP_SERVERS, MCP_HOST
+
+# 子进程退出后等待多少秒再重启
+RESTART_DELAY = 3
+
+
+def start_server(tool_name, host):
+    tool_path, port = MCP_SERVERS[tool_name]
+    process = subprocess.Popen([sys.executable, tool_path, '--transport', 'streamable-http',
+                                '--host', host, '--port', str(port)])
+    print(f"🚀 {tool_name}: http://{host}:{port}/mcp (pid {process.pid})")
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description='以常驻 HTTP 服务方式运行 MCP 工具服务')
+    parser.add_argument('--servers', nargs='*', default=list(MCP_SERVERS), choices=list(MCP_SERVERS),
+                        help='要启动的工具集')
+    parser.add_argument('--host', type=str, default=MCP_HOST, help='监听地址')
+    args = parser.parse_args()
+
+    processes = dict((tool_name, start_server(tool_name, args.host)) for tool_name in args.servers)
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while not stopping:
+            time.sleep(1)
+            for tool_name, process in processes.items():
+                if process.poll() is not None and not stopping:
+                    print(f"⚠️ {tool_name} 已退出 (code {process.returncode})，{RESTART_DELAY}s 后重启")
+                    time.sleep(RESTART_DELAY)
+                    processes[tool_name] = start_server(tool_name, args.host)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for tool_name, process in processes.items():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        print("✅ MCP 服务已停止")
+
+
+if __name__ == '__main__':
+    main()
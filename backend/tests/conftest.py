@@ -0,0 +1,28 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+# backend root on the path, as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """In-memory SQLite stand-in for the flask db, with simulators 1 and 2 of an agent rule"""
+    from db.mysql.db_schemas import Base, Rule, Simulator
+    from end_points.common.const.consts import RuleType
+    from end_points.get_simulator.operations import get_simulator_utils
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    session.add(Rule(id=1, name='agent', type=RuleType.agent, info='', description=''))
+    session.add_all([Simulator(id=sim_id, rule_id=1, init_money=100000, current_money=100000) for sim_id in (1, 2)])
+    session.commit()
+    monkeypatch.setattr(get_simulator_utils, 'write_sim_logs', lambda sim_id, entries: None)
+    yield SimpleNamespace(session=session, get_engine=lambda bind_key=None: engine)
+    session.remove()
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+from data_processing.data_provider.bar_store import BarStore, DATE_FORMAT
+
+
+def meta_of(synced_end, synced_at):
+    return {'synced_start': '20200101', 'synced_end': synced_end.strftime(DATE_FORMAT),
+            'synced_at': synced_at.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def test_sync_before_publish_hour_of_a_past_day_is_stale():
+    day = datetime.now() - timedelta(days=3)
+    meta = meta_of(day, day.replace(hour=10))
+    assert not BarStore.is_current(meta, meta['synced_end'])
+
+
+def test_sync_after_publish_hour_of_a_past_day_is_current():
+    day = datetime.now() - timedelta(days=3)
+    meta = meta_of(day, day.replace(hour=18))
+    assert BarStore.is_current(meta, meta['synced_end'])
+    assert BarStore.is_current(meta_of(day, day + timedelta(days=1)), meta['synced_end'])
+
+
+def test_end_date_past_synced_range_is_stale():
+    day = datetime.now() - timedelta(days=3)
+    meta = meta_of(day, day.replace(hour=18))
+    assert not BarStore.is_current(meta, (day + timedelta(days=1)).strftime(DATE_FORMAT))
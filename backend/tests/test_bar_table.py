@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert
+
+from data_processing.data_provider.bar_table import create_bar_table, migrate_stock_table, read_symbol_bars, \
+    read_date_slice, upsert_bars, symbol_bar_columns
+from data_processing.update_stocks.download_mydata_util import create_stock_table
+from end_points.common.const.consts import DataBase
+from end_points.get_stock.operations.get_stock_utils import read_stock_table
+
+DATES = pd.bdate_range('2024-01-02', periods=5)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    db = SimpleNamespace(get_engine=lambda bind_key=None: engine)
+    create_bar_table(db)
+    return db
+
+
+def bars(seed, stock_code):
+    rows = pd.DataFrame({'date': DATES})
+    for offset, name in enumerate(symbol_bar_columns(stock_code)):
+        rows[name] = [float(seed * 100 + offset * 10 + day) for day in range(len(DATES))]
+    return rows
+
+
+def test_read_symbol_bars_matches_per_stock_table(db):
+    for seed, stock_code in enumerate(['600000', 'sh000001']):
+        stock_class = create_stock_table(db, stock_code, DataBase.stocks)
+        with db.get_engine().begin() as conn:
+            conn.execute(insert(stock_class.__table__), bars(seed, stock_code).to_dict('records'))
+        migrate_stock_table(db, stock_code)
+
+        expected = read_stock_table(db, stock_code).drop(columns=['created_at', 'updated_at'])
+        # SQLite hands the untyped text select back as strings, MySQL as datetimes
+        expected['date'] = pd.to_datetime(expected['date'])
+        actual = read_symbol_bars(db, stock_code).drop(columns=['created_at', 'updated_at'])
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    index_bars = read_symbol_bars(db, 'sh000001', columns=['close', 'jlrl'])
+    assert list(index_bars.columns) == ['date', 'close']
+
+
+def test_read_date_slice(db):
+    for seed, stock_code in enumerate(['000001', '600000', 'sh000001']):
+        upsert_bars(db, stock_code, bars(seed, stock_code))
+
+    frame = read_date_slice(db, [DATES[3], DATES[1]], stock_codes=['600000', 'sh000001'], columns=('close', 'open'))
+    assert list(frame.columns) == ['stock_code', 'date', 'close', 'open']
+    assert list(zip(frame['stock_code'], frame['date'])) == \
+        [('600000', DATES[1]), ('sh000001', DATES[1]), ('600000', DATES[3]), ('sh000001', DATES[3])]
+    assert frame['close'].tolist() == [bars(1, '600000')['close'][1], bars(2, 'sh000001')['close'][1],
+                                       bars(1, '600000')['close'][3], bars(2, 'sh000001')['close'][3]]
+
+    assert sorted(read_date_slice(db, [DATES[0]])['stock_code']) == ['000001', '600000', 'sh000001']
+    empty = read_date_slice(db, [])
+    assert len(empty) == 0 and list(empty.columns) == ['stock_code', 'date', 'close']
@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+
+from data_processing.update_stocks.download_mydata_util import create_stock_table, bulk_update_columns
+from end_points.common.const.consts import DataBase
+
+
+def test_failed_update_does_not_leave_the_temporary_table():
+    # one pooled connection, as a worker reusing it
+    engine = create_engine('sqlite://')
+    db = SimpleNamespace(get_engine=lambda bind_key=None: engine)
+    stock_class = create_stock_table(db, '000651', DataBase.stocks)
+    dates = pd.bdate_range('2024-01-02', periods=3)
+    with engine.begin() as conn:
+        conn.execute(insert(stock_class.__table__), [{'date': day, 'close': 10.0} for day in dates])
+
+    with pytest.raises(OperationalError):
+        bulk_update_columns(db, stock_class, DataBase.stocks,
+                            pd.DataFrame({'date': dates, 'no_such_column': [1.0, 2.0, 3.0]}), ['no_such_column'])
+
+    updated = bulk_update_columns(db, stock_class, DataBase.stocks,
+                                  pd.DataFrame({'date': dates[1:], 'jlrl': [2.0, 3.0]}), ['jlrl'])
+    assert updated == 2
+    with engine.connect() as conn:
+        assert conn.execute(select(stock_class.jlrl).order_by(stock_class.date)).scalars().all() == [None, 2.0, 3.0]
@@ -0,0 +1,124 @@
+import copy
+import random
+
+import pandas as pd
+import pytest
+
+from end_points.common.const.consts import Trade, INIT_MONEY_PER_STOCK
+from end_points.common.tech_indicators.tech_factors_utils import buy, sell, cal_assets_multi_buy, cal_weighted_avg
+from end_points.get_simulator.operations.get_simulator_utils import cal_sim_earn_multi_buy, get_cum_earning_rate, \
+    format_date
+
+STOCKS = ['000001', '000002', '000333', '000858', '300750', '600000', '600519', '601318']
+
+
+def cal_sim_earn_multi_buy_list(sim_trading_items, init_money, buy_slippage=0.001, sell_slippage=0.001):
+    """Original bought_items list replay cal_sim_earn_multi_buy replaced, the parity reference (without the trade records)"""
+    sim_trading_items.sort(key=lambda x: x.get('date'))
+    assets = init_money
+    assets_memory = [init_money]
+    money = init_money
+    bought_items = []
+    earns = []
+    earn_dates = []
+    bought_dates = []
+    for item in sim_trading_items:
+        stock_code = item.get('stock')
+        trade_date = item.get('date')
+        trade_price = item.get('price')
+        trade_type = item.get('type')
+        if trade_type == Trade.buy:
+            if INIT_MONEY_PER_STOCK >= 100*trade_price and money >= INIT_MONEY_PER_STOCK:
+                slippage = min(round(trade_price * buy_slippage, 2), 0.01)
+                trade_price += slippage
+                remain_money, new_share, trading_amount_buy = buy(INIT_MONEY_PER_STOCK, 0, trade_price)
+                money += remain_money - INIT_MONEY_PER_STOCK
+                bought_item = {'stock': stock_code,
+                               'name': None,
+                               'price': trade_price,
+                               'share': new_share,
+                               'bought_date': trade_date,
+                               'bought_amount': trading_amount_buy}
+                bought_items.append(bought_item)
+                assets = cal_assets_multi_buy(money, bought_items)
+        elif trade_type == Trade.sell:
+            bought_date = item.get('bought_date')
+            for each_item in bought_items:
+                check_bought_date = each_item.get('bought_date')
+                if stock_code == each_item.get('stock') and bought_date == check_bought_date:
+                    bought_amount = each_item.get('bought_amount')
+                    share = each_item.get('share')
+                    trade_price = item.get('price')
+                    slippage = min(round(trade_price * sell_slippage, 2), 0.01)
+                    trade_price -= slippage
+                    money, share, trading_amount = sell(money, share, trade_price)
+                    if share == 0:
+                        bought_items.remove(each_item)
+                    assets = cal_assets_multi_buy(money, bought_items)
+                    earn = (assets - assets_memory[-1]) * 100 / bought_amount
+                    earns.append(round(earn, 2))
+                    earn_dates.append((trade_date))
+                    bought_dates.append(bought_date)
+                    assets_memory.append(assets)
+    total_earn = round((assets - init_money)*100/init_money, 2)
+    avg_earn = cal_weighted_avg(earns)
+    num_earns = sum(x > 0 for x in earns)
+    trade_times = len(earns)
+    earning_rate = round(num_earns * 100 / trade_times, 2) if trade_times > 0 else 0
+    earn_rates_after, cum_earns_after, avg_earns_after = get_cum_earning_rate(earns)
+    earning_info = {
+        'earns': earns,
+        'sell_dates': earn_dates,
+        'bought_dates': bought_dates,
+        'earn_rates_after': earn_rates_after,
+        'cum_earns_after': cum_earns_after,
+        'avg_earns_after': avg_earns_after,
+        'assets': assets_memory[1:]
+    }
+    return total_earn, avg_earn, earning_rate, trade_times, money, bought_items, earning_info
+
+
+def random_events(rng, n_signals):
+    """
+    Signals of random stocks, each bought the next day and sold (or failing to) a few days later.
+    A stock has at most one signal a day, as in generate_stock_trading_items.
+    """
+    days = [format_date(day) for day in pd.bdate_range('2023-01-02', periods=250)]
+    events = []
+    signals = set()
+    for _ in range(n_signals):
+        stock_code = rng.choice(STOCKS)
+        index = rng.randrange(len(days) - 2)
+        if (stock_code, index) in signals:
+            continue
+        signals.add((stock_code, index))
+        price = round(rng.uniform(3, 200), 2)
+        events.append({'stock': stock_code, 'date': days[index], 'type': Trade.indicating, 'indicating_price': price})
+        bought_date = days[index + 1]
+        if rng.random() < 0.1:
+            events.append({'stock': stock_code, 'date': bought_date, 'type': Trade.fail_to_buy,
+                           'fail_to_buy_close': price})
+            continue
+        events.append({'stock': stock_code, 'date': bought_date, 'type': Trade.buy, 'price': price})
+        sell_index = index + 1 + rng.randint(1, 8)
+        if rng.random() < 0.2:
+            events.append({'stock': stock_code, 'date': days[min(sell_index, len(days) - 1)], 'type': Trade.fail_to_sell,
+                           'fail_to_sell_price': price, 'last_close': price})
+            sell_index += 1
+        if sell_index < len(days):
+            events.append({'stock': stock_code, 'date': days[sell_index], 'type': Trade.sell,
+                           'price': round(price * (1 + rng.uniform(-0.1, 0.1)), 2), 'bought_date': bought_date})
+    return events
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_portfolio_replay_matches_list_replay(db, seed):
+    rng = random.Random(seed)
+    events = random_events(rng, rng.randint(20, 400))
+    init_money = rng.choice([50000, 100000, 300000])
+
+    expected = cal_sim_earn_multi_buy_list(copy.deepcopy(events), init_money)
+    actual = cal_sim_earn_multi_buy(db, 1, copy.deepcopy(events), init_money)
+
+    assert actual[6] == expected[6]
+    assert actual[:7] == expected
@@ -0,0 +1,23 @@
+from data_processing.data_provider.response_cache import SQLiteResponseCache, STATS_FLUSH_EVERY
+
+
+def test_hit_counters_are_written_in_batches(tmp_path):
+    path = str(tmp_path / 'responses.sqlite')
+    cache = SQLiteResponseCache(path)
+    other = SQLiteResponseCache(path)
+    cache.set('daily', {'ts_code': '600000.SH'}, [1, 2])
+
+    assert cache.get('daily', {'ts_code': '600000.SH'}) == [1, 2]
+    assert cache.get('daily', {'ts_code': '000001.SZ'}) is None
+    # not written yet, another process does not see them
+    assert other.shared_stats() == {}
+
+    for _ in range(STATS_FLUSH_EVERY - 2):
+        cache.get('daily', {'ts_code': '600000.SH'})
+    assert other.shared_stats() == {'daily': {'hits': STATS_FLUSH_EVERY - 1, 'misses': 1}}
+
+    cache.get('income', {'ts_code': '600000.SH'})
+    # shared_stats writes the counters of its own process first
+    assert cache.shared_stats() == {'daily': {'hits': STATS_FLUSH_EVERY - 1, 'misses': 1},
+                                    'income': {'hits': 0, 'misses': 1}}
+    assert cache.stats()['total'] == {'hits': STATS_FLUSH_EVERY - 1, 'misses': 2}
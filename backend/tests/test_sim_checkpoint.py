@@ -0,0 +1,78 @@
+import json
+import random
+
+import pandas as pd
+import pytest
+
+from db.mysql.db_schemas import SimTrading, Simulator
+from end_points.get_simulator.operations.get_simulator_utils import update_sim_model, load_sim_checkpoint, \
+    load_sim_equity, get_sim_config
+
+STOCKS = ['000001', '000002', '600000']
+LAGGING_STOCK = '000002'
+
+
+def random_bars(rng, n_bars):
+    dates = pd.bdate_range('2024-01-02', periods=n_bars)
+    closes = []
+    price = rng.uniform(5, 50)
+    for _ in range(n_bars):
+        price *= 1 + rng.uniform(-0.06, 0.06)
+        closes.append(round(price, 2))
+    return pd.DataFrame({'date': dates, 'open': closes, 'high': closes, 'low': closes, 'close': closes})
+
+
+def sim_result(db, sim_id):
+    db.session.expire_all()
+    record = db.session.query(Simulator).filter(Simulator.id == sim_id).first()
+    trades = db.session.query(SimTrading.stock, SimTrading.trading_date, SimTrading.trading_type)\
+        .filter(SimTrading.sim_id == sim_id).all()
+    days, equity = load_sim_equity(db, sim_id)
+    return {
+        'money': record.current_money,
+        'shares': json.loads(record.current_shares),
+        'earning_info': json.loads(record.earning_info),
+        'trades': sorted(trades),
+        'days': days.tolist(),
+        'equity': equity.tolist(),
+    }
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_resume_with_lagging_stock_matches_full_rebuild(db, seed):
+    rng = random.Random(seed)
+    bars = dict((stock_code, random_bars(rng, 80)) for stock_code in STOCKS)
+    items = [{'stock_code': stock_code, 'indicating_date': day.strftime('%Y-%m-%d')}
+             for stock_code in STOCKS for day in rng.sample(list(bars[stock_code]['date'][:75]), 12)]
+
+    update_sim_model(db, 1, items, load_bars=lambda stock_code: bars[stock_code].copy())
+
+    # first run: one stock's bars stop 20 days before the others
+    def partial_bars(stock_code):
+        return bars[stock_code].iloc[:40 if stock_code == LAGGING_STOCK else 60].copy()
+
+    update_sim_model(db, 2, items, load_bars=partial_bars)
+    checkpoint = load_sim_checkpoint(db, 2, get_sim_config(db))
+    assert checkpoint['last_date'] == bars[LAGGING_STOCK]['date'].iloc[39].to_pydatetime()
+    update_sim_model(db, 2, items, checkpoint=checkpoint, load_bars=lambda stock_code: bars[stock_code].copy())
+
+    assert sim_result(db, 2) == sim_result(db, 1)
+
+
+def test_checkpoint_does_not_move_when_a_stock_has_no_bars(db):
+    rng = random.Random(7)
+    bars = dict((stock_code, random_bars(rng, 60)) for stock_code in STOCKS)
+    items = [{'stock_code': stock_code, 'indicating_date': day.strftime('%Y-%m-%d')}
+             for stock_code in STOCKS for day in rng.sample(list(bars[stock_code]['date'][:55]), 8)]
+
+    update_sim_model(db, 1, items, load_bars=lambda stock_code: bars[stock_code].copy())
+    update_sim_model(db, 2, items, load_bars=lambda stock_code: bars[stock_code].iloc[:30].copy())
+    checkpoint = load_sim_checkpoint(db, 2, get_sim_config(db))
+    update_sim_model(db, 2, items, checkpoint=checkpoint,
+                     load_bars=lambda stock_code: bars[stock_code].iloc[:0].copy() if stock_code == LAGGING_STOCK
+                     else bars[stock_code].copy())
+    assert load_sim_checkpoint(db, 2, get_sim_config(db))['last_date'] == checkpoint['last_date']
+
+    checkpoint = load_sim_checkpoint(db, 2, get_sim_config(db))
+    update_sim_model(db, 2, items, checkpoint=checkpoint, load_bars=lambda stock_code: bars[stock_code].copy())
+    assert sim_result(db, 2) == sim_result(db, 1)
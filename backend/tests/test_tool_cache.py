@@ -0,0 +1,34 @@
+import asyncio
+import sqlite3
+import threading
+
+from mcp_servers import tool_cache
+from mcp_servers.tool_cache import MemoryToolResultCache, cached_tool_call
+
+
+def call_tool(result, calls):
+    async def call():
+        calls.append(1)
+        return result
+    return asyncio.run(cached_tool_call('get_stock_market_data', {'symbol': '600000'}, call))
+
+
+def test_unpicklable_result_is_returned_uncached(monkeypatch):
+    monkeypatch.setattr(tool_cache, '_tool_cache', MemoryToolResultCache({'get_stock_market_data': 600}))
+    monkeypatch.setattr(tool_cache, 'current_trading_date', lambda: '2024-01-02')
+    result, calls = {'lock': threading.Lock()}, []
+    assert call_tool(result, calls) is result
+    assert call_tool(result, calls) is result
+    assert len(calls) == 2
+
+
+def test_cache_read_error_calls_the_tool(monkeypatch):
+    class BrokenCache(MemoryToolResultCache):
+        def _load(self, key, now):
+            raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(tool_cache, '_tool_cache', BrokenCache({'get_stock_market_data': 600}))
+    monkeypatch.setattr(tool_cache, 'current_trading_date', lambda: '2024-01-02')
+    calls = []
+    assert call_tool('bars', calls) == 'bars'
+    assert calls == [1]
@@ -0,0 +1,25 @@
+import numpy as np
+
+from data_processing.data_provider import trading_calendar
+from data_processing.data_provider.trading_calendar import TradingCalendar, get_trading_calendar, \
+    CALENDAR_RETRY_SECONDS
+
+
+def test_weekday_fallback_is_retried_after_backoff(monkeypatch):
+    exact = TradingCalendar(np.array(['2024-01-02', '2024-01-03'], dtype='datetime64[D]'))
+    fallback = TradingCalendar.from_weekdays('2024-01-01', '2024-01-31')
+    loads = [fallback, exact]
+    now = [1000.0]
+    monkeypatch.setattr(trading_calendar, '_calendars', {})
+    monkeypatch.setattr(trading_calendar, 'load_trading_calendar', lambda exchange: loads.pop(0))
+    monkeypatch.setattr(trading_calendar.time, 'monotonic', lambda: now[0])
+
+    assert get_trading_calendar() is fallback
+    now[0] += CALENDAR_RETRY_SECONDS - 1
+    assert get_trading_calendar() is fallback
+    now[0] += 1
+    assert get_trading_calendar() is exact
+    # an exact calendar is kept for the day
+    now[0] += 10 * CALENDAR_RETRY_SECONDS
+    assert get_trading_calendar() is exact
+    assert loads == []
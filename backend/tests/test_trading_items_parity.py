@@ -0,0 +1,148 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from end_points.get_simulator.operations.get_simulator_utils import get_trading_items_model, format_date, \
+    HIGH_LIMIT, LOW_LIMIT
+
+
+def get_trading_items_model_loop(stock_data, indicator_dates, profit_threshold=0, stop_loss=5, max_holding_days=5):
+    """Original per-bar implementation get_trading_items_model replaced, the parity reference"""
+    stock_data = stock_data.reset_index(drop=True)
+    trading_items = []
+    open_prices = stock_data['open']
+    close_prices = stock_data['close']
+    dates = stock_data['date']
+    data_length = len(dates)
+
+    # Convert stop_loss from percentage to decimal (e.g., 5 -> 0.05)
+    stop_loss_decimal = stop_loss / 100.0
+    # Convert profit_threshold from percentage to decimal (e.g., 0 -> 0.00, 1 -> 0.01)
+    profit_threshold_decimal = profit_threshold / 100.0
+
+    # 将 indicator_dates 转换为字符串集合，避免类型不匹配导致的比较失败
+    indicator_dates_str = {d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else str(d)[:10]
+                           for d in indicator_dates}
+
+    for each_index in range(data_length):
+        date = dates[each_index]
+        # 统一转换为字符串格式进行比较
+        date_str = date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date)[:10]
+        if date_str in indicator_dates_str:
+            indicating_price = close_prices[each_index]
+            trading_item = {
+                "indicating_date": format_date(date),
+                "indicating_price": indicating_price,
+            }
+            buying_index = each_index + 1
+            if buying_index < data_length:
+                buy_date = format_date(dates[buying_index])
+                buy_price = close_prices[buying_index]
+                if not np.isnan(buy_price) and not np.isnan(indicating_price):
+                    daily_percent = (buy_price - indicating_price) / indicating_price
+                    if daily_percent >= HIGH_LIMIT:
+                        trading_item.update({
+                            "fail_to_buy_date": buy_date,
+                            "fail_to_buy_close": buy_price,
+                        })
+                    else:
+                        trading_item.update({
+                            "buy_date": buy_date,
+                            "buy_price": buy_price,
+                        })
+                        fail_to_sell_items = []
+                        for j in range(max_holding_days):
+                            selling_index = each_index + 2 + j
+                            if selling_index < data_length:
+                                sell_date = format_date(dates[selling_index])
+                                sell_price = close_prices[selling_index]
+                                last_date_close = close_prices[selling_index-1]
+                                loss_percent = (buy_price - sell_price) / buy_price
+                                daily_loss_percent = (sell_price - last_date_close) / last_date_close
+                                if (daily_loss_percent <= LOW_LIMIT) and (j != max_holding_days-1):
+                                    fs_item = {
+                                        "fail_to_sell_date": sell_date,
+                                        "fail_to_sell_price": sell_price,
+                                        "last_close": last_date_close,
+                                    }
+                                    fail_to_sell_items.append(fs_item)
+                                    trading_item.update({'fail_to_sell_items': fail_to_sell_items})
+                                else:
+                                    # Sell conditions (OR logic):
+                                    # 1. Profit: (sell_price - buy_price) / buy_price >= profit_threshold
+                                    # 2. Stop loss: loss_percent >= stop_loss_decimal
+                                    # 3. Time exit: reached max_holding_days
+                                    profit_percent = (sell_price - buy_price) / buy_price
+                                    if (profit_percent >= profit_threshold_decimal) or (loss_percent >= stop_loss_decimal) or (j == max_holding_days-1):
+                                        trading_item.update({
+                                            "sell_date": sell_date,
+                                            "sell_price": sell_price,
+                                        })
+                                        break
+            trading_items.append(trading_item)
+    return trading_items
+
+
+def random_bars(rng, n_bars):
+    """Daily bars with NaN closes and limit-up / limit-down moves mixed into a random walk"""
+    dates = pd.bdate_range('2024-01-02', periods=n_bars)
+    closes = []
+    price = rng.uniform(5, 50)
+    for _ in range(n_bars):
+        move = rng.random()
+        if move < 0.1:
+            price *= 1.1
+        elif move < 0.2:
+            price *= 0.9
+        else:
+            price *= 1 + rng.uniform(-0.05, 0.05)
+        closes.append(np.nan if rng.random() < 0.05 else round(price, 2))
+    return pd.DataFrame({'date': dates, 'open': closes, 'close': closes})
+
+
+def random_signal_dates(rng, dates):
+    """Signal dates as str / date / Timestamp, some of them outside the bars"""
+    picked = rng.sample(list(dates), rng.randint(0, min(len(dates), 12)))
+    picked.append(pd.Timestamp('2030-01-01'))
+    kinds = [lambda d: d.strftime('%Y-%m-%d'), lambda d: d.date(), lambda d: d,
+             lambda d: d.strftime('%Y-%m-%dT00:00:00')]
+    return [rng.choice(kinds)(d) for d in picked]
+
+
+def assert_same_items(expected, actual):
+    assert len(expected) == len(actual)
+    for expected_item, actual_item in zip(expected, actual):
+        assert expected_item.keys() == actual_item.keys()
+        for key, value in expected_item.items():
+            if key == 'fail_to_sell_items':
+                assert_same_items(value, actual_item[key])
+            elif isinstance(value, float) and np.isnan(value):
+                assert np.isnan(actual_item[key])
+            else:
+                assert value == actual_item[key], key
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_vectorized_matches_loop(seed):
+    rng = random.Random(seed)
+    stock_data = random_bars(rng, rng.randint(1, 60))
+    indicator_dates = random_signal_dates(rng, stock_data['date'])
+    params = dict(profit_threshold=rng.choice([0, 1, 3]), stop_loss=rng.choice([2, 5, 8]),
+                  max_holding_days=rng.randint(0, 5))
+    assert_same_items(get_trading_items_model_loop(stock_data, indicator_dates, **params),
+                      get_trading_items_model(stock_data, indicator_dates, **params))
+
+
+def test_limit_moves_block_buy_and_sell():
+    stock_data = pd.DataFrame({'date': pd.bdate_range('2024-01-02', periods=6),
+                               'close': [10.0, 11.0, 11.0, 9.9, 9.0, 9.0]})
+    stock_data['open'] = stock_data['close']
+    # limit up the day after the signal: no buy
+    assert_same_items(get_trading_items_model_loop(stock_data, ['2024-01-02']),
+                      get_trading_items_model(stock_data, ['2024-01-02']))
+    # limit down while holding: fail_to_sell items before the exit
+    items = get_trading_items_model(stock_data, ['2024-01-03'], max_holding_days=3)
+    assert_same_items(get_trading_items_model_loop(stock_data, ['2024-01-03'], max_holding_days=3), items)
+    assert 'fail_to_sell_items' in items[0]